@@ -5,15 +5,13 @@ import hashlib
 import pandas as pd
 from datetime import datetime
 import uuid
-from database import init_db, get_db_connection, update_project_status, get_all_projects, get_project_by_number
+from database import init_db, get_db_connection, get_read_connection, update_project_status, get_all_projects, get_projects_page, search_projects, get_status_summary, get_project_by_number, get_project_numbers, enqueue_render_job, get_render_job
 
-from pdf_generator import generate_pdf_for_streamlit
+from pdf_generator import generate_pdf_for_streamlit, prerender_project_pdf, write_pdfs_zip
 from templates.template_manager import get_available_templates
+from config import PDF_CONFIG
 import tempfile
 import os
-# In app.py - update the import section
-from database import init_db, get_db_connection, update_project_status, get_all_projects, get_project_by_number
-from pdf_generator import generate_pdf_for_streamlit  # Use this instead of generate_wsm_pdf
 
 # Initialize database
 init_db()
@@ -32,12 +30,24 @@ if 'username' not in st.session_state:
     st.session_state.username = None
 if 'current_project' not in st.session_state:
     st.session_state.current_project = None
+if 'pdf_cache' not in st.session_state:
+    st.session_state.pdf_cache = {}
+if 'pdf_jobs' not in st.session_state:
+    st.session_state.pdf_jobs = {}
+
+def remember_pdf(project_no, pdf_data):
+    # Bounded per session: each entry is a whole PDF held in server memory
+    pdf_cache = st.session_state.pdf_cache
+    pdf_cache.pop(project_no, None)
+    pdf_cache[project_no] = pdf_data
+    while len(pdf_cache) > PDF_CONFIG['SESSION_PDF_LIMIT']:
+        pdf_cache.pop(next(iter(pdf_cache)))
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def verify_login(username, password):
-    conn = get_db_connection()
+    conn = get_read_connection()
     c = conn.cursor()
     hashed_password = hash_password(password)
     c.execute('SELECT * FROM users WHERE username = ? AND password = ?', 
@@ -558,6 +568,8 @@ def wsm_form_page():
                         ) VALUES (''' + ','.join(['?'] * len(project_data)) + ')', project_data)
                     
                     conn.commit()
+                    # Render the PDF now so the first download is a cache hit
+                    prerender_project_pdf(project_no)
                     st.success(f"✅ Project submitted successfully!")
                     st.info(f"**Project Number:** {project_no}")
                     st.session_state.current_project = project_no
@@ -567,7 +579,7 @@ def wsm_form_page():
                     st.markdown("""
                     ### Next Steps:
                     1. Go to **Project Status** page to track your project
-                    2. Download the PDF report once approved
+                    2. Download the PDF report (it is being prepared in the background)
                     3. Monitor project status updates
                     """)
                     
@@ -582,16 +594,13 @@ def status_page():
     st.title("📊 Project Status")
     st.markdown("---")
     
-    conn = get_db_connection()
+    # Status summary (trigger-maintained counters, no table scan)
+    status_counts = get_status_summary()
+    total_projects = sum(status_counts.values())
     
-    # Get all projects
-    projects = get_all_projects()
-    
-    if not projects.empty:
+    if total_projects:
         st.subheader("Project Overview")
         
-        # Status summary
-        status_counts = projects['status'].value_counts()
         col1, col2, col3, col4, col5 = st.columns(5)
         
         with col1:
@@ -603,30 +612,79 @@ def status_page():
         with col4:
             st.metric("Rejected", status_counts.get('Rejected', 0))
         with col5:
-            st.metric("Total Projects", len(projects))
+            st.metric("Total Projects", total_projects)
         
         # Search and filter
         st.subheader("Project Details")
-        col1, col2, col3 = st.columns([2,1,1])
+        col1, col2, col3, col4 = st.columns([2,1,1,1])
         with col1:
-            search_term = st.text_input("🔍 Search projects...", placeholder="Search by project no, client, or site")
+            search_term = st.text_input("🔍 Search projects...", placeholder="Search any project field (client, site, burner make, requirements...)")
         with col2:
             status_filter = st.selectbox("Filter by status", ["All", "Submitted", "Approved", "Waiting for MRO Confirmation", "Rejected", "Completed"])
         with col3:
+            page_size = st.selectbox("Per page", [10, 25, 50, 100], index=1)
+        with col4:
             st.write("")
             if st.button("🔄 Refresh Data"):
                 st.rerun()
         
-        # Filter projects
-        filtered_projects = projects
+        # Keyset pagination: remember the cursor each visited page starts after,
+        # and start over whenever the filter changes
+        page_filter = (search_term, status_filter, page_size)
+        if st.session_state.get('page_filter') != page_filter:
+            st.session_state.page_filter = page_filter
+            st.session_state.page_cursors = [None]
+        page_cursors = st.session_state.page_cursors
+        
         if search_term:
-            filtered_projects = filtered_projects[
-                filtered_projects['project_no'].str.contains(search_term, case=False) |
-                filtered_projects['client'].str.contains(search_term, case=False) |
-                filtered_projects['site'].str.contains(search_term, case=False)
-            ]
-        if status_filter != "All":
-            filtered_projects = filtered_projects[filtered_projects['status'] == status_filter]
+            # Ranked full-text search; its page cursor is a result offset
+            filtered_projects, next_cursor = search_projects(
+                search_term,
+                page_size=page_size,
+                offset=page_cursors[-1] or 0,
+                status=None if status_filter == "All" else status_filter
+            )
+        else:
+            filtered_projects, next_cursor = get_projects_page(
+                page_size=page_size,
+                after=page_cursors[-1],
+                status=None if status_filter == "All" else status_filter
+            )
+        
+        # Batch export: render every project matching the current filter into one ZIP
+        with st.expander("📦 Batch export"):
+            st.caption("Renders all projects matching the current search and status filter, in parallel.")
+            if st.button("📦 Export matching projects as ZIP", key="batch_export"):
+                project_nos = get_project_numbers(
+                    status=None if status_filter == "All" else status_filter,
+                    search=search_term or None
+                )
+                if not project_nos:
+                    st.warning("No projects match the current filter.")
+                else:
+                    old_path = st.session_state.pop('batch_export_path', None)
+                    if old_path and os.path.exists(old_path):
+                        os.unlink(old_path)
+                    progress_bar = st.progress(0.0, text=f"Rendering 0/{len(project_nos)}...")
+                    def report_progress(done, total, project_no):
+                        progress_bar.progress(done / total, text=f"Rendered {done}/{total} ({project_no})")
+                    with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tmp:
+                        written, failures = write_pdfs_zip(project_nos, tmp, progress=report_progress)
+                    st.session_state.batch_export_path = tmp.name
+                    if failures:
+                        st.warning(f"Exported {written} PDF(s); {len(failures)} failed (see errors.txt in the ZIP).")
+                    else:
+                        st.success(f"Exported {written} PDF(s).")
+            batch_path = st.session_state.get('batch_export_path')
+            if batch_path and os.path.exists(batch_path):
+                with open(batch_path, "rb") as fh:
+                    st.download_button(
+                        label="📥 Download ZIP",
+                        data=fh,
+                        file_name=f"WSM_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                        mime="application/zip",
+                        key="batch_export_download"
+                    )
         
         if not filtered_projects.empty:
             for _, project in filtered_projects.iterrows():
@@ -638,6 +696,8 @@ def status_page():
                         st.write(f"**Site:** {project['site']}")
                         st.write(f"**Created by:** {project['created_by']}")
                         st.write(f"**Created on:** {project['created_at'][:16]}")
+                        if project.get('snippet'):
+                            st.caption(f"Match: {project['snippet']}")
                     
                     with col2:
                         new_status = st.selectbox(
@@ -650,13 +710,46 @@ def status_page():
                     with col3:
                         if st.button("Update", key=f"update_{project['project_no']}"):
                             update_project_status(project['project_no'], new_status)
+                            # Some templates (SIMPLE_WSM) print the status, so drop the copy rendered before it
+                            st.session_state.pdf_cache.pop(project['project_no'], None)
+                            st.session_state.pdf_jobs.pop(project['project_no'], None)
                             st.success("Status updated!")
                             st.rerun()
                     with col4:
-                        try:
-                            with st.spinner("Generating PDF..."):
-                                pdf_data = generate_pdf_for_streamlit(project['project_no'])
-        
+                        # Render only on request; reruns reuse the bytes kept in the session
+                        pdf_data = st.session_state.pdf_cache.get(project['project_no'])
+                        job_id = st.session_state.pdf_jobs.get(project['project_no'])
+                        if pdf_data is None and job_id is not None:
+                            # Queued render: poll the job the background worker is processing
+                            job = get_render_job(job_id)
+                            if job and job['status'] == 'done':
+                                try:
+                                    with open(job['result_path'], 'rb') as f:
+                                        pdf_data = f.read()
+                                    remember_pdf(project['project_no'], pdf_data)
+                                except OSError as e:
+                                    # e.g. the worker wrote to a RENDER_OUTPUT_DIR this process can't see
+                                    st.error(f"Could not read the rendered PDF: {e}")
+                                st.session_state.pdf_jobs.pop(project['project_no'], None)
+                            elif not job or job['status'] == 'failed':
+                                st.error(f"PDF generation failed: {job['error'] if job else 'job not found'}")
+                                st.session_state.pdf_jobs.pop(project['project_no'], None)
+                            else:
+                                st.caption("⏳ Rendering...")
+                                st.button("Check", key=f"check_{project['project_no']}", use_container_width=True)
+                        elif pdf_data is None and st.button("📄 Prepare PDF", key=f"prepare_{project['project_no']}",
+                                                            use_container_width=True):
+                            if PDF_CONFIG['RENDER_BACKEND'] == 'queue':
+                                st.session_state.pdf_jobs[project['project_no']] = enqueue_render_job(project['project_no'])
+                                st.rerun()
+                            try:
+                                with st.spinner("Generating PDF..."):
+                                    pdf_data = generate_pdf_for_streamlit(project['project_no'])
+                                remember_pdf(project['project_no'], pdf_data)
+                            except Exception as e:
+                                st.error(f"PDF generation failed: {str(e)}")
+
+                        if pdf_data is not None:
                             st.download_button(
                                 label="📄 Download PDF",
                                 data=pdf_data,
@@ -665,20 +758,23 @@ def status_page():
                                 key=f"download_{project['project_no']}",
                                 use_container_width=True
                             )
-        
-                        except Exception as e:
-                            st.error(f"PDF generation failed: {str(e)}")
-                            
-                            if st.button("Retry", key=f"retry_{project['project_no']}"):
-                                st.rerun()
                     
+            col1, col2, col3 = st.columns([1,2,1])
+            with col1:
+                if len(page_cursors) > 1 and st.button("⬅️ Previous", key="page_prev"):
+                    page_cursors.pop()
+                    st.rerun()
+            with col2:
+                st.caption(f"Page {len(page_cursors)}")
+            with col3:
+                if next_cursor is not None and st.button("Next ➡️", key="page_next"):
+                    page_cursors.append(next_cursor)
+                    st.rerun()
         else:
             st.warning("No projects match your search criteria.")
         
     else:
         st.info("No projects found. Create a new project in the WSM Form page.")
-    
-    conn.close()
 
 def main():
     if not st.session_state.authenticated:
@@ -717,6 +813,11 @@ def main():
             st.session_state.authenticated = False
             st.session_state.username = None
             st.session_state.current_project = None
+            st.session_state.pdf_cache = {}
+            st.session_state.pdf_jobs = {}
+            batch_path = st.session_state.pop('batch_export_path', None)
+            if batch_path and os.path.exists(batch_path):
+                os.unlink(batch_path)
             st.success("Logged out successfully!")
             st.rerun()
 
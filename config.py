@@ -15,19 +15,86 @@ APP_CONFIG = {
     ]
 }
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 # Database Configuration
 DB_CONFIG = {
-    'DATABASE_NAME': 'wsm_projects.db',
+    'DATABASE_NAME': os.environ.get('WSM_DB_PATH', 'wsm_projects.db'),
     'INITIAL_USER': {
         'username': 'admin',
         'password': 'admin123',
         'email': 'admin@company.com'
-    }
+    },
+    # Connection tuning applied by database.py to every connection
+    'BUSY_TIMEOUT_MS': 5000,
+    'CACHE_SIZE_KB': 20000,
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    # Idle connections database.py keeps per process, of each kind (read-write, read-only)
+    'POOL_SIZE': 4
+}
+
+# Template Configuration
+TEMPLATE_CONFIG = {
+    # Compiled Jinja2 bytecode shared between processes
+    'BYTECODE_CACHE_DIR': os.environ.get('WSM_JINJA_CACHE_DIR', os.path.join(BASE_DIR, '.jinja_cache')),
+    # Number of compiled templates kept in memory
+    'CACHE_SIZE': 50,
+    # Seconds between stat checks of the templates directory
+    'REGISTRY_CHECK_INTERVAL': float(os.environ.get('WSM_TEMPLATE_CHECK_INTERVAL', '2'))
 }
 
 # PDF Configuration
 PDF_CONFIG = {
     'DEFAULT_ORIENTATION': 'portrait',
     'PAGE_SIZE': 'A4',
-    'MARGINS': '0.5in'
-}
\ No newline at end of file
+    'MARGINS': '0.5in',
+    # Prepared PDFs each Streamlit session keeps for its download buttons (oldest dropped first)
+    'SESSION_PDF_LIMIT': 10,
+    # Conversion engines tried in order (see pdf_engines.py); comma-separated in WSM_PDF_ENGINES
+    'ENGINE_ORDER': [name.strip() for name in os.environ.get(
+        'WSM_PDF_ENGINES', 'weasyprint,xhtml2pdf,wkhtmltopdf,reportlab-plain').split(',') if name.strip()],
+    'WKHTMLTOPDF_PATH': os.environ.get('WSM_WKHTMLTOPDF', 'wkhtmltopdf'),
+    'WKHTMLTOPDF_MAX_PROCESSES': int(os.environ.get('WSM_WKHTMLTOPDF_MAX_PROCESSES', os.cpu_count() or 1)),
+    'WKHTMLTOPDF_TIMEOUT': float(os.environ.get('WSM_WKHTMLTOPDF_TIMEOUT', '60')),
+    # Templates built directly with ReportLab instead of via HTML (see pdf_native.py); empty disables
+    'NATIVE_TEMPLATES': [name.strip() for name in os.environ.get(
+        'WSM_PDF_NATIVE', 'STD_WSM').split(',') if name.strip()],
+    # Default logo for natively rendered pages (path or data: URI); projects may override it with a data: URI
+    'COMPANY_LOGO': os.environ.get('WSM_COMPANY_LOGO', ''),
+    # Per-(template, engine) statistics and circuit breaker (see engine_stats.py); adaptive
+    # order tries the highest-fidelity engines first and only sorts by latency within a tier
+    'ENGINE_ADAPTIVE_ORDER': os.environ.get('WSM_PDF_ADAPTIVE_ORDER', '1') != '0',
+    'ENGINE_STATS_WINDOW': 200,
+    'ENGINE_MIN_SAMPLES': 5,
+    'BREAKER_FAILURES': 3,
+    'BREAKER_COOLDOWN': 300.0,
+    # Rendered PDF cache (in-memory LRU + shared disk directory)
+    'CACHE_ENABLED': os.environ.get('WSM_PDF_CACHE', '1') != '0',
+    'CACHE_DIR': os.environ.get('WSM_PDF_CACHE_DIR', os.path.join(BASE_DIR, 'pdf_cache')),
+    'CACHE_MEMORY_MAX_BYTES': 64 * 1024 * 1024,
+    'CACHE_DISK_MAX_BYTES': 1024 * 1024 * 1024,
+    # HTML -> PDF worker processes (see render_pool.py); 0 renders in-process
+    'RENDER_WORKERS': int(os.environ.get('WSM_RENDER_WORKERS', os.cpu_count() or 1)),
+    'RENDER_TIMEOUT': float(os.environ.get('WSM_RENDER_TIMEOUT', '120')),
+    'RENDER_START_METHOD': os.environ.get('WSM_RENDER_START_METHOD', 'spawn'),
+    # 'pool' renders in render_pool; 'queue' hands jobs to render_worker.py daemons
+    'RENDER_BACKEND': os.environ.get('WSM_RENDER_BACKEND', 'pool'),
+    'RENDER_OUTPUT_DIR': os.environ.get('WSM_RENDER_OUTPUT_DIR', os.path.join(BASE_DIR, 'rendered_pdfs')),
+    'RENDER_MAX_ATTEMPTS': 3,
+    # Debug artifacts (final HTML, xhtml2pdf log) per request; see debug_capture.py
+    'DEBUG_CAPTURE': os.environ.get('WSM_PDF_DEBUG', '0') == '1',
+    'DEBUG_SAMPLE_RATE': float(os.environ.get('WSM_PDF_DEBUG_SAMPLE_RATE', '0')),
+    'DEBUG_DIR': os.environ.get('WSM_PDF_DEBUG_DIR', os.path.join(BASE_DIR, 'pdf_debug')),
+    'DEBUG_MAX_REQUESTS': 50,
+    # Stage timings and Prometheus histograms (see pdf_metrics.py)
+    'METRICS_ENABLED': os.environ.get('WSM_PDF_METRICS', '1') != '0',
+    'METRICS_LOG_SPANS': os.environ.get('WSM_PDF_TRACE', '0') == '1',
+    'METRICS_DIR': os.environ.get('WSM_PDF_METRICS_DIR', os.path.join(BASE_DIR, 'pdf_metrics')),
+    'METRICS_FLUSH_INTERVAL': 15.0,
+    'METRICS_TEXTFILE': os.environ.get('WSM_PDF_METRICS_TEXTFILE', ''),
+    # Headless HTTP render service (see render_server.py)
+    'SERVER_HOST': os.environ.get('WSM_SERVER_HOST', '127.0.0.1'),
+    'SERVER_PORT': int(os.environ.get('WSM_SERVER_PORT', '8600')),
+    'SERVER_MAX_QUEUE': int(os.environ.get('WSM_SERVER_MAX_QUEUE', '16')),
+    'SERVER_MAX_BODY_BYTES': 2 * 1024 * 1024
+}
@@ -1,13 +1,125 @@
 # database.py
+import os
 import sqlite3
 import hashlib
+import threading
+import urllib.parse
 from datetime import datetime
 import pandas as pd
 
-def init_db():
-    conn = sqlite3.connect('wsm_projects.db')
-    c = conn.cursor()
-    
+from config import DB_CONFIG
+
+# Connection management
+#
+# Each process keeps a small pool of read-write connections and one of read-only
+# connections: get_db_connection() / get_read_connection() hand out an idle one
+# (or open a new one) and close() returns it. Streamlit runs every rerun on a
+# fresh thread, so connections must not be tied to threads; the pool keeps at
+# most DB_CONFIG['POOL_SIZE'] idle connections of each kind and closes the rest.
+# The database runs in WAL mode, so readers never block the writer (and vice
+# versa); busy_timeout makes concurrent writers wait instead of failing with
+# "database is locked".
+
+class ManagedConnection(sqlite3.Connection):
+    """Pooled connection: close() ends the caller's work and returns the connection to its pool"""
+
+    _pool = None
+
+    def close(self):
+        pool, self._pool = self._pool, None
+        if pool is None:
+            # Already returned (or never pooled)
+            return
+        # Same effect for the caller as a real close: uncommitted work is discarded
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = None
+        self.isolation_level = ''
+        pool.release(self)
+
+    def close_for_real(self):
+        super().close()
+
+class _ConnectionPool:
+    def __init__(self, readonly):
+        self.readonly = readonly
+        self.pid = os.getpid()
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = _connect(self.readonly)
+        conn._pool = self
+        return conn
+
+    def release(self, conn):
+        if self.pid != os.getpid():
+            # Inherited across a fork: leave it to the parent
+            return
+        with self._lock:
+            if len(self._idle) < DB_CONFIG['POOL_SIZE']:
+                self._idle.append(conn)
+                return
+        conn.close_for_real()
+
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close_for_real()
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+def _apply_pragmas(conn, readonly):
+    if not readonly:
+        conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_CONFIG['BUSY_TIMEOUT_MS'])}")
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f"PRAGMA cache_size = -{int(DB_CONFIG['CACHE_SIZE_KB'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(DB_CONFIG['MMAP_SIZE'])}")
+
+def _connect(readonly):
+    timeout = DB_CONFIG['BUSY_TIMEOUT_MS'] / 1000
+    if readonly:
+        # Quoted so '?', '#' or '%' in the path can't end it early
+        uri = 'file:' + urllib.parse.quote(os.path.abspath(DB_CONFIG['DATABASE_NAME'])) + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, timeout=timeout, factory=ManagedConnection,
+                               check_same_thread=False)
+    else:
+        conn = sqlite3.connect(DB_CONFIG['DATABASE_NAME'], timeout=timeout, factory=ManagedConnection,
+                               check_same_thread=False)
+    _apply_pragmas(conn, readonly)
+    return conn
+
+def _pool(readonly):
+    global _pools, _pools_pid
+    with _pools_lock:
+        # Connections must not cross a fork: a child starts with empty pools
+        if _pools_pid != os.getpid():
+            _pools, _pools_pid = {}, os.getpid()
+        pool = _pools.get(readonly)
+        if pool is None:
+            pool = _pools[readonly] = _ConnectionPool(readonly)
+        return pool
+
+def get_db_connection():
+    return _pool(readonly=False).acquire()
+
+def get_read_connection():
+    # Read-only connections can't take the write lock, so they never stall writers
+    return _pool(readonly=True).acquire()
+
+def close_connections():
+    # Really close this process's idle connections (e.g. before a worker exits)
+    for readonly in (False, True):
+        _pool(readonly).close_idle()
+
+def _migration_1_base_schema(c):
     # Users table
     c.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -207,37 +319,402 @@ def init_db():
     ''')
     
     # Insert default user
+    user = DB_CONFIG['INITIAL_USER']
+    hashed_password = hashlib.sha256(user['password'].encode()).hexdigest()
+    c.execute('INSERT OR IGNORE INTO users (username, password, email) VALUES (?, ?, ?)',
+             (user['username'], hashed_password, user['email']))
+
+def _migration_2_render_jobs(c):
+    # Render job queue (see render_worker.py)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS render_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_no TEXT NOT NULL,
+            template_name TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker_id TEXT,
+            result_path TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_render_jobs_status ON render_jobs (status, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_render_jobs_project ON render_jobs (project_no, id)')
+
+def _migration_3_listing_indexes(c):
+    # Listing / filtering indexes (created_at also carries id as the rowid)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_projects_created_at ON projects (created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_projects_status ON projects (status, created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_projects_client ON projects (client)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_projects_site ON projects (site)')
+
+# Full-text search over every text column of projects, except the ones that change
+# on status updates (so the FTS row isn't rewritten for a status change)
+_FTS_EXCLUDED_COLUMNS = {'id', 'status', 'created_at', 'updated_at'}
+
+def _fts_columns(c):
+    c.execute('PRAGMA table_info(projects)')
+    return [row[1] for row in c.fetchall()
+            if row[1] not in _FTS_EXCLUDED_COLUMNS and (row[2] or '').upper() == 'TEXT']
+
+def _migration_4_projects_fts(c):
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'projects_fts'")
+    if c.fetchone():
+        return
+    columns = _fts_columns(c)
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{col}' for col in columns)
+    old_values = ', '.join(f'old.{col}' for col in columns)
+    # External-content table: the text lives in projects, FTS5 only stores the index
+    c.execute(f"CREATE VIRTUAL TABLE projects_fts USING fts5({cols}, content='projects', content_rowid='id', "
+              "tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+    c.execute(f'''CREATE TRIGGER projects_fts_ai AFTER INSERT ON projects BEGIN
+        INSERT INTO projects_fts (rowid, {cols}) VALUES (new.id, {new_values});
+    END''')
+    c.execute(f'''CREATE TRIGGER projects_fts_ad AFTER DELETE ON projects BEGIN
+        INSERT INTO projects_fts (projects_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+    END''')
+    c.execute(f'''CREATE TRIGGER projects_fts_au AFTER UPDATE OF {cols} ON projects BEGIN
+        INSERT INTO projects_fts (projects_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+        INSERT INTO projects_fts (rowid, {cols}) VALUES (new.id, {new_values});
+    END''')
+    # Index the rows that existed before the table was created
+    c.execute("INSERT INTO projects_fts (projects_fts) VALUES ('rebuild')")
+
+# Per-status project counts for the dashboard, kept exact by triggers
+def _migration_5_status_counts(c):
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'status_counts'")
+    if c.fetchone():
+        return
+    c.execute('CREATE TABLE status_counts (status TEXT PRIMARY KEY NOT NULL, count INTEGER NOT NULL DEFAULT 0)')
+    c.execute('''CREATE TRIGGER status_counts_ai AFTER INSERT ON projects BEGIN
+        INSERT INTO status_counts (status, count) VALUES (IFNULL(new.status, ''), 1)
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+    END''')
+    c.execute('''CREATE TRIGGER status_counts_ad AFTER DELETE ON projects BEGIN
+        UPDATE status_counts SET count = count - 1 WHERE status = IFNULL(old.status, '');
+    END''')
+    c.execute('''CREATE TRIGGER status_counts_au AFTER UPDATE OF status ON projects
+        WHEN old.status IS NOT new.status BEGIN
+        UPDATE status_counts SET count = count - 1 WHERE status = IFNULL(old.status, '');
+        INSERT INTO status_counts (status, count) VALUES (IFNULL(new.status, ''), 1)
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+    END''')
+    c.execute("INSERT INTO status_counts (status, count) SELECT IFNULL(status, ''), COUNT(*) FROM projects GROUP BY 1")
+
+def _migration_6_render_job_generator(c):
+    # Module that renders the job (None = pdf_generator); see render_worker.GENERATORS
+    c.execute('PRAGMA table_info(render_jobs)')
+    if 'generator' not in [row[1] for row in c.fetchall()]:
+        c.execute('ALTER TABLE render_jobs ADD COLUMN generator TEXT')
+
+# Schema migrations: (version, description, function). Append new entries with the
+# next number; never edit or reorder applied ones. Every step must be idempotent,
+# because databases created before schema_version existed replay them all.
+MIGRATIONS = [
+    (1, 'users and projects tables, default user', _migration_1_base_schema),
+    (2, 'render job queue', _migration_2_render_jobs),
+    (3, 'project listing indexes', _migration_3_listing_indexes),
+    (4, 'projects full-text index', _migration_4_projects_fts),
+    (5, 'status counters', _migration_5_status_counts),
+    (6, 'render job generator', _migration_6_render_job_generator),
+]
+
+def get_schema_version(c):
+    c.execute('CREATE TABLE IF NOT EXISTS schema_version ('
+              'version INTEGER PRIMARY KEY, description TEXT, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+    c.execute('SELECT MAX(version) FROM schema_version')
+    return c.fetchone()[0] or 0
+
+def run_migrations():
+    conn = get_db_connection()
+    conn.isolation_level = None
+    c = conn.cursor()
     try:
-        hashed_password = hashlib.sha256('admin123'.encode()).hexdigest()
-        c.execute('INSERT INTO users (username, password, email) VALUES (?, ?, ?)',
-                 ('admin', hashed_password, 'admin@company.com'))
-    except sqlite3.IntegrityError:
-        pass  # User already exists
-    
-    conn.commit()
-    conn.close()
+        applied = []
+        for version, description, migrate in MIGRATIONS:
+            if version <= get_schema_version(c):
+                continue
+            # One transaction per step; re-check under the write lock in case
+            # another process applied it meanwhile
+            c.execute('BEGIN IMMEDIATE')
+            if version > get_schema_version(c):
+                migrate(c)
+                c.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)', (version, description))
+                applied.append(version)
+            c.execute('COMMIT')
+        return applied
+    except Exception:
+        if conn.in_transaction:
+            c.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
 
-def get_db_connection():
-    return sqlite3.connect('wsm_projects.db')
+_db_initialized = False
+_init_lock = threading.Lock()
+
+def init_db():
+    # Streamlit re-runs the app script on every interaction; migrate once per process
+    global _db_initialized, _project_columns
+    if _db_initialized:
+        return
+    with _init_lock:
+        if not _db_initialized:
+            applied = run_migrations()
+            if applied:
+                _project_columns = None
+                print(f"[database] Applied schema migrations: {', '.join(map(str, applied))}")
+            _db_initialized = True
 
 def get_project_by_number(project_no):
-    conn = get_db_connection()
+    conn = get_read_connection()
     c = conn.cursor()
     c.execute('SELECT * FROM projects WHERE project_no = ?', (project_no,))
     project = c.fetchone()
     conn.close()
     return project
 
+_project_columns = None
+
+def get_project_columns():
+    # Column names of the projects table, read once per process
+    global _project_columns
+    if _project_columns is None:
+        conn = get_read_connection()
+        c = conn.cursor()
+        c.execute('PRAGMA table_info(projects)')
+        _project_columns = [row[1] for row in c.fetchall()]
+        conn.close()
+    return _project_columns
+
+def get_project_fields(project_no, columns=None):
+    # One project as a dict, restricted to `columns` when given (names that aren't
+    # projects columns are ignored); None if the project doesn't exist
+    if columns is None:
+        selected = get_project_columns()
+    else:
+        selected = [col for col in get_project_columns() if col in columns] or ['project_no']
+    conn = get_read_connection()
+    c = conn.cursor()
+    c.execute('SELECT ' + ', '.join(f'"{col}"' for col in selected) + ' FROM projects WHERE project_no = ?',
+             (project_no,))
+    row = c.fetchone()
+    conn.close()
+    return dict(zip(selected, row)) if row else None
+
+def get_project_template(project_no):
+    conn = get_read_connection()
+    c = conn.cursor()
+    c.execute('SELECT wsm_type FROM projects WHERE project_no = ?', (project_no,))
+    row = c.fetchone()
+    conn.close()
+    return row[0] if row else None
+
 def get_all_projects():
-    conn = get_db_connection()
+    conn = get_read_connection()
     projects = pd.read_sql('SELECT project_no, status, created_by, created_at, client, site FROM projects ORDER BY created_at DESC', conn)
     conn.close()
     return projects
 
+def get_projects_page(page_size=25, after=None, status=None):
+    # Keyset pagination, newest first. `after` is the (created_at, id) cursor of the
+    # previous page's last row; returns (DataFrame, cursor for the next page or None).
+    clauses = []
+    params = []
+    if status:
+        clauses.append('status = ?')
+        params.append(status)
+    if after is not None:
+        clauses.append('(created_at, id) < (?, ?)')
+        params.extend(after)
+    where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+    # Fetch one extra row to learn whether another page exists
+    params.append(page_size + 1)
+    conn = get_read_connection()
+    projects = pd.read_sql(f'SELECT id, project_no, status, created_by, created_at, client, site FROM projects {where} '
+                           'ORDER BY created_at DESC, id DESC LIMIT ?', conn, params=params)
+    conn.close()
+    next_cursor = None
+    if len(projects) > page_size:
+        projects = projects.iloc[:page_size]
+        last = projects.iloc[-1]
+        next_cursor = (last['created_at'], int(last['id']))
+    return projects, next_cursor
+
+def _fts_query(text):
+    # Turn free text into an FTS5 query: every word must match, as a prefix
+    terms = [t.replace('"', '') for t in text.split()]
+    return ' '.join(f'"{t}"*' for t in terms if t)
+
+def search_projects(query, page_size=25, offset=0, status=None):
+    # Ranked (bm25) full-text search with a snippet of the best-matching field;
+    # returns (DataFrame, offset of the next page or None)
+    fts_query = _fts_query(query)
+    if not fts_query:
+        return pd.DataFrame(columns=['id', 'project_no', 'status', 'created_by', 'created_at', 'client', 'site', 'snippet']), None
+    status_clause = 'AND p.status = ?' if status else ''
+    params = [fts_query] + ([status] if status else []) + [page_size + 1, offset]
+    conn = get_read_connection()
+    projects = pd.read_sql(f'''
+        SELECT p.id, p.project_no, p.status, p.created_by, p.created_at, p.client, p.site,
+               snippet(projects_fts, -1, '**', '**', '...', 12) AS snippet
+        FROM projects_fts JOIN projects p ON p.id = projects_fts.rowid
+        WHERE projects_fts MATCH ? {status_clause}
+        ORDER BY projects_fts.rank
+        LIMIT ? OFFSET ?''', conn, params=params)
+    conn.close()
+    next_offset = None
+    if len(projects) > page_size:
+        projects = projects.iloc[:page_size]
+        next_offset = offset + page_size
+    return projects, next_offset
+
+def get_project_numbers(status=None, search=None):
+    # Every project_no matching the status filter and/or full-text search, newest first
+    params = []
+    if search:
+        fts_query = _fts_query(search)
+        if not fts_query:
+            return []
+        sql = ('SELECT p.project_no FROM projects_fts JOIN projects p ON p.id = projects_fts.rowid '
+               'WHERE projects_fts MATCH ?')
+        params.append(fts_query)
+        if status:
+            sql += ' AND p.status = ?'
+            params.append(status)
+        sql += ' ORDER BY p.created_at DESC, p.id DESC'
+    else:
+        sql = 'SELECT project_no FROM projects'
+        if status:
+            sql += ' WHERE status = ?'
+            params.append(status)
+        sql += ' ORDER BY created_at DESC, id DESC'
+    conn = get_read_connection()
+    c = conn.cursor()
+    c.execute(sql, params)
+    project_nos = [row[0] for row in c.fetchall()]
+    conn.close()
+    return project_nos
+
+def get_status_summary():
+    # {status: project count}; reads the trigger-maintained status_counts table
+    conn = get_read_connection()
+    c = conn.cursor()
+    c.execute('SELECT status, count FROM status_counts WHERE count > 0')
+    summary = dict(c.fetchall())
+    conn.close()
+    return summary
+
 def update_project_status(project_no, status):
     conn = get_db_connection()
     c = conn.cursor()
     c.execute('UPDATE projects SET status = ?, updated_at = ? WHERE project_no = ?',
              (status, datetime.now().isoformat(), project_no))
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+# Render job queue: status is one of queued / running / done / failed
+
+def _render_job_dict(c, row):
+    return {d[0]: v for d, v in zip(c.description, row)} if row else None
+
+def enqueue_render_job(project_no, template_name=None, generator=None):
+    # generator: module the worker renders with (None = pdf_generator)
+    conn = get_db_connection()
+    conn.isolation_level = None
+    c = conn.cursor()
+    try:
+        # IMMEDIATE: the check and the insert are one step, so two sessions can't both enqueue the project
+        c.execute('BEGIN IMMEDIATE')
+        # Reuse a job that is already waiting for this project
+        c.execute("SELECT id FROM render_jobs WHERE project_no = ? AND generator IS ? "
+                  "AND status IN ('queued', 'running') ORDER BY id DESC LIMIT 1", (project_no, generator))
+        row = c.fetchone()
+        if row:
+            job_id = row[0]
+        else:
+            c.execute('INSERT INTO render_jobs (project_no, template_name, generator) VALUES (?, ?, ?)',
+                      (project_no, template_name, generator))
+            job_id = c.lastrowid
+        c.execute('COMMIT')
+        return job_id
+    except Exception:
+        if conn.in_transaction:
+            c.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def claim_render_job(worker_id):
+    conn = get_db_connection()
+    conn.isolation_level = None
+    c = conn.cursor()
+    try:
+        # IMMEDIATE takes the write lock up front, so two workers can't pick the same row
+        c.execute('BEGIN IMMEDIATE')
+        c.execute("SELECT id FROM render_jobs WHERE status = 'queued' ORDER BY id LIMIT 1")
+        row = c.fetchone()
+        if not row:
+            c.execute('COMMIT')
+            return None
+        c.execute("UPDATE render_jobs SET status = 'running', worker_id = ?, attempts = attempts + 1, "
+                  "started_at = ?, error = NULL WHERE id = ? AND status = 'queued'",
+                  (worker_id, datetime.now().isoformat(), row[0]))
+        c.execute('SELECT * FROM render_jobs WHERE id = ?', (row[0],))
+        job = _render_job_dict(c, c.fetchone())
+        c.execute('COMMIT')
+        return job
+    except Exception:
+        if conn.in_transaction:
+            c.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def complete_render_job(job_id, result_path):
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("UPDATE render_jobs SET status = 'done', result_path = ?, finished_at = ? WHERE id = ?",
+             (result_path, datetime.now().isoformat(), job_id))
+    conn.commit()
+    conn.close()
+
+def fail_render_job(job_id, error, max_attempts=3):
+    conn = get_db_connection()
+    c = conn.cursor()
+    # Requeue until the job has used up its attempts
+    c.execute("UPDATE render_jobs SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END, "
+              "error = ?, finished_at = ? WHERE id = ?",
+             (max_attempts, str(error), datetime.now().isoformat(), job_id))
+    conn.commit()
+    conn.close()
+
+def requeue_stale_render_jobs(older_than_seconds, max_attempts=3):
+    # Jobs left 'running' by a worker that died or was restarted go back to the queue,
+    # unless they have used up their attempts (e.g. a project that crashes every worker)
+    now = datetime.now()
+    cutoff = datetime.fromtimestamp(now.timestamp() - older_than_seconds).isoformat()
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("UPDATE render_jobs SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END, "
+              "worker_id = NULL, "
+              "error = CASE WHEN attempts < ? THEN error ELSE 'Worker lease expired on the last attempt' END, "
+              "finished_at = CASE WHEN attempts < ? THEN finished_at ELSE ? END "
+              "WHERE status = 'running' AND started_at < ?",
+             (max_attempts, max_attempts, max_attempts, now.isoformat(), cutoff))
+    count = c.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+def get_render_job(job_id):
+    conn = get_read_connection()
+    c = conn.cursor()
+    c.execute('SELECT * FROM render_jobs WHERE id = ?', (job_id,))
+    job = _render_job_dict(c, c.fetchone())
+    conn.close()
+    return job
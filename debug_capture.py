@@ -0,0 +1,165 @@
+"""
+debug_capture.py
+
+Opt-in capture of PDF debug artifacts (the final HTML, the xhtml2pdf log, ...).
+
+Conversions used to write wsm_debug.html and wsm_pisa_log.txt into the working
+directory on every request: disk I/O on the hot path, and concurrent sessions
+overwrote each other's files. Now capture is off by default and is switched on
+per request (generate_pdf(..., debug=True)), globally (DEBUG_CAPTURE) or for a
+random sample of requests (DEBUG_SAMPLE_RATE).
+
+Captured artifacts are handed to a background writer thread and land in
+DEBUG_DIR/<request_id>/, where request IDs start with a UTC timestamp so they
+sort chronologically. Only the newest DEBUG_MAX_REQUESTS directories are kept.
+
+Usage:
+
+    with debug_capture.capture(debug) as cap:   # cap is None when not capturing
+        debug_capture.add("source.html", html)  # no-op outside an active capture
+
+Provides:
+    - capture(debug=None) -> context manager yielding Capture | None
+    - add(name, content) -> None (attach an artifact to the active capture, if any)
+    - annotate(**fields) -> None (add fields to the active capture's meta.json)
+    - flush(timeout=None) -> None (wait for pending writes)
+"""
+
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import queue
+import random
+import shutil
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+from config import PDF_CONFIG
+
+_current = contextvars.ContextVar("debug_capture", default=None)
+_queue = queue.Queue(maxsize=256)
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class Capture:
+    """Artifacts of one request, written under DEBUG_DIR/<request_id>/."""
+
+    def __init__(self):
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        self.request_id = f"{stamp}-{uuid.uuid4().hex[:8]}"
+        self.path = os.path.join(PDF_CONFIG['DEBUG_DIR'], self.request_id)
+        self.meta = {"request_id": self.request_id}
+
+    def add(self, name: str, content: Union[str, bytes]) -> None:
+        """Queue an artifact for writing; dropped (with a message) if the writer is backed up."""
+        _ensure_writer()
+        try:
+            _queue.put_nowait((self.path, name, content))
+        except queue.Full:
+            print(f"[debug_capture] Writer queue full; dropping {name} for request {self.request_id}")
+
+
+def _should_capture(debug: Optional[bool]) -> bool:
+    if debug is not None:
+        return debug
+    if PDF_CONFIG['DEBUG_CAPTURE']:
+        return True
+    rate = PDF_CONFIG['DEBUG_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+
+@contextlib.contextmanager
+def capture(debug: Optional[bool] = None):
+    """
+    Start a capture for the enclosed work if debug is True, or (debug=None) if
+    DEBUG_CAPTURE is on or the request is sampled. Yields the Capture or None.
+    Capture.meta is written as meta.json when the block exits.
+    """
+    if not _should_capture(debug):
+        yield None
+        return
+    cap = Capture()
+    token = _current.set(cap)
+    print(f"[debug_capture] Capturing request {cap.request_id} in {cap.path}")
+    try:
+        yield cap
+    except BaseException as e:
+        cap.meta["error"] = repr(e)
+        raise
+    finally:
+        _current.reset(token)
+        cap.add("meta.json", json.dumps(cap.meta, indent=2, default=str))
+
+
+def add(name: str, content: Union[str, bytes]) -> None:
+    """Attach an artifact to the capture active in this context; does nothing otherwise."""
+    cap = _current.get()
+    if cap is not None:
+        cap.add(name, content)
+
+
+def annotate(**fields) -> None:
+    """Add fields to the active capture's meta.json; does nothing outside a capture."""
+    cap = _current.get()
+    if cap is not None:
+        cap.meta.update(fields)
+
+
+# ---- background writer -------------------------------------------------
+
+def _prune(base_dir: str) -> None:
+    """Keep only the newest DEBUG_MAX_REQUESTS request directories."""
+    try:
+        request_dirs = sorted(name for name in os.listdir(base_dir)
+                              if os.path.isdir(os.path.join(base_dir, name)))
+    except OSError:
+        return
+    for name in request_dirs[:max(len(request_dirs) - PDF_CONFIG['DEBUG_MAX_REQUESTS'], 0)]:
+        shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)
+
+
+def _write(path: str, name: str, content: Union[str, bytes]) -> None:
+    created = not os.path.isdir(path)
+    os.makedirs(path, exist_ok=True)
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    with open(os.path.join(path, name), "wb") as fh:
+        fh.write(data)
+    if created:
+        _prune(os.path.dirname(path))
+
+
+def _run_writer() -> None:
+    while True:
+        path, name, content = _queue.get()
+        try:
+            _write(path, name, content)
+        except Exception as e:
+            print(f"[debug_capture] Could not write {name} to {path}: {e}")
+        finally:
+            _queue.task_done()
+
+
+def _ensure_writer() -> None:
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        with _writer_lock:
+            if _writer is None or not _writer.is_alive():
+                _writer = threading.Thread(target=_run_writer, name="debug-capture-writer", daemon=True)
+                _writer.start()
+
+
+def flush(timeout: Optional[float] = None) -> None:
+    """Wait until queued artifacts are written (at most timeout seconds)."""
+    if _writer is None:
+        return
+    done = threading.Event()
+    threading.Thread(target=lambda: (_queue.join(), done.set()), daemon=True).start()
+    done.wait(timeout)
+
+
+atexit.register(flush, 5.0)
@@ -0,0 +1,156 @@
+"""
+engine_stats.py
+
+Per-(template, engine) conversion statistics for pdf_generator, with a circuit
+breaker and adaptive engine ordering.
+
+Without this, every conversion walks PDF_CONFIG['ENGINE_ORDER'] from the top,
+so an engine that keeps failing on a template (xhtml2pdf on whrb_wsm.html's
+CSS, say) costs a failed attempt on every request before the chain falls
+through. Here each conversion attempt is recorded, and:
+
+- after BREAKER_FAILURES consecutive failures the engine is skipped for that
+  template ("open") for BREAKER_COOLDOWN seconds; then a single request probes
+  it again ("half-open") and either closes the breaker or re-opens it
+- with ENGINE_ADAPTIVE_ORDER enabled, engines are tried by fidelity tier
+  (pdf_engines.py; WeasyPrint and wkhtmltopdf above xhtml2pdf), and only
+  within a tier by latency: engines that have at least ENGINE_MIN_SAMPLES
+  successful conversions go fastest-first by p95, engines with fewer samples
+  keep their configured place ahead of them, so each engine gets measured.
+  A faster engine is never preferred over a more faithful one. With the flag
+  off, ENGINE_ORDER is kept as configured
+
+Statistics live in memory, per process (each render pool worker keeps its own).
+
+Provides:
+    - order_engines(template_name, names) -> list[str] (names to try, best first)
+    - record(template_name, engine, seconds, ok) -> None
+    - snapshot() -> list[dict] (per-(template, engine) counters, p50/p95, breaker state)
+    - reset() -> None
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import pdf_engines
+from config import PDF_CONFIG
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class _EngineStats:
+    """Counters, recent latencies and breaker state for one (template, engine) pair."""
+
+    def __init__(self, window: int):
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latencies = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_started = None
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(1, math.ceil(pct / 100.0 * len(ordered))) - 1]
+
+
+_stats = {}
+_lock = threading.Lock()
+
+
+def _key(template_name: Optional[str]) -> str:
+    # Raw HTML conversions share one bucket
+    return template_name or "<html>"
+
+
+def _get(template_name: Optional[str], engine: str) -> _EngineStats:
+    key = (_key(template_name), engine)
+    stats = _stats.get(key)
+    if stats is None:
+        stats = _stats[key] = _EngineStats(PDF_CONFIG['ENGINE_STATS_WINDOW'])
+    return stats
+
+
+def order_engines(template_name: Optional[str], names: list) -> list:
+    """
+    Filter and reorder names (in configured priority order) for one conversion.
+    Engines with an open breaker are left out; an engine whose cooldown has
+    elapsed is let through for a single probe.
+    """
+    now = time.monotonic()
+    allowed = []
+    with _lock:
+        for position, name in enumerate(names):
+            stats = _get(template_name, name)
+            if stats.state == OPEN:
+                if now - stats.opened_at < PDF_CONFIG['BREAKER_COOLDOWN']:
+                    continue
+                stats.state = HALF_OPEN
+            if stats.state == HALF_OPEN:
+                # One probe at a time; a probe that was never attempted (an earlier
+                # engine succeeded) expires after another cooldown
+                if stats.probe_started is not None and now - stats.probe_started < PDF_CONFIG['BREAKER_COOLDOWN']:
+                    continue
+                stats.probe_started = now
+            p95 = stats.percentile(95) if len(stats.latencies) >= PDF_CONFIG['ENGINE_MIN_SAMPLES'] else None
+            allowed.append((position, name, p95))
+
+    if not PDF_CONFIG['ENGINE_ADAPTIVE_ORDER']:
+        return [name for _, name, _ in allowed]
+    # Highest fidelity first; within a tier, engines still being measured first
+    # (configured order), then measured ones fastest-first
+    return [name for _, name, _ in sorted(allowed, key=lambda item: (
+        -pdf_engines.get_engine(item[1]).fidelity, item[2] is not None, item[2] or 0.0, item[0]))]
+
+
+def record(template_name: Optional[str], engine: str, seconds: float, ok: bool) -> None:
+    """Record one conversion attempt and update the breaker."""
+    with _lock:
+        stats = _get(template_name, engine)
+        stats.probe_started = None
+        if ok:
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.latencies.append(seconds)
+            if stats.state != CLOSED:
+                print(f"[engine_stats] {engine} recovered on {_key(template_name)}; closing breaker.")
+            stats.state = CLOSED
+            return
+
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        if stats.state == HALF_OPEN or stats.consecutive_failures >= PDF_CONFIG['BREAKER_FAILURES']:
+            if stats.state != OPEN:
+                print(f"[engine_stats] {engine} failed {stats.consecutive_failures} time(s) in a row on "
+                      f"{_key(template_name)}; skipping it for {PDF_CONFIG['BREAKER_COOLDOWN']:.0f}s.")
+            stats.state = OPEN
+            stats.opened_at = time.monotonic()
+
+
+def snapshot() -> list:
+    """Current statistics, one dict per (template, engine) pair."""
+    with _lock:
+        return [{
+            "template": template,
+            "engine": engine,
+            "successes": stats.successes,
+            "failures": stats.failures,
+            "consecutive_failures": stats.consecutive_failures,
+            "p50": stats.percentile(50),
+            "p95": stats.percentile(95),
+            "breaker": stats.state,
+        } for (template, engine), stats in sorted(_stats.items())]
+
+
+def reset() -> None:
+    """Forget all statistics and close every breaker."""
+    with _lock:
+        _stats.clear()
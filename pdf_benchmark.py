@@ -0,0 +1,323 @@
+"""
+pdf_benchmark.py
+
+Benchmark of the rendering path: every template x every available engine x
+three text variants, with regression tracking against a stored baseline.
+
+Each (template, engine, variant) cell runs in a fresh worker process, so the
+peak RSS it reports belongs to that cell alone and engine import time is kept
+out of the timings (the engine is loaded and one warm-up render is done before
+measuring). Per cell it records:
+    - wall time (min / p50 / max over --repeat renders; Jinja render + conversion)
+    - CPU time, including subprocesses such as wkhtmltopdf
+    - peak RSS of the worker process (and of its subprocesses)
+    - HTML and PDF output size
+
+The native ReportLab renderer (pdf_native.py) is benchmarked as engine
+'reportlab-native' for the templates it has a layout for; it renders no HTML,
+so its wall time is the whole build and its HTML size is 0.
+
+Project data is synthetic but fully populated: every variable any template
+references gets a plausible value, and the *_other_requirements free-text
+fields are filled with one of
+    - short          a few words
+    - long           several paragraphs of realistic requirements text
+    - pathological   unbroken 5,000-character tokens, markup characters,
+                     hundreds of line breaks and non-Latin text
+
+Usage (through the wsm_pdf CLI):
+
+    python -m wsm_pdf bench                                  # everything, results in bench_results.json
+    python -m wsm_pdf bench --templates STD_WSM --engines xhtml2pdf --repeat 5
+    python -m wsm_pdf bench --save-baseline                  # store as the new baseline
+    python -m wsm_pdf bench --baseline benchmarks/baseline.json --tolerance 0.2
+
+Compared with a baseline, a cell regresses when its p50 wall time grows by
+more than --tolerance (relative) and --min-delta-ms (absolute), or when it
+used to succeed and now fails. Baseline cells the run should have covered but
+did not, and baseline cells that failed themselves (so there is nothing to
+compare with), are reported as well. The exit status is 1 if anything was
+reported. benchmarks/baseline.json holds the full templates x engines x variants
+grid for the engines installed where it was recorded.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from config import PDF_CONFIG
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+VARIANTS = ("short", "long", "pathological")
+
+_MAKES = ("Siemens", "Weishaupt", "Baltur", "Riello", "ABB", "Schneider Electric", "Honeywell", "Danfoss")
+_CHOICES = ("Yes", "No", "As per standard", "Client scope", "Supplier scope", "Required", "Not required")
+_REQUIREMENT_SENTENCES = (
+    "All pressure parts shall be designed and tested in accordance with IBR 1950 and the latest amendments.",
+    "The burner management system shall include flame failure, low water level and high pressure trips.",
+    "Refractory and insulation shall be suitable for continuous operation at the maximum flue gas temperature.",
+    "Client to provide soft water at the battery limits with hardness below 5 ppm as CaCO3.",
+    "Painting shall be one coat of red oxide primer and two coats of heat resistant aluminium paint.",
+    "Vendor shall submit GA drawing, P&ID and cable schedule for approval within two weeks of the PO.",
+    "All instruments shall be tagged and calibrated, with calibration certificates supplied at dispatch.",
+    "Performance guarantee test to be conducted at site at 100% MCR for a continuous period of eight hours.",
+)
+
+
+def _requirements_text(variant: str, rng: random.Random) -> str:
+    if variant == "short":
+        return rng.choice(("None", "As per standard", "Refer to client specification"))
+    if variant == "long":
+        paragraphs = []
+        for _ in range(6):
+            paragraphs.append(" ".join(rng.choice(_REQUIREMENT_SENTENCES) for _ in range(5)))
+        return "\n\n".join(paragraphs)
+    # pathological: nothing to break lines on, markup characters, many newlines, mixed scripts
+    return "".join((
+        "X" * 5000, " ",
+        "<b>unclosed <i>tags & ampersands &amp; \"quotes\" 'apostrophes' </td></tr></table> ",
+        "line\n" * 300,
+        "°C ± µS/cm ≥ 10 kg/cm² — 蒸汽锅炉 — पाइपिंग — ", "😀" * 50, " ",
+        "-".join(["hyphenated"] * 400),
+    ))
+
+
+def _field_value(name: str, variant: str, rng: random.Random) -> str:
+    """A plausible value for a template variable, chosen from its name."""
+    today = datetime(2025, 10, 10, 14, 30)
+    if name.endswith("other_requirements") or name in ("non_standard_requirement", "special_documentation"):
+        return _requirements_text(variant, rng)
+    if name in ("created_at", "current_timestamp", "generated_date"):
+        return today.strftime("%Y-%m-%d %H:%M:%S")
+    if name.endswith("date") or name == "date":
+        return (today + timedelta(days=rng.randint(-30, 180))).strftime("%Y-%m-%d")
+    if name == "project_no":
+        return f"WSM-20251010-{rng.getrandbits(32):08X}"
+    if name == "client":
+        return rng.choice(("Arvind Textiles Ltd", "Hindalco Industries", "Nestle India Pvt Ltd", "Tata Chemicals"))
+    if name == "site":
+        return rng.choice(("Ahmedabad, Gujarat", "Pune, Maharashtra", "Hosur, Tamil Nadu", "Baddi, Himachal Pradesh"))
+    if name == "status":
+        return rng.choice(("Submitted", "Approved", "Waiting for MRO Confirmation", "Completed"))
+    if name == "company_logo":
+        return ""
+    if "pressure" in name:
+        return f"{rng.uniform(7, 25):.2f} kg/cm2(g)"
+    if "temp" in name:
+        return f"{rng.randint(90, 450)} deg C"
+    if "capacity" in name or name.endswith("_load") or "_load_" in name:
+        return f"{rng.choice((2, 3, 5, 8, 10, 15, 20))} TPH"
+    if "flow" in name:
+        return f"{rng.randint(2000, 60000):,} kg/h"
+    if "voltage" in name:
+        return rng.choice(("415 V, 3 Ph, 50 Hz", "230 V, 1 Ph, 50 Hz", "110 V AC", "24 V DC"))
+    if "frequency" in name:
+        return "50 Hz"
+    if "quantity" in name or name.endswith("_qty") or "copies" in name or "count" in name:
+        return str(rng.randint(1, 4))
+    if "make" in name:
+        return rng.choice(_MAKES)
+    if "model" in name:
+        return f"{rng.choice(('RS', 'GP', 'WM', 'TBG'))}-{rng.randint(10, 900)}"
+    if "fuel" in name:
+        return rng.choice(("Natural Gas", "LDO", "HSD", "FO", "Biomass", "Coal"))
+    if "type" in name:
+        return rng.choice(("Fire tube", "Water tube", "Packaged", "Modulating", "Two stage", "Skid mounted"))
+    if name in ("reviewed_by", "created_by", "signature", "branch_engineer", "division_engineer",
+                "site_supervisor", "safety_officer", "consultant"):
+        return rng.choice(("R. Sharma", "A. Patel", "S. Iyer", "M. Khan", "P. Desai"))
+    return rng.choice(_CHOICES)
+
+
+def sample_project(template_name: str, variant: str, seed: int = 0) -> dict:
+    """A fully populated project dict covering every variable template_name references."""
+    import template_manager
+
+    rng = random.Random(f"{seed}:{template_name}:{variant}")
+    return {name: _field_value(name, variant, rng) for name in sorted(template_manager.get_template_fields(template_name))}
+
+
+def _rusage() -> tuple:
+    """(cpu seconds of self + children, peak RSS KiB of self, peak RSS KiB of children)."""
+    if resource is None:
+        return time.process_time(), None, None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 if sys.platform == "darwin" else 1
+    return (own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+            own.ru_maxrss // scale, children.ru_maxrss // scale)
+
+
+def _bench_cell(template_name: str, engine_name: str, variant: str, repeat: int, seed: int) -> dict:
+    """Run one cell; executed in a fresh worker process."""
+    import pdf_engines
+    import pdf_native
+    import template_manager
+
+    result = {"template": template_name, "engine": engine_name, "variant": variant, "ok": False}
+    native = engine_name == pdf_native.ENGINE_NAME
+    engine = pdf_native if native else pdf_engines.get_engine(engine_name)
+    if not engine.is_available():
+        result["error"] = "engine not available"
+        return result
+    project_data = sample_project(template_name, variant, seed)
+
+    def render() -> tuple:
+        if native:
+            return 0, pdf_native.render(template_name, project_data)
+        if not engine.takes_html:
+            return 0, engine.convert(project_data)
+        html = template_manager.get_template_content(template_name, project_data)
+        return len(html.encode("utf-8")), engine.convert(html)
+
+    try:
+        render()  # warm-up: imports, template compilation, font loading
+        walls = []
+        cpu_start = _rusage()[0]
+        for _ in range(repeat):
+            started = time.perf_counter()
+            html_bytes, pdf_bytes = render()
+            walls.append(time.perf_counter() - started)
+            if not pdf_bytes:
+                raise RuntimeError("engine returned no output")
+        cpu_total, rss_kb, children_rss_kb = _rusage()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    walls.sort()
+    result.update({
+        "ok": True,
+        "repeat": repeat,
+        "wall_min_ms": round(walls[0] * 1000, 2),
+        "wall_p50_ms": round(walls[len(walls) // 2] * 1000, 2),
+        "wall_max_ms": round(walls[-1] * 1000, 2),
+        "cpu_ms": round((cpu_total - cpu_start) / repeat * 1000, 2),
+        "peak_rss_kb": rss_kb,
+        "children_peak_rss_kb": children_rss_kb,
+        "html_bytes": html_bytes,
+        "pdf_bytes": len(pdf_bytes),
+    })
+    return result
+
+
+def run(templates: Optional[list] = None, engines: Optional[list] = None, variants: Optional[list] = None,
+        repeat: int = 3, seed: int = 0) -> dict:
+    """Benchmark every requested cell (default: all templates, installed engines, variants)."""
+    import pdf_engines
+    import pdf_native
+    import template_manager
+
+    templates = templates or list(template_manager.get_available_templates())
+    engines = engines or [name for name in pdf_engines.engine_names() if pdf_engines.get_engine(name).is_installed()] \
+        + ([pdf_native.ENGINE_NAME] if pdf_native.is_available() else [])
+    variants = variants or list(VARIANTS)
+    ctx = multiprocessing.get_context(PDF_CONFIG['RENDER_START_METHOD'])
+
+    results = []
+    for template_name in templates:
+        for engine_name in engines:
+            if engine_name == pdf_native.ENGINE_NAME and not pdf_native.supports(template_name):
+                continue
+            for variant in variants:
+                # A fresh process per cell, so peak RSS is per cell
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    try:
+                        cell = pool.submit(_bench_cell, template_name, engine_name, variant, repeat, seed).result()
+                    except Exception as e:
+                        cell = {"template": template_name, "engine": engine_name, "variant": variant,
+                                "ok": False, "error": f"{type(e).__name__}: {e}"}
+                results.append(cell)
+                if cell["ok"]:
+                    print(f"[pdf_benchmark] {template_name:<17} {engine_name:<16} {variant:<13} "
+                          f"p50 {cell['wall_p50_ms']:>9.1f} ms  cpu {cell['cpu_ms']:>9.1f} ms  "
+                          f"rss {cell['peak_rss_kb'] or 0:>8} KiB  pdf {cell['pdf_bytes']:>9} B")
+                else:
+                    print(f"[pdf_benchmark] {template_name:<17} {engine_name:<16} {variant:<13} "
+                          f"FAILED: {cell['error']}")
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "seed": seed,
+            "templates": templates,
+            "engines": engines,
+            "variants": variants,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """
+    Return human-readable regressions of current against baseline, including
+    baseline cells missing from the run's scope and baseline cells that failed.
+    """
+    meta = current.get("meta", {})
+    # A run without recorded scope (older results) is taken to cover everything
+    scope = [set(meta.get(axis) or ()) for axis in ("templates", "engines", "variants")]
+    cells = {(r["template"], r["engine"], r["variant"]): r for r in current["results"]}
+    regressions = []
+    for before in baseline.get("results", []):
+        key = (before["template"], before["engine"], before["variant"])
+        name = "/".join(key)
+        cell = cells.get(key)
+        if cell is None:
+            if all(not axis or value in axis for axis, value in zip(scope, key)):
+                regressions.append(f"{name}: missing from this run")
+            continue
+        if not before.get("ok"):
+            regressions.append(f"{name}: failed in the baseline ({before.get('error')}); nothing to compare with")
+            continue
+        if not cell["ok"]:
+            regressions.append(f"{name}: now fails ({cell.get('error')})")
+            continue
+        old, new = before["wall_p50_ms"], cell["wall_p50_ms"]
+        if new > old * (1 + tolerance) and new - old > min_delta_ms:
+            regressions.append(f"{name}: p50 {old:.1f} ms -> {new:.1f} ms (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(args) -> int:
+    """Entry point for `python -m wsm_pdf bench` (args from wsm_pdf's argument parser)."""
+    report = run(args.templates, args.engines, args.variants, args.repeat, args.seed)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"[pdf_benchmark] Wrote {len(report['results'])} result(s) to {args.out}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"[pdf_benchmark] Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[pdf_benchmark] No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"[pdf_benchmark] {len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"    {line}")
+        return 1
+    print(f"[pdf_benchmark] No regressions against {args.baseline}.")
+    return 0
@@ -0,0 +1,234 @@
+"""
+pdf_cache.py
+
+Content-addressed cache for rendered WSM PDFs.
+
+Two tiers:
+- an in-process LRU, bounded by the total size of the cached PDFs
+- a disk directory that several Streamlit processes can share, bounded by
+  total size; the least recently used files are evicted first. Each process
+  keeps a running total (one directory walk to seed it, then the size of
+  every write) and walks the directory again only when that total is over
+  the budget, or after _DISK_RESCAN_SECONDS to see other processes' writes;
+  eviction goes down to _DISK_LOW_WATER of the budget, so a full cache is
+  not walked again on the next write
+
+Keys are SHA-256 digests over the normalized project dict, the template file
+contents and the engine name. Any change to the project row, the template or
+the engine therefore produces a new key; stale entries are never looked up
+again and simply age out of both tiers.
+
+Provides:
+    - make_key(project_data, template_digest, engine) -> str
+    - key_for(engine, template_name=None, project_data=None, html_string=None) -> str
+    - get_cache() -> PdfCache | None (None when caching is disabled)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Any
+
+from config import PDF_CONFIG
+
+_DISK_RESCAN_SECONDS = 300.0
+_DISK_LOW_WATER = 0.9
+
+
+def _normalize(project_data: Any) -> dict:
+    """Stringify keys/values the way the templates see them, so equal renders share a key."""
+    if not isinstance(project_data, dict):
+        return {}
+    return {str(k): ('' if v is None else str(v)) for k, v in project_data.items()}
+
+
+def make_key(project_data: Optional[dict], template_digest: str, engine: str) -> str:
+    """Build the cache key for one render."""
+    h = hashlib.sha256()
+    h.update(engine.encode("utf-8"))
+    h.update(b"\0")
+    h.update(template_digest.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(_normalize(project_data), sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def key_for(engine: str,
+            template_name: Optional[str] = None,
+            project_data: Optional[dict] = None,
+            html_string: Optional[str] = None) -> str:
+    """
+    Cache key for a generate_pdf(...) call.
+    Raw HTML is hashed directly; templates are hashed via template_manager.
+    """
+    if html_string:
+        digest = hashlib.sha256(html_string.encode("utf-8")).hexdigest()
+        return make_key({}, digest, engine)
+    if not template_name:
+        raise ValueError("Either template_name or html_string is required to build a cache key")
+    import template_manager  # type: ignore
+    return make_key(project_data, template_manager.get_template_hash(template_name), engine)
+
+
+class PdfCache:
+    """Two-tier (memory + disk) PDF cache with size-based eviction."""
+
+    def __init__(self, cache_dir: str, memory_max_bytes: int, disk_max_bytes: int):
+        self.cache_dir = cache_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        # Disk tier total as of the last walk, plus this process's writes since
+        self._disk_bytes = None
+        self._disk_scanned_at = 0.0
+        self._disk_lock = threading.Lock()
+
+    # ---- memory tier -------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            return data
+
+    def _memory_put(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_max_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # ---- disk tier ---------------------------------------------------
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pdf")
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+        except OSError:
+            return None
+        try:
+            # Refresh mtime so eviction treats this entry as recently used
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def _disk_put(self, key: str, data: bytes) -> None:
+        path = self._disk_path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so other processes never see a partial PDF
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            old_size = os.stat(path).st_size
+        except OSError:
+            old_size = 0
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._account_disk(len(data) - old_size)
+
+    def _account_disk(self, delta: int) -> None:
+        """Add a write to the running disk total; walk the directory only when over budget or stale."""
+        with self._disk_lock:
+            if self._disk_bytes is not None and time.monotonic() - self._disk_scanned_at < _DISK_RESCAN_SECONDS:
+                self._disk_bytes += delta
+                if self._disk_bytes <= self.disk_max_bytes:
+                    return
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """Walk the disk tier, delete least recently used files down to the budget and reseed the total."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".pdf"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total > self.disk_max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.disk_max_bytes * _DISK_LOW_WATER:
+                    break
+        self._disk_bytes = total
+        self._disk_scanned_at = time.monotonic()
+
+    # ---- public API --------------------------------------------------
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached PDF bytes for key, or None on a miss."""
+        data = self._memory_get(key)
+        if data is not None:
+            return data
+        data = self._disk_get(key)
+        if data is not None:
+            self._memory_put(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store PDF bytes in both tiers. Disk errors are reported but not raised."""
+        self._memory_put(key, data)
+        try:
+            self._disk_put(key, data)
+        except Exception as e:
+            print(f"[pdf_cache] Could not write cache entry to disk: {e}")
+
+    def clear(self) -> None:
+        """Drop the in-memory tier (the shared disk tier is left alone)."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[PdfCache]:
+    """Return the process-wide cache, or None if caching is disabled in PDF_CONFIG."""
+    global _cache
+    if not PDF_CONFIG.get('CACHE_ENABLED', True):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PdfCache(PDF_CONFIG['CACHE_DIR'],
+                                  PDF_CONFIG['CACHE_MEMORY_MAX_BYTES'],
+                                  PDF_CONFIG['CACHE_DISK_MAX_BYTES'])
+    return _cache
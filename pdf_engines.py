@@ -0,0 +1,296 @@
+"""
+pdf_engines.py
+
+Registry of PDF conversion engines, imported on first use.
+
+WeasyPrint and xhtml2pdf take around a second to import, which every cold
+Streamlit start used to pay even if the session never rendered a PDF. Each
+engine here registers a cheap probe (is the package or binary installed?) and
+a loader that does the real import the first time the engine is used.
+
+Built-in engines (fidelity: how faithfully the templates' layout comes out, higher is better):
+    - weasyprint       HTML -> PDF, best CSS fidelity (needs cairo/pango)          fidelity 2
+    - wkhtmltopdf      HTML -> PDF via the wkhtmltopdf binary (installed by the    fidelity 2
+                       Dockerfile)
+    - xhtml2pdf        HTML -> PDF, pure Python, limited CSS                       fidelity 1
+    - reportlab-plain  project dict -> plain text PDF, the last-resort fallback    fidelity 0
+
+Provides:
+    - register_engine(name, loader, probe, takes_html=True, fidelity=1)
+    - get_engine(name) -> Engine (ValueError for unknown names)
+    - engine_names() -> list[str] (every registered engine)
+    - engine_order(takes_html=None) -> list[str] (PDF_CONFIG['ENGINE_ORDER'], installed engines only)
+    - preload() -> None (import the configured engines now, e.g. in worker processes)
+
+Settings (PDF_CONFIG in config.py):
+    - ENGINE_ORDER               engines tried in order; engines not listed are only used when requested by name
+    - WKHTMLTOPDF_PATH           wkhtmltopdf executable (looked up on PATH by default)
+    - WKHTMLTOPDF_MAX_PROCESSES  concurrent wkhtmltopdf processes per Python process
+    - WKHTMLTOPDF_TIMEOUT        hard limit in seconds per conversion (the process is killed)
+"""
+
+import importlib.util
+import io
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from typing import Optional, Any, Callable
+
+import debug_capture
+from config import PDF_CONFIG
+
+
+class Engine:
+    """One registered engine; the loader runs at most once, on first use."""
+
+    def __init__(self, name: str, loader: Callable[[], Callable], probe: Callable[[], bool], takes_html: bool = True,
+                 fidelity: int = 1):
+        self.name = name
+        self.takes_html = takes_html
+        self.fidelity = fidelity
+        self._loader = loader
+        self._probe = probe
+        self._installed = None
+        self._convert = None
+        self._load_failed = False
+        self._lock = threading.Lock()
+
+    def is_installed(self) -> bool:
+        """Cheap check that does not import the engine."""
+        if self._installed is None:
+            try:
+                self._installed = bool(self._probe())
+            except Exception:
+                self._installed = False
+        return self._installed
+
+    def load(self) -> Optional[Callable]:
+        """Import the engine and return its convert function, or None if it cannot be loaded."""
+        if self._convert is None and not self._load_failed:
+            with self._lock:
+                if self._convert is None and not self._load_failed:
+                    if not self.is_installed():
+                        self._load_failed = True
+                    else:
+                        try:
+                            self._convert = self._loader()
+                        except Exception as e:
+                            print(f"[pdf_engines] Could not load {self.name}: {e}")
+                            self._load_failed = True
+        return self._convert
+
+    def is_available(self) -> bool:
+        """True if the engine is installed and imports cleanly (imports it if needed)."""
+        return self.load() is not None
+
+    def convert(self, source: Any) -> Optional[bytes]:
+        """Convert HTML (or the project dict, for takes_html=False engines) to PDF bytes."""
+        convert = self.load()
+        if convert is None:
+            raise RuntimeError(f"PDF engine {self.name!r} is not installed")
+        return convert(source)
+
+
+_engines = {}
+_warned_unknown = set()
+
+
+def register_engine(name: str, loader: Callable[[], Callable], probe: Callable[[], bool],
+                    takes_html: bool = True, fidelity: int = 1) -> Engine:
+    """
+    Register an engine.
+    loader() performs the import and returns convert(source) -> bytes | None;
+    probe() must be cheap and side-effect free. Engines of equal fidelity produce
+    interchangeable output, so engine_stats may reorder them by latency.
+    """
+    engine = Engine(name, loader, probe, takes_html, fidelity)
+    _engines[name] = engine
+    return engine
+
+
+def get_engine(name: str) -> Engine:
+    """Return the registered engine called name."""
+    try:
+        return _engines[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF engine {name!r}; expected one of {', '.join(_engines)}") from None
+
+
+def engine_names() -> list:
+    """Names of all registered engines, in registration order."""
+    return list(_engines)
+
+
+def engine_order(takes_html: Optional[bool] = None) -> list:
+    """Installed engines from PDF_CONFIG['ENGINE_ORDER'], optionally only HTML (or only non-HTML) ones."""
+    names = []
+    for name in PDF_CONFIG['ENGINE_ORDER']:
+        engine = _engines.get(name)
+        if engine is None:
+            if name not in _warned_unknown:
+                _warned_unknown.add(name)
+                print(f"[pdf_engines] Ignoring unknown engine {name!r} in ENGINE_ORDER")
+            continue
+        if takes_html is not None and engine.takes_html != takes_html:
+            continue
+        if engine.is_installed():
+            names.append(name)
+    return names
+
+
+def preload() -> None:
+    """Import every configured engine now instead of on first use."""
+    for name in engine_order():
+        get_engine(name).load()
+
+
+# ---- built-in engines ------------------------------------------------
+
+def _module_installed(module: str) -> Callable[[], bool]:
+    return lambda: importlib.util.find_spec(module) is not None
+
+
+def _load_weasyprint() -> Callable:
+    from weasyprint import HTML  # type: ignore
+
+    def convert(source_html: str) -> Optional[bytes]:
+        return HTML(string=source_html).write_pdf()
+    return convert
+
+
+def _load_xhtml2pdf() -> Callable:
+    from xhtml2pdf import pisa  # type: ignore
+
+    def convert(source_html: str) -> Optional[bytes]:
+        result_file = io.BytesIO()
+        # Feed bytes to CreatePDF for better compatibility
+        src = io.BytesIO(source_html.encode("utf-8"))
+        pisa_status = pisa.CreatePDF(src, dest=result_file, encoding="utf-8")
+
+        debug_capture.add("pisa_log.txt", str(getattr(pisa_status, "log", "")))
+
+        if getattr(pisa_status, "err", 1):
+            print("[pdf_engines] xhtml2pdf reported an error (capture a debug run for the pisa log).")
+            return None
+        return result_file.getvalue()
+    return convert
+
+
+def _wkhtmltopdf_binary() -> Optional[str]:
+    return shutil.which(PDF_CONFIG['WKHTMLTOPDF_PATH'])
+
+
+# Caps concurrent wkhtmltopdf processes started by this process
+_wkhtmltopdf_slots = threading.BoundedSemaphore(max(PDF_CONFIG['WKHTMLTOPDF_MAX_PROCESSES'], 1))
+
+
+def _wkhtmltopdf_args(binary: str) -> list:
+    margin = PDF_CONFIG['MARGINS']
+    return [binary, "--quiet", "--encoding", "utf-8",
+            "--page-size", PDF_CONFIG['PAGE_SIZE'],
+            "--orientation", PDF_CONFIG['DEFAULT_ORIENTATION'].capitalize(),
+            "--margin-top", margin, "--margin-bottom", margin,
+            "--margin-left", margin, "--margin-right", margin,
+            # '-' '-': read the HTML from stdin and write the PDF to stdout
+            "-", "-"]
+
+
+def _load_wkhtmltopdf() -> Callable:
+    binary = _wkhtmltopdf_binary()
+    if binary is None:
+        raise RuntimeError(f"{PDF_CONFIG['WKHTMLTOPDF_PATH']} not found")
+    args = _wkhtmltopdf_args(binary)
+
+    def convert(source_html: str) -> Optional[bytes]:
+        # The conversion runs in a child process, outside the GIL; the semaphore
+        # bounds how many run at once and the timeout covers waiting for a slot too.
+        timeout = PDF_CONFIG['WKHTMLTOPDF_TIMEOUT']
+        deadline = time.monotonic() + timeout
+        if not _wkhtmltopdf_slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No wkhtmltopdf slot became free within {timeout} seconds")
+        try:
+            # Own process group, so a timeout also kills anything wkhtmltopdf started
+            proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    start_new_session=(os.name == "posix"))
+            try:
+                stdout, stderr = proc.communicate(source_html.encode("utf-8"),
+                                                  timeout=max(deadline - time.monotonic(), 0.1))
+            except subprocess.TimeoutExpired:
+                if os.name == "posix":
+                    os.killpg(proc.pid, signal.SIGKILL)
+                else:
+                    proc.kill()
+                proc.communicate()
+                raise TimeoutError(f"wkhtmltopdf did not finish within {timeout} seconds")
+        finally:
+            _wkhtmltopdf_slots.release()
+
+        if proc.returncode != 0 or not stdout:
+            print(f"[pdf_engines] wkhtmltopdf exited with {proc.returncode}: "
+                  f"{stderr.decode('utf-8', 'replace').strip()}")
+            return None
+        return stdout
+    return convert
+
+
+def _load_reportlab_plain() -> Callable:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    def convert(project_data: Any) -> bytes:
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+
+        margin = 50
+        y = height - margin
+        line_height = 14
+
+        # Draw header
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(margin, y, "Project WSM (Plain PDF - Fallback)")
+        y -= 30
+
+        c.setFont("Helvetica", 10)
+        # If project_data is dict-like, print each key/value on its own line
+        if isinstance(project_data, dict):
+            for k, v in project_data.items():
+                # Convert value to single-line string (truncate if very long)
+                val = str(v)
+                # wrap long lines naively
+                max_chars = 120
+                if len(val) > max_chars:
+                    val = val[:max_chars] + " ..."
+
+                line = f"{k}: {val}"
+                # if running out of space, create new page
+                if y < margin + line_height:
+                    c.showPage()
+                    y = height - margin
+                    c.setFont("Helvetica", 10)
+                c.drawString(margin, y, line)
+                y -= line_height
+        else:
+            # just dump repr of project_data
+            for chunk in str(project_data).splitlines():
+                if y < margin + line_height:
+                    c.showPage()
+                    y = height - margin
+                    c.setFont("Helvetica", 10)
+                c.drawString(margin, y, chunk)
+                y -= line_height
+
+        c.showPage()
+        c.save()
+        return buffer.getvalue()
+    return convert
+
+
+register_engine("weasyprint", _load_weasyprint, _module_installed("weasyprint"), fidelity=2)
+register_engine("xhtml2pdf", _load_xhtml2pdf, _module_installed("xhtml2pdf"), fidelity=1)
+register_engine("wkhtmltopdf", _load_wkhtmltopdf, lambda: _wkhtmltopdf_binary() is not None, fidelity=2)
+register_engine("reportlab-plain", _load_reportlab_plain, _module_installed("reportlab"), takes_html=False,
+                fidelity=0)
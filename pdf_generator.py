@@ -1,20 +1,41 @@
-
 """
 pdf_generator.py
 
 Robust HTML -> PDF generator module for Streamlit / Flask apps.
 
 Features:
-- Prefer WeasyPrint (best CSS fidelity) if available.
-- Fallback to xhtml2pdf if WeasyPrint is not installed.
+- Templates with a native layout (pdf_native.py, PDF_CONFIG['NATIVE_TEMPLATES'], default
+  STD_WSM) are built directly with ReportLab Platypus, skipping HTML rendering and
+  conversion; if that fails the HTML chain below is used instead.
+- Conversion engines come from pdf_engines.py and are imported on first use,
+  so importing this module (and starting the app) stays fast.
+- Engines are tried in PDF_CONFIG['ENGINE_ORDER'] (default: WeasyPrint, xhtml2pdf,
+  wkhtmltopdf), skipping any that are not installed; engine_stats.py skips engines
+  that keep failing on a template and reorders them by observed latency within a
+  fidelity tier. PDFs are cached under the engine that produced them, and only
+  the highest-fidelity tier's entries are served.
 - If HTML conversion fails, falls back to a simple ReportLab PDF generator (plain text).
-- Writes debug outputs:
-  - wsm_debug.html   -> the final HTML that was passed to the converter
-  - wsm_pisa_log.txt -> xhtml2pdf log (when used)
+- Debug outputs are opt-in (generate_pdf(..., debug=True), or PDF_CONFIG['DEBUG_CAPTURE'] /
+  'DEBUG_SAMPLE_RATE') and written per request in the background by debug_capture.py:
+  - source.html  -> the final HTML that was passed to the converter
+  - pisa_log.txt -> xhtml2pdf log (when used)
+  - meta.json    -> template, engine used and outcome
+- Every stage is timed with pdf_metrics.span(...) (structured log records and
+  Prometheus histograms, see pdf_metrics.py).
 - Provides:
-    - convert_html_to_pdf(source_html) -> bytes | None
-    - generate_pdf(template_name=None, project_data=None, html_string=None) -> bytes | None
+    - convert_html_to_pdf(source_html, engine=None) -> bytes | None
+    - cache_key_engine(engine, template_name=None) -> str (engine part of the cache key)
+    - generate_pdf(template_name=None, project_data=None, html_string=None, engine=None, debug=None) -> bytes | None
+    - generate_pdf_with_engine(...) -> (bytes, engine) (generate_pdf plus the engine that produced the PDF)
+    - cached_pdf(template_name=None, project_data=None, html_string=None) -> (bytes, engine) | None
+    - cache_engine_names(template_name=None, html_string=None) -> engines whose cache entries can answer
     - generate_plain_pdf(project_data) -> bytes (ReportLab text fallback)
+    - generate_pdf_async(template_name=None, project_data=None, html_string=None, with_engine=False, debug=None)
+      -> Future[bytes] (Future[(bytes, engine)] with with_engine=True)
+    - generate_pdf_for_streamlit(project_no) -> bytes (DB lookup + template render)
+    - prerender_project_pdf(project_no) -> None (background render into the PDF cache)
+    - generate_pdfs(project_nos, render=None) -> iterator of (project_no, pdf_bytes | None, error | None)
+    - write_pdfs_zip(project_nos, fileobj, progress=None, render=None) -> (written, failures)
 - Safe to drop into your existing project and call from Streamlit.
 
 Notes:
@@ -23,111 +44,111 @@ Notes:
 - If neither HTML engine is available, ReportLab creates a simple, readable PDF as a last resort.
 """
 
-import io
 import os
+import threading
+import time
 import traceback
+import zipfile
+from concurrent.futures import Future, FIRST_COMPLETED, wait
 from datetime import datetime
-from typing import Optional, Any
-
-# Try optional libraries
-try:
-    from weasyprint import HTML  # type: ignore
-    HAVE_WEASY = True
-except Exception:
-    HAVE_WEASY = False
-
-try:
-    from xhtml2pdf import pisa  # type: ignore
-    HAVE_XHTML2PDF = True
-except Exception:
-    HAVE_XHTML2PDF = False
-
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    HAVE_REPORTLAB = True
-except Exception:
-    HAVE_REPORTLAB = False
-
-
-def _write_debug_html(source_html: str) -> str:
-    """Write debug HTML file so you can open it in a browser and inspect rendering."""
-    try:
-        debug_path = os.path.abspath("wsm_debug.html")
-        with open(debug_path, "w", encoding="utf-8") as fh:
-            fh.write(source_html)
-        return debug_path
-    except Exception:
-        return ""
+from typing import Optional, Any, Callable, Iterable, Iterator
 
+from config import PDF_CONFIG
+
+import debug_capture
+import engine_stats
+import pdf_cache
+import pdf_engines
+import pdf_metrics
+import pdf_native
+import render_pool
+
+# Names the configured conversion chain (/health, logs); cache keys name the single
+# engine that produced the PDF. Built from the cheap install probes, so no engine is imported here.
+ENGINE_NAME = "+".join(pdf_engines.engine_order(takes_html=True)) or "none"
+
+# Names accepted by the engine= parameter
+ENGINES = tuple(pdf_engines.engine_names()) + (pdf_native.ENGINE_NAME,)
 
-def _write_pisa_log(pisa_status) -> str:
-    """Write pisa log (if present) to a debug file."""
-    try:
-        log_text = getattr(pisa_status, "log", "")
-        log_path = os.path.abspath("wsm_pisa_log.txt")
-        with open(log_path, "w", encoding="utf-8") as lf:
-            lf.write(log_text)
-        return log_path
-    except Exception:
-        return ""
 
+def _check_engine(engine: Optional[str], template_name: Optional[str] = None) -> None:
+    if engine is None:
+        return
+    if engine == pdf_native.ENGINE_NAME:
+        if not pdf_native.is_available():
+            raise RuntimeError(f"PDF engine {engine!r} is not installed")
+        if not pdf_native.supports(template_name):
+            raise RuntimeError(f"PDF engine {engine!r} has no layout for template {template_name!r}")
+        return
+    if not pdf_engines.get_engine(engine).is_available():
+        raise RuntimeError(f"PDF engine {engine!r} is not installed")
 
-def convert_html_to_pdf(source_html: str) -> Optional[bytes]:
+
+def _native_for(template_name: Optional[str], html_string: Optional[str], engine: Optional[str]) -> bool:
+    """True if this request is rendered by pdf_native rather than through HTML."""
+    if engine:
+        return engine == pdf_native.ENGINE_NAME
+    return not html_string and pdf_native.enabled_for(template_name) and pdf_native.is_available()
+
+
+def cache_key_engine(engine: str, template_name: Optional[str] = None) -> str:
+    """
+    The engine part of the PDF cache key for PDFs produced by engine (also used for ETags).
+    Native renders include the layout digest, so editing a layout invalidates their entries.
+    """
+    if engine == pdf_native.ENGINE_NAME:
+        return f"{pdf_native.ENGINE_NAME}:{pdf_native.layout_digest(template_name)}"
+    return engine
+
+
+def convert_html_to_pdf(source_html: str, engine: Optional[str] = None,
+                        template_name: Optional[str] = None) -> Optional[bytes]:
     """
     Convert HTML to PDF bytes.
-    - Tries WeasyPrint first (if available).
-    - Falls back to xhtml2pdf (pisa) if WeasyPrint missing.
-    - Writes debug HTML and pisa log for inspection.
+    - Tries the installed HTML engines in PDF_CONFIG['ENGINE_ORDER'] until one succeeds,
+      skipping engines that keep failing on template_name and preferring the fastest
+      of equal fidelity (see engine_stats.py).
+    - engine='weasyprint' (or any other registered HTML engine) uses only that engine.
+    - Attaches the HTML (and the pisa log, for xhtml2pdf) to the active debug capture, if any.
     Returns PDF bytes on success, or None on failure.
     """
-    # Always write debug HTML (helps to inspect what was actually rendered)
-    debug_html_path = _write_debug_html(source_html)
-    if debug_html_path:
-        print(f"[pdf_generator] Wrote debug HTML to: {debug_html_path}")
+    return _convert_html(source_html, engine, template_name)[0]
 
-    # OPTION 1: WeasyPrint (recommended if available)
-    if HAVE_WEASY:
-        try:
-            print("[pdf_generator] Trying WeasyPrint for conversion...")
-            pdf_bytes = HTML(string=source_html).write_pdf()
-            if pdf_bytes:
-                print("[pdf_generator] WeasyPrint succeeded.")
-                return pdf_bytes
-            else:
-                print("[pdf_generator] WeasyPrint returned empty result.")
-        except Exception as e:
-            print(f"[pdf_generator] WeasyPrint exception: {e}")
-            print(traceback.format_exc())
 
-    # OPTION 2: xhtml2pdf (pisa)
-    if HAVE_XHTML2PDF:
-        try:
-            print("[pdf_generator] Trying xhtml2pdf (pisa) for conversion...")
-            result_file = io.BytesIO()
-            # Feed bytes to CreatePDF for better compatibility
-            src = io.BytesIO(source_html.encode("utf-8"))
-            pisa_status = pisa.CreatePDF(src, dest=result_file, encoding="utf-8")
-
-            # write pisa log for debugging
-            log_path = _write_pisa_log(pisa_status)
-            if log_path:
-                print(f"[pdf_generator] pisa log written to: {log_path}")
-
-            if not getattr(pisa_status, "err", 1):
-                result_file.seek(0)
-                print("[pdf_generator] xhtml2pdf succeeded.")
-                return result_file.read()
-            else:
-                print("[pdf_generator] xhtml2pdf reported an error. See log for details.")
-                # fallthrough to fallback
-        except Exception as e:
-            print(f"[pdf_generator] xhtml2pdf exception: {e}")
-            print(traceback.format_exc())
+def _convert_html(source_html: str, engine: Optional[str], template_name: Optional[str]) -> tuple:
+    """convert_html_to_pdf(), returning (pdf_bytes, engine name) or (None, None)."""
+    debug_capture.add("source.html", source_html)
+
+    if engine:
+        names = [engine]
+    else:
+        names = engine_stats.order_engines(template_name, pdf_engines.engine_order(takes_html=True))
+    for name in names:
+        converter = pdf_engines.get_engine(name)
+        if not converter.takes_html or not converter.is_available():
+            continue
+        started = time.perf_counter()
+        pdf_bytes = None
+        with pdf_metrics.span("convert", template=template_name, engine=name) as sp:
+            try:
+                print(f"[pdf_generator] Trying {name} for conversion...")
+                pdf_bytes = converter.convert(source_html)
+                if not pdf_bytes:
+                    print(f"[pdf_generator] {name} returned empty result.")
+            except Exception as e:
+                print(f"[pdf_generator] {name} exception: {e}")
+                print(traceback.format_exc())
+            if not pdf_bytes:
+                sp.status = "error"
+        engine_stats.record(template_name, name, time.perf_counter() - started, bool(pdf_bytes))
+        if pdf_bytes:
+            print(f"[pdf_generator] {name} succeeded.")
+            debug_capture.annotate(engine=name)
+            return pdf_bytes, name
 
     # If conversion failed or no engines available, return None
     print("[pdf_generator] HTML -> PDF conversion failed with available engines.")
-    return None
+    return None, None
 
 
 def generate_plain_pdf(project_data: Any) -> bytes:
@@ -135,61 +156,66 @@ def generate_plain_pdf(project_data: Any) -> bytes:
     Generate a simple text-based PDF as a fallback using ReportLab.
     The function will attempt to create a readable PDF containing project_data keys/values.
     """
-    if not HAVE_REPORTLAB:
+    plain = pdf_engines.get_engine("reportlab-plain")
+    if not plain.is_available():
         raise RuntimeError("ReportLab is not installed; cannot create a plain PDF fallback. "
                            "Install reportlab with `pip install reportlab` or enable HTML engines.")
+    return plain.convert(project_data)
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    margin = 50
-    y = height - margin
-    line_height = 14
-
-    # Draw header
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(margin, y, "Project WSM (Plain PDF - Fallback)")
-    y -= 30
-
-    c.setFont("Helvetica", 10)
-    # If project_data is dict-like, print each key/value on its own line
-    if isinstance(project_data, dict):
-        for k, v in project_data.items():
-            # Convert value to single-line string (truncate if very long)
-            val = str(v)
-            # wrap long lines naively
-            max_chars = 120
-            if len(val) > max_chars:
-                val = val[:max_chars] + " ..."
-
-            line = f"{k}: {val}"
-            # if running out of space, create new page
-            if y < margin + line_height:
-                c.showPage()
-                y = height - margin
-                c.setFont("Helvetica", 10)
-            c.drawString(margin, y, line)
-            y -= line_height
-    else:
-        # just dump repr of project_data
-        for chunk in str(project_data).splitlines():
-            if y < margin + line_height:
-                c.showPage()
-                y = height - margin
-                c.setFont("Helvetica", 10)
-            c.drawString(margin, y, chunk)
-            y -= line_height
 
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-    return buffer.read()
+def cache_engine_names(template_name: Optional[str] = None, html_string: Optional[str] = None) -> list:
+    """
+    Engine names whose PDF cache entries can answer this request, in lookup order.
+    Entries are stored under the engine that produced them, but only the highest
+    fidelity tier of the configured HTML engines is served: a fallback engine's
+    PDF must not outlive the outage that caused it. render_server's ETags are
+    built from the same names. Natively rendered templates are served from the
+    native engine's entries only.
+    """
+    if _native_for(template_name, html_string, None):
+        return [pdf_native.ENGINE_NAME]
+    names = pdf_engines.engine_order(takes_html=True)
+    if not names:
+        return [ENGINE_NAME]
+    best = max(pdf_engines.get_engine(name).fidelity for name in names)
+    return [name for name in names if pdf_engines.get_engine(name).fidelity == best]
+
+
+def _cache_lookup(template_name, project_data, html_string, use_cache, engine=None):
+    """
+    Return (cache, hit) for this request: hit is (pdf_bytes, engine) or None.
+    A forced engine only looks at its own entries. cache is None when caching is off or fails.
+    """
+    if not use_cache:
+        return None, None
+    try:
+        cache = pdf_cache.get_cache()
+        if cache is None:
+            return None, None
+        for name in [engine] if engine else cache_engine_names(template_name, html_string):
+            key = pdf_cache.key_for(cache_key_engine(name, template_name), template_name, project_data, html_string)
+            cached = cache.get(key)
+            if cached:
+                return cache, (cached, name)
+        return cache, None
+    except Exception as e:
+        print(f"[pdf_generator] PDF cache unavailable: {e}")
+        return None, None
+
+
+def cached_pdf(template_name: Optional[str] = None,
+               project_data: Optional[dict] = None,
+               html_string: Optional[str] = None) -> Optional[tuple]:
+    """Return (pdf_bytes, engine) for this request from the PDF cache without rendering, or None."""
+    return _cache_lookup(template_name, project_data, html_string, True)[1]
 
 
 def generate_pdf(template_name: Optional[str] = None,
                  project_data: Optional[dict] = None,
-                 html_string: Optional[str] = None) -> bytes:
+                 html_string: Optional[str] = None,
+                 use_cache: bool = True,
+                 engine: Optional[str] = None,
+                 debug: Optional[bool] = None) -> bytes:
     """
     High-level helper to generate a PDF.
     - If html_string is provided, it will be used directly.
@@ -197,8 +223,70 @@ def generate_pdf(template_name: Optional[str] = None,
       template_manager.get_template_content(template_name, project_data)
       to render HTML, then convert it.
     - If HTML conversion fails, it falls back to generate_plain_pdf(project_data).
+    - Successful HTML conversions are stored in the PDF cache (see pdf_cache.py)
+      unless use_cache is False; a hit skips template rendering and conversion.
+    - Templates in PDF_CONFIG['NATIVE_TEMPLATES'] are built by pdf_native.render() unless
+      html_string or engine is given; a failure there falls back to the HTML route.
+    - engine (one of ENGINES) forces a single converter; 'reportlab-plain' and
+      'reportlab-native' skip HTML entirely.
+    - debug=True captures debug artifacts for this request, debug=False never does;
+      None follows PDF_CONFIG['DEBUG_CAPTURE'] / 'DEBUG_SAMPLE_RATE' (see debug_capture.py).
     Returns PDF bytes (always) or raises an error if all attempts fail.
     """
+    return generate_pdf_with_engine(template_name, project_data, html_string, use_cache, engine, debug)[0]
+
+
+def generate_pdf_with_engine(template_name: Optional[str] = None,
+                             project_data: Optional[dict] = None,
+                             html_string: Optional[str] = None,
+                             use_cache: bool = True,
+                             engine: Optional[str] = None,
+                             debug: Optional[bool] = None) -> tuple:
+    """
+    generate_pdf(), returning (pdf_bytes, engine): the name of the engine that
+    produced the PDF (e.g. 'reportlab-plain' for the fallback); HTML renders are
+    cached under that name.
+    """
+    _check_engine(engine, template_name)
+    if engine and engine != pdf_native.ENGINE_NAME and not pdf_engines.get_engine(engine).takes_html:
+        return pdf_engines.get_engine(engine).convert(project_data or {}), engine
+
+    cache, hit = _cache_lookup(template_name, project_data, html_string, use_cache, engine)
+    # A debug run must really render, so it ignores a hit (but refreshes the entry)
+    if cache is not None and not debug:
+        pdf_metrics.count_cache("hit" if hit else "miss")
+        if hit:
+            print("[pdf_generator] PDF cache hit.")
+            return hit
+
+    with debug_capture.capture(debug) as cap:
+        if cap is not None:
+            cap.meta.update(template=template_name, project_no=(project_data or {}).get("project_no"))
+        started = time.perf_counter()
+        with pdf_metrics.span("generate_pdf", template=template_name) as sp:
+            pdf_bytes, used_engine = _render_uncached(template_name, project_data, html_string, engine, cache)
+            sp.labels["engine"] = used_engine
+        pdf_metrics.observe_render(template_name, used_engine, time.perf_counter() - started, len(pdf_bytes))
+        return pdf_bytes, used_engine
+
+
+def _render_uncached(template_name, project_data, html_string, engine, cache) -> tuple:
+    """The part of generate_pdf_with_engine() after the cache lookup; returns (pdf_bytes, engine used)."""
+    if _native_for(template_name, html_string, engine):
+        try:
+            with pdf_metrics.span("native_render", template=template_name, engine=pdf_native.ENGINE_NAME):
+                pdf_bytes = pdf_native.render(template_name, project_data or {})
+            debug_capture.annotate(engine=pdf_native.ENGINE_NAME)
+            if cache is not None:
+                cache.put(pdf_cache.key_for(cache_key_engine(pdf_native.ENGINE_NAME, template_name),
+                                            template_name, project_data, html_string), pdf_bytes)
+            return pdf_bytes, pdf_native.ENGINE_NAME
+        except Exception as e:
+            if engine:
+                raise
+            print(f"[pdf_generator] Native render of {template_name} failed, using HTML: {e}")
+            print(traceback.format_exc())
+
     html = None
 
     if html_string:
@@ -216,19 +304,232 @@ def generate_pdf(template_name: Optional[str] = None,
 
     # If we have HTML, attempt conversion
     if html:
-        pdf_bytes = convert_html_to_pdf(html)
+        pdf_bytes, used_engine = _convert_html(html, engine, template_name)
         if pdf_bytes:
-            return pdf_bytes
+            if cache is not None:
+                cache.put(pdf_cache.key_for(used_engine, template_name, project_data, html_string), pdf_bytes)
+            return pdf_bytes, used_engine
         else:
             print("[pdf_generator] HTML conversion returned None; falling back to plain PDF.")
 
-    # Fallback: attempt ReportLab plain PDF
+    # Fallback: the configured non-HTML engines (ReportLab plain PDF by default)
+    error = None
+    for name in pdf_engines.engine_order(takes_html=False):
+        pdf_metrics.count_fallback(template_name)
+        try:
+            with pdf_metrics.span("plain_fallback", template=template_name, engine=name):
+                pdf_bytes = pdf_engines.get_engine(name).convert(project_data or {})
+            if pdf_bytes:
+                debug_capture.annotate(engine=name, fallback=True)
+                return pdf_bytes, name
+        except Exception as e:
+            print(f"[pdf_generator] {name} fallback failed: {e}")
+            print(traceback.format_exc())
+            error = e
+    raise RuntimeError("All PDF generation methods failed.") from error
+
+
+def generate_pdf_async(template_name: Optional[str] = None,
+                       project_data: Optional[dict] = None,
+                       html_string: Optional[str] = None,
+                       with_engine: bool = False,
+                       debug: Optional[bool] = None) -> Future:
+    """
+    Like generate_pdf(), but renders in the render_pool worker processes.
+    Returns a Future resolving to PDF bytes (to (pdf_bytes, engine) with
+    with_engine=True, see generate_pdf_with_engine); a cache hit returns an
+    already-completed Future without touching the pool.
+    Wait with render_pool.result(future); a job that runs over RENDER_TIMEOUT fails with TimeoutError.
+    """
+    hit = None if debug else cached_pdf(template_name, project_data, html_string)
+    if hit:
+        # Misses are counted by generate_pdf() in the worker, which looks again
+        pdf_metrics.count_cache("hit")
+        done = Future()
+        done.set_result(hit if with_engine else hit[0])
+        return done
+    return render_pool.submit_pdf(template_name=template_name,
+                                  project_data=project_data,
+                                  html_string=html_string,
+                                  with_engine=with_engine,
+                                  debug=debug)
+
+
+def load_project_data(project_no: str, columns: Optional[Any] = None) -> dict:
+    """
+    Fetch a project row from the database as a plain dict.
+    If columns is given, only those columns are selected (see load_project_for_render).
+    Raises RuntimeError if the project does not exist.
+    """
+    import database  # type: ignore
+
+    project_data = database.get_project_fields(project_no, columns)
+    if project_data is None:
+        raise RuntimeError(f"Project {project_no} not found")
+    return project_data
+
+
+def load_project_for_render(project_no: str, template_name: Optional[str] = None) -> tuple:
+    """
+    Resolve a project's template (its 'wsm_type', default STD_WSM) and fetch only
+    the columns that template references, so row I/O and formatting scale with
+    the template rather than with the ~190-column table.
+    Returns (template_name, project_data).
+    """
+    import database  # type: ignore
+    import template_manager  # type: ignore
+
+    with pdf_metrics.span("load_project") as sp:
+        if not template_name:
+            template_name = database.get_project_template(project_no) or 'STD_WSM'
+        sp.labels["template"] = template_name
+        try:
+            columns = template_manager.get_template_fields(template_name)
+        except Exception as e:
+            # Unknown template: load everything so the plain PDF fallback has the data
+            print(f"[pdf_generator] Could not analyze template {template_name}: {e}")
+            columns = None
+        return template_name, load_project_data(project_no, columns)
+
+
+def generate_pdf_for_streamlit(project_no: str) -> bytes:
+    """
+    Fetch a project from the DB and render it through its WSM template.
+    The template is taken from the 'wsm_type' column (defaults to STD_WSM) and
+    only the columns it references are fetched.
+    Rendering runs in the render pool unless PDF_CONFIG['RENDER_WORKERS'] is 0.
+    Returns PDF bytes or raises RuntimeError.
+    """
+    with pdf_metrics.span("generate_pdf_for_streamlit") as sp:
+        template_name, project_data = load_project_for_render(project_no)
+        sp.labels["template"] = template_name
+        if PDF_CONFIG['RENDER_WORKERS'] > 0:
+            # Convert in a worker process so this session doesn't hold the GIL for others
+            future = generate_pdf_async(template_name=template_name, project_data=project_data)
+            return render_pool.result(future)
+        return generate_pdf(template_name=template_name, project_data=project_data)
+
+
+def prerender_project_pdf(project_no: str) -> None:
+    """
+    Start rendering a project's PDF in the background, e.g. right after submission.
+    The output lands in the PDF cache (or the render_jobs queue when
+    PDF_CONFIG['RENDER_BACKEND'] is 'queue'), so the first download is a hit.
+    Never raises: a render problem must not break the caller.
+    """
+    def _report(future):
+        try:
+            future.result()
+            print(f"[pdf_generator] Pre-rendered PDF for {project_no}.")
+        except Exception as e:
+            print(f"[pdf_generator] Background PDF render for {project_no} failed: {e}")
+
     try:
-        return generate_plain_pdf(project_data or {})
+        if PDF_CONFIG['RENDER_BACKEND'] == 'queue':
+            import database  # type: ignore
+            database.enqueue_render_job(project_no)
+            return
+
+        template_name, project_data = load_project_for_render(project_no)
+        if PDF_CONFIG['RENDER_WORKERS'] > 0:
+            generate_pdf_async(template_name=template_name, project_data=project_data).add_done_callback(_report)
+        else:
+            future = Future()
+            future.add_done_callback(_report)
+
+            def _run():
+                try:
+                    future.set_result(generate_pdf(template_name=template_name, project_data=project_data))
+                except Exception as e:
+                    future.set_exception(e)
+
+            threading.Thread(target=_run, name=f"prerender-{project_no}", daemon=True).start()
     except Exception as e:
-        print(f"[pdf_generator] Plain PDF generation failed: {e}")
-        print(traceback.format_exc())
-        raise RuntimeError("All PDF generation methods failed.") from e
+        print(f"[pdf_generator] Could not start background PDF render for {project_no}: {e}")
+
+
+def generate_pdfs(project_nos: Iterable[str],
+                  max_in_flight: Optional[int] = None,
+                  render: Optional[Callable[[str, dict], bytes]] = None) -> Iterator[tuple]:
+    """
+    Render many projects in parallel through the render pool.
+    Yields (project_no, pdf_bytes, None) or (project_no, None, error) in completion order.
+    At most max_in_flight renders (default: 2 x RENDER_WORKERS) are outstanding, so
+    only those results are held in memory, however long the batch is.
+    With RENDER_WORKERS = 0 the projects are rendered one by one in-process.
+    render(template_name, project_data) replaces generate_pdf, e.g. with
+    pdf_generator_xhtml2pdf.generate_pdf so a batch matches that generator's single
+    downloads; it must be a module-level function (it is pickled to the workers).
+    """
+    workers = PDF_CONFIG['RENDER_WORKERS']
+    if workers <= 0:
+        for project_no in project_nos:
+            try:
+                template_name, project_data = load_project_for_render(project_no)
+                yield project_no, (render or generate_pdf)(template_name, project_data), None
+            except Exception as e:
+                yield project_no, None, e
+        return
+
+    max_in_flight = max_in_flight or workers * 2
+    pending = {}
+    remaining = iter(project_nos)
+    exhausted = False
+    while True:
+        while not exhausted and len(pending) < max_in_flight:
+            project_no = next(remaining, None)
+            if project_no is None:
+                exhausted = True
+                break
+            try:
+                template_name, project_data = load_project_for_render(project_no)
+                if render is None:
+                    future = generate_pdf_async(template_name=template_name, project_data=project_data)
+                else:
+                    future = render_pool.get_pool().submit(render, template_name, project_data)
+                pending[future] = project_no
+            except Exception as e:
+                yield project_no, None, e
+        if not pending:
+            return
+
+        # No timeout here: the pool fails a job that runs over RENDER_TIMEOUT with TimeoutError
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            project_no = pending.pop(future)
+            try:
+                yield project_no, future.result(), None
+            except Exception as e:
+                yield project_no, None, e
+
+
+def write_pdfs_zip(project_nos: Iterable[str], fileobj: Any,
+                   progress: Optional[Callable[[int, int, str], None]] = None,
+                   render: Optional[Callable[[str, dict], bytes]] = None) -> tuple:
+    """
+    Render project_nos with generate_pdfs() (render as there) and stream each PDF into a ZIP archive
+    written to fileobj as soon as it is ready (one '<project_no>.pdf' per project).
+    Failures are listed in 'errors.txt' inside the archive.
+    progress(done, total, project_no) is called after every project.
+    Returns (number of PDFs written, {project_no: error message}).
+    """
+    project_nos = list(project_nos)
+    total = len(project_nos)
+    written = 0
+    failures = {}
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for done_count, (project_no, pdf_bytes, error) in enumerate(generate_pdfs(project_nos, render=render), 1):
+            if pdf_bytes:
+                zf.writestr(f"{project_no}.pdf", pdf_bytes)
+                written += 1
+            else:
+                failures[project_no] = str(error)
+                print(f"[pdf_generator] Batch render of {project_no} failed: {error}")
+            if progress:
+                progress(done_count, total, project_no)
+        if failures:
+            zf.writestr("errors.txt", "\n".join(f"{k}: {v}" for k, v in failures.items()) + "\n")
+    return written, failures
 
 
 # If this module is executed directly, run a small self-test that writes a PDF to disk
@@ -12,7 +12,10 @@ Requirements:
 Functions:
 - convert_html_to_pdf(html: str) -> Optional[bytes]
 - generate_plain_pdf(project_data: dict) -> bytes  (ReportLab fallback if available)
-- generate_pdf(template_name=None, project_data=None, html_string=None) -> bytes
+- generate_pdf(template_name=None, project_data=None, html_string=None, debug=None) -> bytes
+
+Debug artifacts (the HTML and the pisa log) are only written when requested,
+per request, by debug_capture.py.
 """
 
 import io
@@ -36,16 +39,11 @@ try:
 except Exception:
     HAVE_REPORTLAB = False
 
+import debug_capture
+import pdf_cache
 
-def _write_debug_html(source_html: str) -> str:
-    """Write debug HTML for inspection; returns the path (or empty string)."""
-    try:
-        path = os.path.abspath("wsm_debug.html")
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(source_html)
-        return path
-    except Exception:
-        return ""
+# Identifies this converter in PDF cache keys
+ENGINE_NAME = "xhtml2pdf"
 
 
 def convert_html_to_pdf(source_html: str) -> Optional[bytes]:
@@ -56,31 +54,21 @@ def convert_html_to_pdf(source_html: str) -> Optional[bytes]:
     if not HAVE_XHTML2PDF:
         raise RuntimeError("xhtml2pdf (pisa) is not installed. Install with: pip install xhtml2pdf")
 
-    # Write debug HTML for inspection (helps debugging templates)
-    dbg = _write_debug_html(source_html)
-    if dbg:
-        print(f"[pdf_generator] Debug HTML written to: {dbg}")
+    # Attach the HTML to the active debug capture, if any (helps debugging templates)
+    debug_capture.add("source.html", source_html)
 
     try:
         result = io.BytesIO()
         src = io.BytesIO(source_html.encode("utf-8"))
         pisa_status = pisa.CreatePDF(src, dest=result, encoding="utf-8")
 
-        # Optionally write pisa log
-        try:
-            log_text = getattr(pisa_status, "log", "")
-            log_path = os.path.abspath("wsm_pisa_log.txt")
-            with open(log_path, "w", encoding="utf-8") as lf:
-                lf.write(log_text)
-            print(f"[pdf_generator] pisa log written to: {log_path}")
-        except Exception:
-            pass
+        debug_capture.add("pisa_log.txt", str(getattr(pisa_status, "log", "")))
 
         if not getattr(pisa_status, "err", 1):
             result.seek(0)
             return result.read()
         else:
-            print("[pdf_generator] xhtml2pdf reported errors. See wsm_pisa_log.txt for details.")
+            print("[pdf_generator] xhtml2pdf reported errors (capture a debug run for the pisa log).")
             return None
     except Exception as e:
         print(f"[pdf_generator] Exception during xhtml2pdf conversion: {e}")
@@ -134,16 +122,50 @@ def generate_plain_pdf(project_data: Any) -> bytes:
     return buffer.read()
 
 
+def _cache_lookup(template_name, project_data, html_string, use_cache):
+    """Return (cache, key) for this request, or (None, None) when caching is off or fails."""
+    if not use_cache:
+        return None, None
+    try:
+        cache = pdf_cache.get_cache()
+        if cache is None:
+            return None, None
+        return cache, pdf_cache.key_for(ENGINE_NAME, template_name, project_data, html_string)
+    except Exception as e:
+        print(f"[pdf_generator] PDF cache unavailable: {e}")
+        return None, None
+
+
 def generate_pdf(template_name: Optional[str] = None,
                  project_data: Optional[dict] = None,
-                 html_string: Optional[str] = None) -> bytes:
+                 html_string: Optional[str] = None,
+                 use_cache: bool = True,
+                 debug: Optional[bool] = None) -> bytes:
     """
     Generate a PDF. Priority:
       1. If html_string provided -> convert it.
       2. Else if template_name provided -> try to render using template_manager.get_template_content
       3. If conversion fails -> fallback to plain PDF (ReportLab) if available.
+    Successful conversions are cached (see pdf_cache.py) unless use_cache is False.
+    debug=True captures debug artifacts for this request (see debug_capture.py).
     Returns PDF bytes or raises RuntimeError if all methods fail.
     """
+    cache, cache_key = _cache_lookup(template_name, project_data, html_string, use_cache)
+    # A debug run must really render, so it skips the lookup (but refreshes the entry)
+    if cache is not None and cache_key and not debug:
+        cached = cache.get(cache_key)
+        if cached:
+            print("[pdf_generator] PDF cache hit.")
+            return cached
+
+    with debug_capture.capture(debug) as cap:
+        if cap is not None:
+            cap.meta.update(template=template_name, project_no=(project_data or {}).get("project_no"))
+        return _render_uncached(template_name, project_data, html_string, cache, cache_key)
+
+
+def _render_uncached(template_name, project_data, html_string, cache, cache_key) -> bytes:
+    """The part of generate_pdf() after the cache lookup."""
     html = None
 
     if html_string:
@@ -160,6 +182,8 @@ def generate_pdf(template_name: Optional[str] = None,
     if html:
         pdf = convert_html_to_pdf(html)
         if pdf:
+            if cache is not None and cache_key:
+                cache.put(cache_key, pdf)
             return pdf
         else:
             print("[pdf_generator] HTML conversion failed; falling back to plain PDF if available.")
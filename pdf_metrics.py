@@ -0,0 +1,374 @@
+"""
+pdf_metrics.py
+
+Per-stage timing for the PDF pipeline: structured span records plus
+Prometheus-format histograms.
+
+Each stage of a render (the SQLite fetch, value formatting, the Jinja render,
+every engine attempt, the plain fallback) runs inside span(...). A span
+  - emits a JSON log record on the 'wsm_pdf.trace' logger, with trace and
+    parent span IDs so the stages of one render can be stitched together
+  - observes its duration in the wsm_pdf_stage_seconds histogram
+
+Metrics:
+    - wsm_pdf_stage_seconds{stage, template, engine, status}   histogram
+    - wsm_pdf_render_seconds{template, engine}                 histogram (whole generate_pdf)
+    - wsm_pdf_output_bytes{template, engine}                   histogram
+    - wsm_pdf_fallback_total{template}                         counter
+    - wsm_pdf_cache_total{result}                              counter
+
+Every process (Streamlit, render pool workers, render_worker, the HTTP
+server) keeps its own registry and dumps it to METRICS_DIR/<pid>-<id>.json every
+METRICS_FLUSH_INTERVAL seconds. exposition() merges all dumps, so the
+numbers cover work done in worker processes too. Counters from processes that
+have exited are kept, so totals never go backwards: a flush folds the dumps of
+exited processes (not rewritten for _RETIRE_AFTER_FLUSHES intervals and, on
+POSIX, no such pid) into METRICS_DIR/retired.json and deletes them, so a scrape
+reads one file per live process plus that one.
+
+Exposure: GET /metrics on render_server.py, and/or a node_exporter textfile
+rewritten at METRICS_TEXTFILE on every flush.
+
+Provides:
+    - span(stage, **labels) -> context manager yielding the Span (span.labels can be updated)
+    - observe_render(template, engine, seconds, size) -> None
+    - count_fallback(template) / count_cache(result) -> None
+    - exposition() -> str (Prometheus text format, all processes)
+    - flush() -> None (dump this process's registry now)
+"""
+
+import atexit
+import contextlib
+import contextvars
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Optional
+
+from config import PDF_CONFIG
+
+logger = logging.getLogger("wsm_pdf.trace")
+if PDF_CONFIG['METRICS_LOG_SPANS'] and not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# name -> (type, help, label names, buckets)
+_METRICS = {
+    "wsm_pdf_stage_seconds": ("histogram", "Duration of one PDF pipeline stage",
+                              ("stage", "template", "engine", "status"), SECONDS_BUCKETS),
+    "wsm_pdf_render_seconds": ("histogram", "Duration of a complete uncached generate_pdf call",
+                               ("template", "engine"), SECONDS_BUCKETS),
+    "wsm_pdf_output_bytes": ("histogram", "Size of generated PDFs",
+                             ("template", "engine"), BYTES_BUCKETS),
+    "wsm_pdf_fallback_total": ("counter", "Renders that fell back to a non-HTML engine",
+                               ("template",), None),
+    "wsm_pdf_cache_total": ("counter", "PDF cache lookups by result",
+                            ("result",), None),
+}
+
+# name -> {label values tuple -> [bucket counts..., sum, count]} (histograms) or float (counters)
+_values = {name: {} for name in _METRICS}
+_lock = threading.Lock()
+_current_span = contextvars.ContextVar("pdf_metrics_span", default=None)
+
+
+def _label_values(name: str, labels: dict) -> tuple:
+    return tuple(str(labels.get(label) or "") for label in _METRICS[name][2])
+
+
+def _observe(name: str, labels: dict, value: float) -> None:
+    if not PDF_CONFIG['METRICS_ENABLED']:
+        return
+    buckets = _METRICS[name][3]
+    key = _label_values(name, labels)
+    with _lock:
+        series = _values[name].get(key)
+        if series is None:
+            series = _values[name][key] = [0] * len(buckets) + [0.0, 0]
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+    _ensure_flusher()
+
+
+def _inc(name: str, labels: dict, amount: float = 1.0) -> None:
+    if not PDF_CONFIG['METRICS_ENABLED']:
+        return
+    key = _label_values(name, labels)
+    with _lock:
+        _values[name][key] = _values[name].get(key, 0.0) + amount
+    _ensure_flusher()
+
+
+class Span:
+    """One timed stage; labels may be filled in while the stage runs (e.g. the engine used)."""
+
+    def __init__(self, stage: str, labels: dict, parent: Optional["Span"]):
+        self.stage = stage
+        self.labels = labels
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent is not None else None
+        self.status = "ok"
+
+
+@contextlib.contextmanager
+def span(stage: str, **labels):
+    """Time the enclosed block as one pipeline stage (nested spans share the trace ID)."""
+    parent = _current_span.get()
+    if parent is not None:
+        # Inherit template/engine so inner stages are labelled without re-plumbing
+        labels = {**{k: v for k, v in parent.labels.items() if k in ("template", "engine")}, **labels}
+    current = Span(stage, labels, parent)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.status = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        _current_span.reset(token)
+        _observe("wsm_pdf_stage_seconds", {**current.labels, "stage": stage, "status": current.status}, seconds)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "event": "span",
+                "ts": time.time(),
+                "pid": os.getpid(),
+                "trace_id": current.trace_id,
+                "span_id": current.span_id,
+                "parent_id": current.parent_id,
+                "stage": stage,
+                "status": current.status,
+                "duration_ms": round(seconds * 1000, 3),
+                **{k: v for k, v in current.labels.items() if v is not None},
+            }, default=str))
+
+
+def observe_render(template: Optional[str], engine: Optional[str], seconds: float, size: int) -> None:
+    """Record one complete render: its latency and output size."""
+    labels = {"template": template, "engine": engine}
+    _observe("wsm_pdf_render_seconds", labels, seconds)
+    _observe("wsm_pdf_output_bytes", labels, size)
+
+
+def count_fallback(template: Optional[str]) -> None:
+    _inc("wsm_pdf_fallback_total", {"template": template})
+
+
+def count_cache(result: str) -> None:
+    _inc("wsm_pdf_cache_total", {"result": result})
+
+
+# ---- multi-process aggregation and exposition ------------------------
+
+def _snapshot() -> dict:
+    with _lock:
+        return {name: [[list(key), list(value) if isinstance(value, list) else value]
+                       for key, value in series.items()]
+                for name, series in _values.items() if series}
+
+
+_dump_names = {}
+# Sum of the dumps of exited processes, with the names of the dumps folded into it
+_RETIRED = "retired.json"
+_RETIRED_LOCK = "retired.lock"
+_RETIRE_AFTER_FLUSHES = 10
+
+
+def _dump_path() -> str:
+    # pid plus a random suffix, so a recycled pid never overwrites a dead process's totals
+    pid = os.getpid()
+    if pid not in _dump_names:
+        _dump_names[pid] = f"{pid}-{uuid.uuid4().hex[:8]}.json"
+    return os.path.join(PDF_CONFIG['METRICS_DIR'], _dump_names[pid])
+
+
+def flush() -> None:
+    """Dump this process's registry to METRICS_DIR/<pid>-<id>.json (and refresh the textfile)."""
+    if not PDF_CONFIG['METRICS_DIR']:
+        return
+    try:
+        _atomic_write(_dump_path(), json.dumps(_snapshot()))
+        _fold_exited_dumps()
+        if PDF_CONFIG['METRICS_TEXTFILE']:
+            _atomic_write(PDF_CONFIG['METRICS_TEXTFILE'], exposition())
+    except Exception as e:
+        print(f"[pdf_metrics] Could not write metrics: {e}")
+
+
+def _atomic_write(path: str, text: str) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _add(merged: dict, snapshot: dict) -> None:
+    """Sum one snapshot (_snapshot() format) into merged ({name: {key tuple: value}})."""
+    for name, series in snapshot.items():
+        if name not in merged:
+            continue
+        for key, value in series:
+            key = tuple(key)
+            if isinstance(value, list):
+                total = merged[name].setdefault(key, [0] * len(value))
+                merged[name][key] = [a + b for a, b in zip(total, value)]
+            else:
+                merged[name][key] = merged[name].get(key, 0.0) + value
+
+
+def _pid_running(pid: int) -> bool:
+    if os.name != "posix":
+        # os.kill(pid, 0) would terminate the process on Windows; the dump's age decides alone
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # e.g. EPERM: it exists
+    return True
+
+
+def _fold_exited_dumps() -> None:
+    """Sum the dumps of exited processes into retired.json and delete them."""
+    directory = PDF_CONFIG['METRICS_DIR']
+    stale_before = time.time() - _RETIRE_AFTER_FLUSHES * PDF_CONFIG['METRICS_FLUSH_INTERVAL']
+    exited = []
+    for path in glob.glob(os.path.join(directory, "*-*.json")):
+        try:
+            pid = int(os.path.basename(path).split("-", 1)[0])
+            if os.path.getmtime(path) < stale_before and not _pid_running(pid):
+                exited.append(path)
+        except (OSError, ValueError):
+            continue
+    if not exited:
+        return
+
+    lock_path = os.path.join(directory, _RETIRED_LOCK)
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        # Another process is folding; a lock left by one that died is broken on a later flush
+        with contextlib.suppress(OSError):
+            if os.path.getmtime(lock_path) < stale_before:
+                os.unlink(lock_path)
+        return
+    try:
+        retired_path = os.path.join(directory, _RETIRED)
+        retired = _read_json(retired_path) or {}
+        merged = {name: {} for name in _METRICS}
+        _add(merged, retired.get("metrics", {}))
+        # Dumps folded before but not yet deleted stay listed, so they are never counted twice
+        folded = [name for name in retired.get("folded", []) if os.path.exists(os.path.join(directory, name))]
+        for path in exited:
+            name = os.path.basename(path)
+            snapshot = _read_json(path)
+            if name in folded or snapshot is None:
+                continue
+            _add(merged, snapshot)
+            folded.append(name)
+        metrics = {name: [[list(key), value] for key, value in series.items()]
+                   for name, series in merged.items() if series}
+        _atomic_write(retired_path, json.dumps({"folded": folded, "metrics": metrics}))
+        for name in folded:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(os.path.join(directory, name))
+    finally:
+        os.unlink(lock_path)
+
+
+def _merged() -> dict:
+    """All processes' series summed: this process live, the others from their dumps and retired.json."""
+    merged = {name: {} for name in _METRICS}
+    _add(merged, _snapshot())
+    directory = PDF_CONFIG['METRICS_DIR']
+    if not directory:
+        return merged
+    own = os.path.basename(_dump_path())
+    dumps = {}
+    for path in glob.glob(os.path.join(directory, "*-*.json")):
+        name = os.path.basename(path)
+        if name != own:
+            dumps[name] = _read_json(path)
+    # Read after the dumps: a dump folded in between is listed here and skipped below
+    retired = _read_json(os.path.join(directory, _RETIRED)) or {}
+    _add(merged, retired.get("metrics", {}))
+    folded = set(retired.get("folded", ()))
+    for name, snapshot in dumps.items():
+        if snapshot is not None and name not in folded:
+            _add(merged, snapshot)
+    return merged
+
+
+def _format_labels(names, values, extra: Optional[tuple] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def exposition() -> str:
+    """Prometheus text exposition format (0.0.4) of the merged metrics."""
+    lines = []
+    for name, series in _merged().items():
+        kind, help_text, label_names, buckets = _METRICS[name]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in sorted(series.items()):
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(label_names, key)} {value:g}")
+                continue
+            for bound, count in zip(buckets, value):
+                lines.append(f"{name}_bucket{_format_labels(label_names, key, ('le', f'{bound:g}'))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(label_names, key, ('le', '+Inf'))} {value[-1]}")
+            lines.append(f"{name}_sum{_format_labels(label_names, key)} {value[-2]:.6f}")
+            lines.append(f"{name}_count{_format_labels(label_names, key)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _run_flusher() -> None:
+    while True:
+        time.sleep(PDF_CONFIG['METRICS_FLUSH_INTERVAL'])
+        flush()
+
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is None and PDF_CONFIG['METRICS_DIR']:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_run_flusher, name="pdf-metrics-flusher", daemon=True)
+                _flusher.start()
+                atexit.register(flush)
@@ -0,0 +1,734 @@
+"""
+pdf_native.py
+
+Native ReportLab Platypus renderer for WSM documents; no HTML involved.
+
+The HTML engines spend most of a render parsing 35-45 KB of HTML and CSS that
+is the same for every project. For templates listed here the page layout is
+instead described declaratively (pages, sections, label/field tables) and
+built straight into Platypus flowables, with table cells as text wrapped to
+lines here rather than as paragraphs. In benchmarks/baseline.json (python -m
+wsm_pdf bench, one CPU) STD_WSM takes 59 ms p50 against 551 ms for template +
+xhtml2pdf with short texts, and 104 ms against 685 ms with long ones.
+
+STD_WSM is laid out to match templates/STD_WSM.html: the same eight pages,
+headers, tables and texts, A4 with PDF_CONFIG['MARGINS'], Helvetica at the
+template's sizes, grey header cells and "Page N of M" footers. Content that
+does not fit a page (long requirement texts) flows onto continuation pages.
+
+Layout blocks (LAYOUTS[template] is a list of pages, each {"title", "header", "blocks"}):
+    ("grid", rows)               two label/value pairs per row; a row with one pair spans the table
+    ("fields", title, pairs)     subsection: bold title over a label | value table
+    ("section", title)           section title with a rule under it
+    ("subsection", title)        bold title on its own
+    ("text", text) / ("bullets", items) / ("inline", pairs) / ("signature", pairs)
+A value is a field name, or a list of (label, field) pairs shown as lines in one cell.
+
+The company logo, if any, is drawn at the top left of every page: the
+project's 'company_logo' if it is an inline data: URI, else
+PDF_CONFIG['COMPANY_LOGO']. Other project values (paths, URLs) are ignored:
+project data can come from render_server clients, and ReportLab would read any
+local file or fetch any URL it is given.
+
+Provides:
+    - ENGINE_NAME ('reportlab-native'), the engine name used in cache keys and metrics
+    - supports(template_name) -> bool (a layout exists)
+    - enabled_for(template_name) -> bool (a layout exists and PDF_CONFIG['NATIVE_TEMPLATES'] lists it)
+    - is_available() -> bool (ReportLab installed)
+    - layout_digest(template_name) -> str (changes whenever the layout spec or the configured logo changes)
+    - render(template_name, project_data) -> bytes
+
+Settings (PDF_CONFIG in config.py):
+    - NATIVE_TEMPLATES   templates rendered natively by default (generate_pdf falls back to HTML on errors)
+    - COMPANY_LOGO       default logo image (path or data: URI)
+"""
+
+import base64
+import hashlib
+import importlib.util
+import io
+import os
+import re
+from datetime import datetime, date
+from typing import Optional, Any
+
+from config import PDF_CONFIG
+
+ENGINE_NAME = "reportlab-native"
+
+_OTHER = "Other Requirement/Special Instructions"
+
+_STD_WSM = [
+    {
+        "title": "Worksheet for Manufacturing (WSM)",
+        "header": ([("WSM Type", "wsm_type"), ("Revision", "revision")], [("Date", "date")]),
+        "blocks": [
+            ("grid", [
+                [("Client:", "client"), ("Consultant:", "consultant")],
+                [("Branch Engineer:", "branch_engineer"), ("Division Engineer:", "division_engineer")],
+            ]),
+            ("grid", [
+                [("Site:", "site"), ("Altitude from MSL:", "altitude")],
+                [("Temp Min / Max:", "temp_min_max"),
+                 ("Voltage Details:", [("Power Voltage", "power_voltage"), ("Control Voltage", "control_voltage"),
+                                       ("Frequency", "frequency")])],
+                [("Customer PO #:", "customer_po"), ("Date:", "po_date")],
+                [("Delivery Date:", "delivery_date"), ("Special Delivery (Yes/No):", "special_delivery")],
+                [("LD - Delivery time:", "ld_delivery_time"), ("LD - Performance:", "ld_performance")],
+            ]),
+            ("section", "Terms of Payment"),
+            ("fields", None, [("Supply:", "supply_payment_terms"), ("Service:", "service_payment_terms")]),
+            ("grid", [
+                [("Direct orders (Yes/No):", "direct_orders"), ("FM Role:", "fm_role")],
+                [("Inspection:", "inspection")],
+            ]),
+            ("inline", [("Price Basis:", "price_basis"), ("Commission - If any:", "commission")]),
+        ],
+    },
+    {
+        "title": "Supply/Services",
+        "blocks": [
+            ("fields", "1 Boiler", [
+                ("Boiler Capacity (F&A100 Deg C)", "boiler_capacity"),
+                ("Design Pressure", "design_pressure"),
+                ("Quantity", "boiler_quantity"),
+                ("Fuel", "boiler_fuel"),
+                ("Boiler Type", "boiler_type"),
+                ("Boiler configuration", "boiler_configuration"),
+                ("Any non-standard requirement", "non_standard_requirement"),
+                ("Pumps", "pumps"),
+                ("Motors", "motors"),
+                ("Valves", "valves"),
+                ("Flanges", "flanges"),
+                ("Insulation & Cladding", "insulation_cladding"),
+                ("Insulation Density", "insulation_density"),
+                ("Insulation thickness", "insulation_thickness"),
+                ("Cladding Material", "cladding_material"),
+                ("Orientation", "orientation"),
+                ("Boiler Design", "boiler_design"),
+                ("Specific Design Approvals", "specific_design_approvals"),
+                ("Emissions", "emissions"),
+                (_OTHER, "boiler_other_requirements"),
+            ]),
+            ("fields", "2 Water Level Control", [
+                ("Std. - WLC type /Single/Two element control", "wlc_type"),
+                ("Type of water level control", "water_level_control_type"),
+                (_OTHER, "wlc_other_requirements"),
+            ]),
+            ("fields", "3 Burner", [
+                ("Type", "burner_type"),
+                ("Make", "burner_make"),
+                ("Model", "burner_model"),
+                ("Quantity", "burner_quantity"),
+                ("Modulation", "burner_modulation"),
+                ("FM burner Regulation", "fm_burner_regulation"),
+            ]),
+        ],
+    },
+    {
+        "title": "Supply/Services (Continued)",
+        "blocks": [
+            ("fields", "3 Burner (Continued)", [
+                ("Primary Fuel", "primary_fuel"),
+                ("Secondary fuel", "secondary_fuel"),
+                ("Type (Monobloc/ Dual Bloc)", "burner_bloc_type"),
+                ("Fan (Burner Mfg./Local)", "burner_fan"),
+                ("LP Gas train", "lp_gas_train"),
+                ("O2 trimming (Yes/No) and Details", "o2_trimming"),
+                ("VFD (Yes/No) and Details", "vfd_details"),
+                (_OTHER, "burner_other_requirements"),
+                ("Mention Special Makes, if any", "special_makes"),
+            ]),
+            ("fields", "4 Combustion Blower", [
+                ("Flow", "combustion_blower_flow"),
+                ("Head", "combustion_blower_head"),
+                ("Motors suitable for VFD (Yes/No)", "vfd_suitable_motors"),
+                ("Silencer (Yes/No)", "silencer"),
+                ("Noise level (Std. /Non-Std.)", "noise_level"),
+                (_OTHER, "combustion_blower_other_requirements"),
+            ]),
+            ("fields", "5 Control Panel", [
+                ("Panel (Boiler mounted/Floor Standing)", "control_panel_type"),
+                ("Panel (STD/ Compartmentalized)", "panel_configuration"),
+                ("PLC - Yes/No", "plc"),
+                ("PLC Make", "plc_make"),
+                ("IP Rating", "ip_rating"),
+                (_OTHER, "control_panel_other_requirements"),
+            ]),
+            ("fields", "6 Boiler Site Electricals", [
+                ("Cabling supply", "cabling_supply"),
+                ("Cable trays", "cable_trays"),
+                (_OTHER, "electricals_other_requirements"),
+            ]),
+        ],
+    },
+    {
+        "title": "Supply/Services (Continued)",
+        "blocks": [
+            ("fields", "7 Chemical Dosing System", [
+                ("Qty.", "chemical_dosing_qty"),
+                ("Tank (Capacity)", "chemical_dosing_tank_capacity"),
+                ("Dosing Pumps - 1No/2No", "dosing_pumps"),
+                ("Type of control (Manual/Auto)", "chemical_dosing_control_type"),
+                (_OTHER, "chemical_dosing_other_requirements"),
+            ]),
+            ("fields", "8 Ring Main system", [
+                ("Qty. of pumps (1W/1W+15s)", "ring_main_pump_qty"),
+                (_OTHER, "ring_main_other_requirements"),
+            ]),
+            ("fields", "9 Oil pumping & heating Station/Oil pumping station - OPS/OPH", [
+                ("Utility PRS/PRV for Steam (Yes/No)", "utility_prs_prv"),
+                (_OTHER, "oil_station_other_requirements"),
+            ]),
+            ("fields", "10 H.P. Gas Train", [
+                ("Make", "hp_gas_train_make"),
+                ("Type of Gas (NG/PNG/Biogas)", "gas_type"),
+                ("NG Inlet Pressure", "ng_inlet_pressure"),
+                (_OTHER, "hp_gas_train_other_requirements"),
+            ]),
+            ("fields", "11 Heat recovery Unit", [
+                ("Type", "heat_recovery_type"),
+                ("Integral/Non-Integral/Integrated", "heat_recovery_integration"),
+                ("Design fuel", "heat_recovery_design_fuel"),
+                ("Type (MS Finned/CI Gilled)", "heat_recovery_material_type"),
+                ("Quantity", "heat_recovery_quantity"),
+                ("Design Inlet Feed Water Temperature", "design_inlet_feed_water_temp"),
+                ("Design outlet Feed water Temperature", "design_outlet_feed_water_temp"),
+                ("Flue gas inlet temperature", "flue_gas_inlet_temp"),
+                ("Flue Gas Outlet Temperature", "flue_gas_outlet_temp"),
+                ("Insulation & Cladding", "heat_recovery_insulation"),
+                ("Motorized Dampers", "motorized_dampers"),
+                ("Control valve on Water side", "water_side_control_valve"),
+            ]),
+        ],
+    },
+    {
+        "title": "Supply/Services (Continued)",
+        "blocks": [
+            ("fields", "11 Heat recovery Unit (Continued)", [
+                ("Manual Dampers", "manual_dampers"),
+                ("Soot Blowers", "soot_blowers"),
+                ("WPH Makeup pump (Yes/No)", "wph_makeup_pump"),
+                (_OTHER, "heat_recovery_other_requirements"),
+            ]),
+            ("fields", "12 Pressurized Deaerator/Pressurized Tank", [
+                ("Type", "deaerator_type"),
+                ("Quantity", "deaerator_quantity"),
+                ("Deaeration capacity", "deaeration_capacity"),
+                ("Storage capacity", "storage_capacity"),
+                ("Insulation & Cladding", "deaerator_insulation"),
+                (_OTHER, "deaerator_other_requirements"),
+            ]),
+            ("text", "Utility PRS/PRV to be sized for Ambient Water temperature. "
+                     "Make up control valve shall be part of std. Supply."),
+            ("fields", "7 Site Specific Requirements", [
+                ("Safety officer", "safety_officer"),
+                ("Site supervisor", "site_supervisor"),
+                ("Construction water", "construction_water"),
+                ("Construction Power", "construction_power"),
+                ("Safety specific requirements", "safety_requirements"),
+                ("EHS Policy (Yes/No)", "ehs_policy"),
+                ("Drinking Water", "drinking_water"),
+                (_OTHER, "site_other_requirements"),
+            ]),
+            ("fields", "8 Services", [
+                ("P&ID, BHL, GA Approval/Submission (Yes/No)", "drawing_approval"),
+                ("Control Panel Drawing Approval (Yes/No)", "control_panel_drawing_approval"),
+                ("Special Documentation, If any", "special_documentation"),
+                ("IBR Approval (PFO/Steam Test/only Folder)", "ibr_approval"),
+                ("Site Services", "site_services"),
+                ("Unloading & Leading", "unloading_leading"),
+                ("Erection & Commissioning", "erection_commissioning"),
+            ]),
+        ],
+    },
+    {
+        "title": "Services (Continued)",
+        "blocks": [
+            ("fields", "8 Services (Continued)", [
+                ("Supervision", "supervision"),
+                (_OTHER, "services_other_requirements"),
+            ]),
+        ],
+    },
+    {
+        "title": "Exclusions & Battery Limits",
+        "blocks": [
+            ("subsection", "Exclusions"),
+            ("text", "Unless otherwise specified under additional scope of supply, our offer excludes:"),
+            ("bullets", [
+                "All Civil and Structural work for Boiler installation.",
+                "Feed Water Bulk Storage, Feed Water Transfer Pumps & Water treatment plant.",
+                "Supporting Structural for items not in our scope.",
+                "Boiler House Electricals for Balance of Plant Items",
+                "Fuel, water instrumentation and accessories required for performance testing.",
+                "Steam, water, and fuel piping beyond terminal points.",
+                "Any specific item not indicated in our scope of supply.",
+            ]),
+            ("fields", "Battery Limits", [
+                ("Boiler Feed Water", "battery_limits_boiler_feed_water"),
+                ("Steam", "battery_limits_steam"),
+                ("Fuel FO / HSD", "battery_limits_fuel"),
+                ("Blow-down", "battery_limits_blow_down"),
+                ("Safety Valve Exhaust", "battery_limits_safety_valve_exhaust"),
+                ("Instrument Air", "battery_limits_instrument_air"),
+                ("Power", "battery_limits_power"),
+            ]),
+        ],
+    },
+    {
+        "title": "Other Details",
+        "blocks": [
+            ("fields", "DOCUMENTATION", [
+                ("General Arrangement Drawing (GA) (Yes/No)", "ga_drawing"),
+                ("Piping and Instrumentation Drawing (P & ID) (Yes/No)", "p_id_drawing"),
+                ("Boiler House Layout (BHL) (Yes/No)", "bhl_drawing"),
+                ("Piping Drawing (Yes/No)", "piping_drawing"),
+                ("Qualification Documents (Yes/No)", "qualification_documents"),
+                ("Chimney drawing (Yes/No)", "chimney_drawing"),
+                ("Chimney drawing (Schematic/ Fabrication)", "chimney_drawing_type"),
+                ("Feed water Tank drawing (Yes/No)", "feed_water_tank_drawing"),
+                ("Feed water Tank capacity", "feed_water_tank_capacity"),
+                ("Day Oil Tank drawing (Yes/No)", "day_oil_tank_drawing"),
+                ("Day Oil Tank capacity", "day_oil_tank_capacity"),
+                (_OTHER, "documentation_other_requirements"),
+            ]),
+            ("fields", "GUARANTEES", [
+                ("Fuel Consumption (Yes/No)", "fuel_consumption_guarantee"),
+                ("Efficiency on NCV Basis (Yes/No)", "efficiency_ncv_guarantee"),
+                (_OTHER, "guarantees_other_requirements"),
+            ]),
+            ("fields", "DOCUMENTS ENCLOSED", [
+                ("Customer LOI (Yes/No)", "customer_loi"),
+                ("Customer Purchase Order (Yes/No)", "customer_purchase_order"),
+                ("Customer's Layout (Yes/No)", "customer_layout"),
+                ("Any other documents", "other_documents"),
+            ]),
+            ("signature", [("Sign", "signature"), ("Date", "signature_date")]),
+        ],
+    },
+]
+
+LAYOUTS = {
+    "STD_WSM": _STD_WSM,
+}
+
+_digests = {}
+# Bump when a change to the rendering code below changes the output
+_RENDERER_VERSION = 1
+
+
+def supports(template_name: Optional[str]) -> bool:
+    """True if template_name has a native layout."""
+    return template_name in LAYOUTS
+
+
+def enabled_for(template_name: Optional[str]) -> bool:
+    """True if generate_pdf should render template_name natively by default."""
+    return supports(template_name) and template_name in PDF_CONFIG['NATIVE_TEMPLATES']
+
+
+def is_available() -> bool:
+    """True if ReportLab is installed (checked without importing it)."""
+    return importlib.util.find_spec("reportlab") is not None
+
+
+def layout_digest(template_name: str) -> str:
+    """
+    Digest of the layout spec and of PDF_CONFIG['COMPANY_LOGO'], for cache keys:
+    editing the layout or replacing the default logo invalidates cached PDFs.
+    """
+    if template_name not in _digests:
+        spec = repr((_RENDERER_VERSION, LAYOUTS[template_name]))
+        _digests[template_name] = hashlib.sha256(spec.encode("utf-8")).hexdigest()
+    logo = _logo_fingerprint(PDF_CONFIG['COMPANY_LOGO'])
+    if not logo:
+        return _digests[template_name]
+    return hashlib.sha256(f"{_digests[template_name]}:{logo}".encode("utf-8")).hexdigest()
+
+
+def _logo_fingerprint(source: str) -> str:
+    """Identifies a logo: a data: URI by its content, a file by path, size and modification time."""
+    if not source:
+        return ""
+    if source.startswith("data:"):
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+    try:
+        st = os.stat(source)
+    except OSError:
+        return source
+    return f"{source}:{st.st_size}:{st.st_mtime_ns}"
+
+
+# ---- rendering ---------------------------------------------------------
+
+def _text(value: Any) -> str:
+    # Same formatting as template_manager uses for the HTML templates
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _markup(text: str) -> str:
+    """Escape text for a Platypus Paragraph, keeping line breaks."""
+    escaped = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return escaped.replace("\r\n", "\n").replace("\n", "<br/>")
+
+
+def _length(value: str) -> float:
+    """CSS-style length ('0.5in', '12mm', '1cm', '36pt') in points."""
+    match = re.fullmatch(r"\s*([\d.]+)\s*(in|mm|cm|pt|px)?\s*", value or "")
+    if not match:
+        return 36.0
+    number = float(match.group(1))
+    return number * {"in": 72.0, "mm": 72 / 25.4, "cm": 72 / 2.54, "pt": 1.0, "px": 0.75}[match.group(2) or "pt"]
+
+
+_styles = None
+_char_widths = {}
+
+# Body text (table cells and paragraphs)
+_FONT, _BOLD_FONT, _FONT_SIZE, _LEADING = "Helvetica", "Helvetica-Bold", 9, 12.6
+# Cell padding, left + right
+_PADDING = 12.0
+# Table rows taller than this many lines are drawn as several strips that can go on different pages
+_STRIP_LINES = 10
+
+
+def _get_styles() -> dict:
+    """Paragraph styles matching the template's CSS (12px Arial body, 24px headers, ...)."""
+    global _styles
+    if _styles is None:
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib.styles import ParagraphStyle
+
+        body = ParagraphStyle("wsm-body", fontName=_FONT, fontSize=_FONT_SIZE, leading=_LEADING,
+                              textColor=_text_color())
+        _styles = {
+            "body": body,
+            "title": ParagraphStyle("wsm-title", parent=body, fontName=_BOLD_FONT, fontSize=18,
+                                    leading=22, alignment=TA_CENTER, spaceAfter=4),
+            "section": ParagraphStyle("wsm-section", parent=body, fontName=_BOLD_FONT, fontSize=12,
+                                      leading=15, spaceAfter=2),
+            "subsection": ParagraphStyle("wsm-subsection", parent=body, fontName=_BOLD_FONT, spaceAfter=4,
+                                         keepWithNext=1),
+            "bullet": ParagraphStyle("wsm-bullet", parent=body, leftIndent=18, bulletIndent=6),
+            "center": ParagraphStyle("wsm-center", parent=body, alignment=TA_CENTER),
+        }
+    return _styles
+
+
+def _text_color():
+    from reportlab.lib import colors
+
+    return colors.HexColor("#333333")
+
+
+def _text_width(text: str, font: str) -> float:
+    """Width of text at the body size, from per-character widths measured once per process."""
+    widths = _char_widths.get(font)
+    if widths is None:
+        widths = _char_widths[font] = {}
+    total = 0.0
+    for char in text:
+        width = widths.get(char)
+        if width is None:
+            from reportlab.pdfbase.pdfmetrics import stringWidth
+
+            width = widths[char] = stringWidth(char, font, _FONT_SIZE)
+        total += width
+    return total
+
+
+def _words(text: str, width: float, font: str):
+    """(word, width) pairs of one line of text; words wider than width are cut into pieces that fit."""
+    for word in text.split():
+        word_width = _text_width(word, font)
+        if word_width <= width:
+            yield word, word_width
+            continue
+        piece, used = [], 0.0
+        for char in word:
+            char_width = _text_width(char, font)
+            if piece and used + char_width > width:
+                yield "".join(piece), used
+                piece, used = [], 0.0
+            piece.append(char)
+            used += char_width
+        yield "".join(piece), used
+
+
+def _wrap_lines(text: str, width: float, font: str = _FONT) -> list:
+    """
+    Break text into lines of at most width points (greedy, like a browser or Platypus).
+    Table cells get these lines as plain strings, which Platypus measures and draws
+    line by line without parsing paragraph markup; that is most of the speed of
+    this renderer. Explicit line breaks are kept.
+    """
+    space = _text_width(" ", font)
+    lines = []
+    for paragraph in text.replace("\r\n", "\n").split("\n"):
+        line, used = [], 0.0
+        for word, word_width in _words(paragraph, width, font):
+            if line and used + space + word_width > width:
+                lines.append(" ".join(line))
+                line, used = [], 0.0
+            used += (space if line else 0.0) + word_width
+            line.append(word)
+        lines.append(" ".join(line))
+    return lines
+
+
+def _break_long_words(text: str, width: float) -> str:
+    """
+    Split words wider than width into pieces that fit, for text shown in a Paragraph.
+    Platypus can split them itself, but measures such a word once per character,
+    which takes tens of seconds on a few 5,000-character tokens.
+    """
+    return "\n".join(" ".join(word for word, _ in _words(line, width, _FONT))
+                     for line in text.replace("\r\n", "\n").split("\n"))
+
+
+def _logo_source(project_logo: str) -> str:
+    """The logo to draw: an inline data: URI from the project, else the configured logo."""
+    if project_logo.startswith("data:"):
+        return project_logo
+    if project_logo:
+        print("[pdf_native] Ignoring company_logo that is not a data: URI; using PDF_CONFIG['COMPANY_LOGO'].")
+    return PDF_CONFIG['COMPANY_LOGO']
+
+
+def _load_logo(source: str):
+    """ImageReader for a data: URI or a (trusted, configured) file path, or None if it cannot be read."""
+    from reportlab.lib.utils import ImageReader
+
+    try:
+        if source.startswith("data:"):
+            return ImageReader(io.BytesIO(base64.b64decode(source.split(",", 1)[1])))
+        return ImageReader(source)
+    except Exception as e:
+        print(f"[pdf_native] Could not load company logo: {e}")
+        return None
+
+
+class _Builder:
+    """Turns one layout and one project into Platypus flowables."""
+
+    def __init__(self, data: dict, width: float):
+        from reportlab.lib import colors
+
+        self.data = data
+        self.width = width
+        self.styles = _get_styles()
+        self.border = colors.HexColor("#333333")
+        self.header_fill = colors.HexColor("#f2f2f2")
+
+    def value(self, field, width: float) -> str:
+        """Paragraph markup for a field (or list of (label, field) lines) shown in width points."""
+        if isinstance(field, list):
+            return "<br/>".join(f"{_markup(label)}: {self.value(name, width)}" for label, name in field)
+        return _markup(_break_long_words(self.data.get(field, ''), width))
+
+    def cell(self, field, width: float) -> str:
+        """Table cell text for a field (or list of (label, field) lines), wrapped to width points."""
+        if isinstance(field, list):
+            texts = [f"{label}: {self.data.get(name, '')}" for label, name in field]
+        else:
+            texts = [self.data.get(field, '')]
+        return "\n".join(line for text in texts for line in _wrap_lines(text, width))
+
+    def para(self, markup: str, style: str = "body"):
+        from reportlab.platypus import Paragraph
+
+        return Paragraph(markup, self.styles[style])
+
+    def rows(self, widths: list, rows: list, title: str = '') -> list:
+        """
+        A bordered table of label/value rows, labels in the even columns and values
+        wrapped to lines beforehand; a row of one label/value pair spans the row.
+        Rows taller than _STRIP_LINES are cut into strips with no border between
+        them, so a long value runs over pages where the table is split by row,
+        without Platypus splitting cells. A title goes in an unbordered first row
+        that is kept on the page of the first strip.
+        """
+        from reportlab.platypus import Table, TableStyle
+
+        border = (0.75, self.border)
+        style = [
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("FONT", (0, 0), (-1, -1), _FONT, _FONT_SIZE, _LEADING),
+            ("TEXTCOLOR", (0, 0), (-1, -1), _text_color()),
+            ("LEFTPADDING", (0, 0), (-1, -1), _PADDING / 2),
+            ("RIGHTPADDING", (0, 0), (-1, -1), _PADDING / 2),
+            ("TOPPADDING", (0, 0), (-1, -1), 0),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 0),
+        ]
+        strips = []
+        if title:
+            strips.append(["\n".join(_wrap_lines(title, self.width, _BOLD_FONT))] + [""] * (len(widths) - 1))
+            style += [("SPAN", (0, 0), (-1, 0)), ("FONT", (0, 0), (0, 0), _BOLD_FONT, _FONT_SIZE, _LEADING),
+                      ("LEFTPADDING", (0, 0), (0, 0), 0), ("BOTTOMPADDING", (0, 0), (0, 0), 4),
+                      ("NOSPLIT", (0, 0), (-1, 1))]
+        style += [("LINEBEFORE", (0, len(strips)), (-1, -1)) + border,
+                  ("LINEAFTER", (-1, len(strips)), (-1, -1)) + border]
+        for cells in rows:
+            first = len(strips)
+            cell_lines = [cell.split("\n") for cell in cells]
+            height = max(len(lines) for lines in cell_lines)
+            for start in range(0, height, _STRIP_LINES):
+                strips.append(["\n".join(lines[start:start + _STRIP_LINES]) for lines in cell_lines] +
+                              [""] * (len(widths) - len(cells)))
+            last = len(strips) - 1
+            style += [("LINEABOVE", (0, first), (-1, first)) + border, ("TOPPADDING", (0, first), (-1, first), 4.5),
+                      ("LINEBELOW", (0, last), (-1, last)) + border, ("BOTTOMPADDING", (0, last), (-1, last), 4.5)]
+            for c in range(0, len(cells), 2):
+                style += [("BACKGROUND", (c, first), (c, last), self.header_fill),
+                          ("FONT", (c, first), (c, last), _BOLD_FONT, _FONT_SIZE, _LEADING)]
+            if len(cells) < len(widths):
+                style += [("SPAN", (len(cells) - 1, r), (-1, r)) for r in range(first, last + 1)]
+        table = Table(strips, colWidths=[self.width * w for w in widths], spaceAfter=11.25)
+        table.setStyle(TableStyle(style))
+        return [table]
+
+    def header(self, page: dict) -> list:
+        from reportlab.platypus import HRFlowable, Table, TableStyle
+
+        flowables = [self.para(_markup(page["title"]), "title")]
+        if page.get("header"):
+            width = self.width / len(page["header"])
+            columns = [[self.para(f"<b>{_markup(label)}:</b> {self.value(field, width)}") for label, field in side]
+                       for side in page["header"]]
+            grid = Table([columns], colWidths=[width] * len(columns))
+            grid.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP"),
+                                      ("LEFTPADDING", (0, 0), (-1, -1), 0)]))
+            flowables.append(grid)
+        flowables.append(HRFlowable(width="100%", thickness=1.5, color=self.border, spaceBefore=4, spaceAfter=15))
+        return flowables
+
+    def block(self, block: tuple) -> list:
+        from reportlab.platypus import HRFlowable, Paragraph, Spacer, Table, TableStyle
+
+        kind = block[0]
+        if kind == "grid":
+            rows = []
+            for row in block[1]:
+                # A single pair spans the row, so its value gets three columns
+                value_width = self.width * (0.3 if len(row) > 1 else 0.8) - _PADDING
+                cells = []
+                for label, field in row:
+                    cells += ["\n".join(_wrap_lines(label, self.width * 0.2 - _PADDING, _BOLD_FONT)),
+                              self.cell(field, value_width)]
+                rows.append(cells)
+            return self.rows([0.2, 0.3, 0.2, 0.3], rows)
+        if kind == "fields":
+            _, title, pairs = block
+            label_width, value_width = self.width * 0.45 - _PADDING, self.width * 0.55 - _PADDING
+            return self.rows([0.45, 0.55], [["\n".join(_wrap_lines(label, label_width, _BOLD_FONT)),
+                                             self.cell(field, value_width)] for label, field in pairs], title)
+        if kind == "section":
+            return [self.para(_markup(block[1]), "section"),
+                    HRFlowable(width="100%", thickness=0.75, color=self.border, spaceBefore=1, spaceAfter=8)]
+        if kind == "subsection":
+            return [self.para(_markup(block[1]), "subsection")]
+        if kind == "text":
+            return [self.para(_markup(block[1])), Spacer(0, 8)]
+        if kind == "bullets":
+            return [Paragraph(_markup(item), self.styles["bullet"], bulletText="\u2022") for item in block[1]] + \
+                [Spacer(0, 8)]
+        if kind == "inline":
+            return [self.para(f"<b>{_markup(label)}</b> {self.value(field, self.width)}") for label, field in block[1]]
+        if kind == "signature":
+            cells = [self.para(f"{_markup(label)}: {self.value(field, 150.0)}", "center") for label, field in block[1]]
+            widths = [150.0, self.width - 300.0, 150.0] if len(cells) == 2 else [self.width / len(cells)] * len(cells)
+            row = [cells[0], "", cells[1]] if len(cells) == 2 else cells
+            table = Table([row], colWidths=widths)
+            table.setStyle(TableStyle([("LINEABOVE", (0, 0), (0, 0), 0.75, self.border),
+                                       ("LINEABOVE", (-1, 0), (-1, 0), 0.75, self.border)]))
+            return [Spacer(0, 22), table]
+        raise ValueError(f"Unknown layout block {kind!r}")
+
+
+def _page_template_size():
+    from reportlab.lib import pagesizes
+
+    size = getattr(pagesizes, str(PDF_CONFIG['PAGE_SIZE']).upper(), pagesizes.A4)
+    if PDF_CONFIG['DEFAULT_ORIENTATION'] == 'landscape':
+        return pagesizes.landscape(size)
+    return pagesizes.portrait(size)
+
+
+def _numbered_canvas_class():
+    """Canvas that defers pages until the end, so footers can say 'Page N of M'."""
+    from reportlab.lib import colors
+    from reportlab.pdfgen import canvas
+
+    class NumberedCanvas(canvas.Canvas):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._pages = []
+
+        def showPage(self):
+            self._pages.append(dict(self.__dict__))
+            self._startPage()
+
+        def save(self):
+            total = len(self._pages)
+            for number, state in enumerate(self._pages, 1):
+                self.__dict__.update(state)
+                width, _ = self._pagesize
+                self.setFont("Helvetica", 7.5)
+                self.setFillColor(colors.HexColor("#666666"))
+                self.drawCentredString(width / 2.0, 15, f"Page {number} of {total}")
+                super().showPage()
+            super().save()
+
+    return NumberedCanvas
+
+
+def render(template_name: str, project_data: Optional[dict]) -> bytes:
+    """Build the PDF for one project from LAYOUTS[template_name]."""
+    from reportlab.platypus import PageBreak, SimpleDocTemplate
+
+    layout = LAYOUTS.get(template_name)
+    if layout is None:
+        raise ValueError(f"No native layout for template {template_name!r}")
+
+    data = {k: _text(v) for k, v in (project_data or {}).items()}
+    # Same defaults template_manager.get_template_content provides
+    data.setdefault('generated_date', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    data.setdefault('date', data['generated_date'])
+
+    margin = _length(PDF_CONFIG['MARGINS'])
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=_page_template_size(), leftMargin=margin, rightMargin=margin,
+                            topMargin=margin, bottomMargin=margin,
+                            title="Worksheet for Manufacturing (WSM)", author="WSM Management System")
+
+    logo_source = _logo_source(data.get('company_logo', ''))
+    logo = _load_logo(logo_source) if logo_source else None
+
+    def draw_logo(canv, _doc):
+        if logo is None:
+            return
+        logo_width, logo_height = logo.getSize()
+        height = min(margin * 0.8, 36.0)
+        width = height * logo_width / float(logo_height or 1)
+        page_height = _doc.pagesize[1]
+        canv.drawImage(logo, margin, page_height - margin + (margin - height) / 2.0 - 2, width, height,
+                       mask="auto")
+
+    builder = _Builder(data, doc.width)
+    story = []
+    for number, page in enumerate(layout):
+        if number:
+            story.append(PageBreak())
+        story += builder.header(page)
+        for block in page["blocks"]:
+            story += builder.block(block)
+
+    doc.build(story, onFirstPage=draw_logo, onLaterPages=draw_logo, canvasmaker=_numbered_canvas_class())
+    return buffer.getvalue()
@@ -0,0 +1,319 @@
+"""
+render_pool.py
+
+Persistent process pool for HTML -> PDF conversion.
+
+WeasyPrint and xhtml2pdf are CPU-bound pure-Python layout engines, so running
+them in the Streamlit script thread serializes every session behind the GIL.
+This module keeps warm worker processes that import the engines (and compile
+the Jinja2 environment) once at start-up; jobs then only pay for the actual
+rendering, and throughput scales with the number of cores.
+
+Every job gets PDF_CONFIG['RENDER_TIMEOUT'] seconds from the moment a worker
+starts it; time spent waiting in the queue does not count. A job over its limit
+fails with TimeoutError and only its worker is killed and replaced, so jobs
+running in the other workers are not affected. (concurrent.futures'
+ProcessPoolExecutor cannot stop a single job, which is why the pool is built on
+plain processes and pipes; a thread in the calling process dispatches jobs and
+watches the deadlines.)
+
+Provides:
+    - get_pool() -> RenderPool (created on first use)
+    - submit_pdf(template_name=None, project_data=None, html_string=None, with_engine=False, debug=None)
+      -> Future[bytes]
+    - submit_html(source_html) -> Future[Optional[bytes]]
+    - result(future, timeout=None) -> value; timeout only bounds this wait (TimeoutError, nothing is killed)
+    - shutdown()
+
+Futures are standard concurrent.futures.Future objects: poll them with
+future.done(), block with result(future), or await them from asyncio code
+via asyncio.wrap_future(future).
+
+Settings (PDF_CONFIG in config.py):
+    - RENDER_WORKERS       number of worker processes (0 disables the pool)
+    - RENDER_TIMEOUT       per-job time limit in seconds, counted from the start of the job
+    - RENDER_START_METHOD  multiprocessing start method ('spawn' is safe with Streamlit's threads)
+"""
+
+import atexit
+import collections
+import multiprocessing
+import threading
+import time
+import traceback
+import concurrent.futures
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import connection
+from typing import Optional, Any
+
+from config import PDF_CONFIG
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker() -> None:
+    """Worker initializer: import the engines and warm the template environment once."""
+    import pdf_engines
+    import template_manager
+    # Engines are lazy in the UI process; workers pay the import cost up front
+    pdf_engines.preload()
+    template_manager.get_template_registry().refresh(force=True)
+
+
+def _generate_pdf_job(template_name: Optional[str],
+                      project_data: Optional[dict],
+                      html_string: Optional[str],
+                      with_engine: bool = False,
+                      debug: Optional[bool] = None) -> Any:
+    import pdf_generator
+    generate = pdf_generator.generate_pdf_with_engine if with_engine else pdf_generator.generate_pdf
+    return generate(template_name=template_name,
+                    project_data=project_data,
+                    html_string=html_string,
+                    debug=debug)
+
+
+def _convert_html_job(source_html: str) -> Optional[bytes]:
+    import pdf_generator
+    return pdf_generator.convert_html_to_pdf(source_html)
+
+
+def _worker_main(conn) -> None:
+    """Worker process: warm up, then run (fn, args) jobs from the pipe until told to stop."""
+    try:
+        _init_worker()
+    except Exception as e:
+        print(f"[render_pool] Worker warm-up failed: {e}")
+    conn.send(("ready", None))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError, KeyboardInterrupt):
+            return
+        if message is None:
+            return
+        fn, args = message
+        try:
+            outcome = ("ok", fn(*args))
+        except Exception as e:
+            outcome = ("error", e)
+        try:
+            conn.send(outcome)
+        except Exception as e:
+            # The result or exception could not be pickled
+            conn.send(("error", RuntimeError(f"Render job result could not be returned: {e}")))
+
+
+class _Worker:
+    """One worker process, the parent's end of its pipe and the job it is running."""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        # Daemonic: the interpreter terminates it at exit instead of waiting for it
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), name="wsm-render-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.future = None
+        self.timeout = None
+        self.deadline = None
+
+    def kill(self) -> None:
+        try:
+            self.process.terminate()
+            self.process.join(5)
+        except Exception:
+            pass
+        self.conn.close()
+
+
+class RenderPool:
+    """
+    Fixed number of worker processes fed from one FIFO queue.
+    A dispatcher thread hands each job to an idle worker, collects results and
+    replaces workers that exceed a job's time limit or die.
+    """
+
+    def __init__(self, workers: int, ctx):
+        self._ctx = ctx
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self._closing = False
+        self._wait_running = True
+        self._wake_reader, self._wake_writer = ctx.Pipe(duplex=False)
+        self._workers = [_Worker(ctx) for _ in range(workers)]
+        self._thread = threading.Thread(target=self._manage, name="render-pool", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, timeout: Optional[float] = None) -> Future:
+        """Queue fn(*args); it may run for timeout seconds (default PDF_CONFIG['RENDER_TIMEOUT']) once started."""
+        future = Future()
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("The render pool has been shut down")
+            self._pending.append((future, fn, args, timeout or PDF_CONFIG['RENDER_TIMEOUT']))
+            self._wake_writer.send_bytes(b"")
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel queued jobs and stop the workers; wait=True lets running jobs finish first."""
+        with self._lock:
+            if self._closing:
+                return
+            self._closing, self._wait_running = True, wait
+            pending, self._pending = list(self._pending), collections.deque()
+            self._wake_writer.send_bytes(b"")
+        for future, _, _, _ in pending:
+            future.cancel()
+        if wait and threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def _take_job(self) -> Optional[tuple]:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return None
+                job = self._pending.popleft()
+            if job[0].set_running_or_notify_cancel():
+                return job
+
+    def _dispatch(self) -> None:
+        for worker in self._workers:
+            if not worker.ready or worker.future is not None:
+                continue
+            job = self._take_job()
+            if job is None:
+                return
+            future, fn, args, timeout = job
+            try:
+                worker.conn.send((fn, args))
+            except Exception as e:
+                # Unpicklable arguments (the worker is untouched) or a dead worker (noticed on the next poll)
+                future.set_exception(e)
+                continue
+            worker.future, worker.timeout = future, timeout
+            worker.deadline = time.monotonic() + timeout
+
+    def _replace(self, worker: _Worker, error: BaseException) -> None:
+        """Kill a worker, fail its job with error and start a fresh worker in its place."""
+        worker.kill()
+        if worker.future is not None:
+            worker.future.set_exception(error)
+            worker.future = None
+        index = self._workers.index(worker)
+        if self._closing:
+            del self._workers[index]
+            return
+        if not worker.ready:
+            time.sleep(1.0)  # died during start-up; don't spin if it keeps failing
+        self._workers[index] = _Worker(self._ctx)
+
+    def _collect(self, worker: _Worker) -> None:
+        try:
+            status, value = worker.conn.recv()
+        except (EOFError, OSError):
+            print("[render_pool] A render worker died; starting a new one.")
+            self._replace(worker, BrokenProcessPool("A render worker process died while running the job"))
+            return
+        if status == "ready":
+            worker.ready = True
+            return
+        future, worker.future, worker.deadline = worker.future, None, None
+        if future is None:
+            return
+        if status == "ok":
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    def _manage(self) -> None:
+        try:
+            while True:
+                if self._closing and (not self._wait_running or all(w.future is None for w in self._workers)):
+                    return
+                if not self._closing:
+                    self._dispatch()
+                deadlines = [w.deadline for w in self._workers if w.future is not None]
+                wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                by_conn = {w.conn: w for w in self._workers}
+                for ready in connection.wait([self._wake_reader] + list(by_conn), timeout=wait_for):
+                    if ready is self._wake_reader:
+                        while self._wake_reader.poll():
+                            self._wake_reader.recv_bytes()
+                    else:
+                        self._collect(by_conn[ready])
+                now = time.monotonic()
+                for worker in list(self._workers):
+                    if worker.future is not None and worker.deadline <= now:
+                        print(f"[render_pool] Render job exceeded {worker.timeout}s; replacing its worker.")
+                        self._replace(worker, TimeoutError(
+                            f"PDF rendering did not finish within {worker.timeout} seconds"))
+        except Exception as e:
+            print(f"[render_pool] Dispatcher failed: {e}")
+            print(traceback.format_exc())
+        finally:
+            for worker in list(self._workers):
+                if worker.future is not None:
+                    worker.future.set_exception(BrokenProcessPool("The render pool was shut down"))
+                    worker.future = None
+                worker.kill()
+
+
+def get_pool() -> RenderPool:
+    """Return the shared pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = PDF_CONFIG['RENDER_WORKERS']
+                if workers <= 0:
+                    raise RuntimeError("The render pool is disabled (PDF_CONFIG['RENDER_WORKERS'] is 0)")
+                ctx = multiprocessing.get_context(PDF_CONFIG['RENDER_START_METHOD'])
+                _pool = RenderPool(workers, ctx)
+                print(f"[render_pool] Started {workers} render worker(s).")
+    return _pool
+
+
+def submit_pdf(template_name: Optional[str] = None,
+               project_data: Optional[dict] = None,
+               html_string: Optional[str] = None,
+               with_engine: bool = False,
+               debug: Optional[bool] = None) -> Future:
+    """Run pdf_generator.generate_pdf(...) (generate_pdf_with_engine with with_engine=True) in a worker process."""
+    return get_pool().submit(_generate_pdf_job, template_name, project_data, html_string, with_engine, debug)
+
+
+def submit_html(source_html: str) -> Future:
+    """Run pdf_generator.convert_html_to_pdf(source_html) in a worker process."""
+    return get_pool().submit(_convert_html_job, source_html)
+
+
+def result(future: Future, timeout: Optional[float] = None) -> Any:
+    """
+    Wait for a job and return its result (or raise its exception).
+    The pool itself fails a job that runs longer than PDF_CONFIG['RENDER_TIMEOUT']
+    with TimeoutError, so by default this waits for that. timeout additionally
+    bounds this wait, queue time included: on expiry a still-queued job is
+    cancelled and TimeoutError is raised, but no worker is killed.
+    """
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        if future.done():
+            raise  # the job itself timed out in its worker
+        future.cancel()
+        raise TimeoutError(f"PDF rendering did not finish within {timeout} seconds")
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop the pool (it is restarted on the next submit)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+atexit.register(shutdown, False)
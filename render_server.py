@@ -0,0 +1,359 @@
+"""
+render_server.py
+
+Headless HTTP front end for pdf_generator, for systems (ERP, CRM, ...) that
+need WSM PDFs without going through the Streamlit UI. Standard library only.
+
+Endpoints:
+    - POST /render                 JSON {"template": name, "data": {...}} or {"html": "..."} -> PDF
+    - GET  /projects/{no}/pdf      PDF for a stored project (optional ?template=name)
+                                   (422 if the project's wsm_type is not a known template)
+    - GET  /health                 JSON with engine, capacity, current load and engine statistics
+    - GET  /metrics                Prometheus text format (see pdf_metrics.py)
+
+Either render accepts a debug flag ("debug": true / ?debug=1) that captures the
+request's debug artifacts (see debug_capture.py).
+
+Rendering goes through pdf_generator.generate_pdf_async, i.e. the shared PDF
+cache and the render_pool worker processes. At most RENDER_WORKERS renders run
+at once (one when the pool is disabled); up to SERVER_MAX_QUEUE more requests
+wait for a slot, and anything beyond that is refused with 429 + Retry-After
+instead of piling up threads.
+
+Responses carry a weak ETag derived from the PDF cache key (engine, template
+contents and project data) of the engine that actually produced the PDF. The
+candidate ETags are known before rendering, so a request with a matching
+If-None-Match gets 304 without any rendering work, and HEAD is answered from
+the PDF cache (or the predicted ETag) without converting anything.
+
+Run:
+
+    python -m render_server                     # SERVER_HOST:SERVER_PORT from config.py
+    python -m render_server --host 0.0.0.0 --port 8600
+
+The server has no authentication; keep it on localhost or behind a proxy.
+"""
+
+import argparse
+import json
+import re
+import threading
+import traceback
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Any
+from urllib.parse import urlsplit, parse_qs
+
+import database
+import engine_stats
+import pdf_cache
+import pdf_generator
+import pdf_metrics
+import render_pool
+import template_manager
+from config import PDF_CONFIG
+
+_PROJECT_PDF_PATH = re.compile(r"^/projects/([^/]+)/pdf$")
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9._-]")
+
+
+class RenderLimiter:
+    """Admission control: `capacity` renders at a time, `max_queue` waiting, the rest refused."""
+
+    def __init__(self, capacity: int, max_queue: int):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self._admitted = threading.BoundedSemaphore(capacity + max_queue)
+        self._slots = threading.BoundedSemaphore(capacity)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+
+    def try_admit(self) -> bool:
+        """Reserve a place in the queue; False means the caller should answer 429."""
+        if not self._admitted.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.waiting += 1
+        return True
+
+    def run(self, fn, *args, **kwargs):
+        """Wait for a render slot, call fn, then release both the slot and the admission."""
+        try:
+            with self._slots:
+                with self._lock:
+                    self.waiting -= 1
+                    self.running += 1
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    with self._lock:
+                        self.running -= 1
+        finally:
+            self._admitted.release()
+
+    def load(self) -> tuple:
+        """Return (running, waiting)."""
+        with self._lock:
+            return self.running, self.waiting
+
+
+_limiter = RenderLimiter(max(PDF_CONFIG['RENDER_WORKERS'], 1), PDF_CONFIG['SERVER_MAX_QUEUE'])
+
+
+def _render(template_name: Optional[str], project_data: Optional[dict], html_string: Optional[str],
+            debug: Optional[bool]) -> tuple:
+    """Return (pdf_bytes, engine) for the request."""
+    if PDF_CONFIG['RENDER_WORKERS'] > 0:
+        future = pdf_generator.generate_pdf_async(template_name=template_name,
+                                                  project_data=project_data,
+                                                  html_string=html_string,
+                                                  with_engine=True,
+                                                  debug=debug)
+        return render_pool.result(future)
+    return pdf_generator.generate_pdf_with_engine(template_name=template_name,
+                                                  project_data=project_data,
+                                                  html_string=html_string,
+                                                  debug=debug)
+
+
+def _etag(engine: str, template_name: Optional[str], project_data: Optional[dict],
+          html_string: Optional[str]) -> str:
+    return 'W/"%s"' % pdf_cache.key_for(pdf_generator.cache_key_engine(engine, template_name),
+                                        template_name, project_data, html_string)
+
+
+def _pdf_filename(name: Any) -> str:
+    """Download name for a project number; anything outside [A-Za-z0-9._-] is replaced (header safety)."""
+    return "WSM_%s.pdf" % (_UNSAFE_FILENAME.sub("_", str(name or "document")) or "document")
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    server_version = "WSMRender/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # ---- helpers -----------------------------------------------------
+
+    def log_message(self, format, *args) -> None:
+        print(f"[render_server] {self.address_string()} - {format % args}")
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_error_json(self, status: int, message: str, headers: Optional[dict] = None) -> None:
+        self._send_json(status, {"error": message}, headers)
+
+    def _etag_matches(self, etag: str) -> bool:
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        candidates = [tag.strip() for tag in header.split(",")]
+        # Weak comparison (RFC 9110 13.1.2): W/"x" matches "x"
+        bare = etag[2:] if etag.startswith("W/") else etag
+        return "*" in candidates or any(
+            (tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates)
+
+    def _send_pdf_headers(self, length: Optional[int], filename: str, etag: str) -> None:
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/pdf")
+        if length is not None:
+            self.send_header("Content-Length", str(length))
+        self.send_header("Content-Disposition", f'inline; filename="{filename}"')
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _serve_pdf(self, template_name: Optional[str], project_data: Optional[dict],
+                   html_string: Optional[str], filename: str, debug: Optional[bool] = None) -> None:
+        # Everything that can fail before rendering happens before admission: an admission
+        # is only given back by _limiter.run(), so nothing may raise between the two
+        try:
+            etags = [_etag(engine, template_name, project_data, html_string)
+                     for engine in pdf_generator.cache_engine_names(template_name, html_string)]
+        except ValueError as e:
+            self._send_error_json(HTTPStatus.UNPROCESSABLE_ENTITY, str(e))
+            return
+        # A debug request always renders
+        matched = None if debug else next((etag for etag in etags if self._etag_matches(etag)), None)
+        if matched:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", matched)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.command == "HEAD":
+            # Metadata only: a cached PDF gives the exact answer, otherwise the
+            # ETag the preferred engine would produce and no length
+            hit = pdf_generator.cached_pdf(template_name, project_data, html_string)
+            if hit:
+                self._send_pdf_headers(len(hit[0]), filename,
+                                       _etag(hit[1], template_name, project_data, html_string))
+            else:
+                self._send_pdf_headers(None, filename, etags[0])
+            return
+
+        if not _limiter.try_admit():
+            self._send_error_json(HTTPStatus.TOO_MANY_REQUESTS, "Render queue is full, retry later",
+                                  {"Retry-After": "5"})
+            return
+        try:
+            pdf_bytes, engine = _limiter.run(_render, template_name, project_data, html_string, debug)
+        except TimeoutError as e:
+            self._send_error_json(HTTPStatus.GATEWAY_TIMEOUT, str(e))
+            return
+        except Exception as e:
+            print(f"[render_server] Render failed: {e}")
+            print(traceback.format_exc())
+            self._send_error_json(HTTPStatus.INTERNAL_SERVER_ERROR, f"Render failed: {e}")
+            return
+        if not pdf_bytes:
+            self._send_error_json(HTTPStatus.INTERNAL_SERVER_ERROR, "Render produced no output")
+            return
+
+        self._send_pdf_headers(len(pdf_bytes), filename, _etag(engine, template_name, project_data, html_string))
+        self.wfile.write(pdf_bytes)
+
+    # ---- routes ------------------------------------------------------
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            running, waiting = _limiter.load()
+            self._send_json(HTTPStatus.OK, {
+                "status": "ok",
+                "engine": pdf_generator.ENGINE_NAME,
+                "capacity": _limiter.capacity,
+                "max_queue": _limiter.max_queue,
+                "running": running,
+                "waiting": waiting,
+                "engines": engine_stats.snapshot(),
+            })
+            return
+
+        if url.path == "/metrics":
+            body = pdf_metrics.exposition().encode("utf-8")
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+            return
+
+        match = _PROJECT_PDF_PATH.match(url.path)
+        if match:
+            project_no = match.group(1)
+            query = parse_qs(url.query)
+            template_name = query.get("template", [None])[0]
+            debug = query.get("debug", ["0"])[0] == "1" or None
+            if template_name and not template_manager.validate_template_exists(template_name):
+                self._send_error_json(HTTPStatus.NOT_FOUND, f"Unknown template: {template_name}")
+                return
+            try:
+                template_name, project_data = pdf_generator.load_project_for_render(project_no, template_name)
+            except RuntimeError as e:
+                self._send_error_json(HTTPStatus.NOT_FOUND, str(e))
+                return
+            if not template_manager.validate_template_exists(template_name):
+                self._send_error_json(HTTPStatus.UNPROCESSABLE_ENTITY,
+                                      f"Project {project_no} uses unknown template: {template_name}")
+                return
+            self._serve_pdf(template_name, project_data, None, _pdf_filename(project_no), debug)
+            return
+
+        self._send_error_json(HTTPStatus.NOT_FOUND, "Not found")
+
+    do_HEAD = do_GET
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != "/render":
+            self._send_error_json(HTTPStatus.NOT_FOUND, "Not found")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._send_error_json(HTTPStatus.LENGTH_REQUIRED, "Content-Length is required")
+            return
+        if length < 0:
+            self.close_connection = True
+            self._send_error_json(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+            return
+        if length > PDF_CONFIG['SERVER_MAX_BODY_BYTES']:
+            self.close_connection = True
+            self._send_error_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_error_json(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+            return
+        if not isinstance(payload, dict):
+            self._send_error_json(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+            return
+
+        html_string = payload.get("html")
+        template_name = payload.get("template")
+        project_data = payload.get("data") or {}
+        if html_string is not None and not isinstance(html_string, str):
+            self._send_error_json(HTTPStatus.BAD_REQUEST, "'html' must be a string")
+            return
+        if template_name is not None and not isinstance(template_name, str):
+            self._send_error_json(HTTPStatus.BAD_REQUEST, "'template' must be a string")
+            return
+        if not isinstance(project_data, dict):
+            self._send_error_json(HTTPStatus.BAD_REQUEST, "'data' must be an object")
+            return
+        if not html_string:
+            if not template_name:
+                self._send_error_json(HTTPStatus.BAD_REQUEST, "Either 'template' or 'html' is required")
+                return
+            if not template_manager.validate_template_exists(template_name):
+                self._send_error_json(HTTPStatus.NOT_FOUND, f"Unknown template: {template_name}")
+                return
+
+        filename = _pdf_filename(project_data.get('project_no'))
+        debug = True if payload.get("debug") else None
+        self._serve_pdf(None if html_string else template_name, project_data, html_string or None, filename, debug)
+
+
+def make_server(host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), RenderRequestHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve WSM PDFs over HTTP")
+    parser.add_argument("--host", default=PDF_CONFIG['SERVER_HOST'],
+                        help=f"interface to bind (default: {PDF_CONFIG['SERVER_HOST']})")
+    parser.add_argument("--port", type=int, default=PDF_CONFIG['SERVER_PORT'],
+                        help=f"port to listen on (default: {PDF_CONFIG['SERVER_PORT']})")
+    args = parser.parse_args(argv)
+
+    database.init_db()
+    server = make_server(args.host, args.port)
+    print(f"[render_server] Listening on http://{args.host}:{server.server_port} "
+          f"({_limiter.capacity} render slot(s), queue of {_limiter.max_queue}, engine {pdf_generator.ENGINE_NAME})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        render_pool.shutdown(wait=False)
+        database.close_connections()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+"""
+render_worker.py
+
+Standalone PDF render worker backed by the render_jobs table in wsm_projects.db.
+
+The Streamlit app only enqueues jobs (database.enqueue_render_job) and polls
+them (database.get_render_job) when PDF_CONFIG['RENDER_BACKEND'] is 'queue'.
+Workers claim queued jobs with an atomic UPDATE, render them through the
+generate_pdf of the job's generator module (pdf_generator unless the job names
+one of GENERATORS, e.g. change_app's pdf_generator_xhtml2pdf) and record the
+output path. Jobs survive restarts:
+anything left 'running' for longer than the lease is put back in the queue,
+or marked failed once it has used PDF_CONFIG['RENDER_MAX_ATTEMPTS'] attempts.
+
+Each render runs in a child process (a one-worker render_pool.RenderPool) that
+is killed after PDF_CONFIG['RENDER_TIMEOUT'], so a hung render fails its
+attempt instead of outliving the lease (twice the render timeout) and being
+picked up by a second worker while the first is still on it.
+
+Run any number of workers next to the UI:
+
+    python -m render_worker                 # loop forever
+    python -m render_worker --once          # drain the queue and exit
+    python -m render_worker --poll-interval 0.5
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
+import traceback
+import uuid
+from typing import Optional
+
+import database
+import render_pool
+from config import PDF_CONFIG
+
+# Modules a job may name as its generator; each provides generate_pdf(template_name, project_data)
+GENERATORS = ('pdf_generator', 'pdf_generator_xhtml2pdf')
+
+_stop = False
+
+
+def _request_stop(signum, frame) -> None:
+    global _stop
+    _stop = True
+    print(f"[render_worker] Received signal {signum}; stopping after the current job.")
+
+
+def _write_result(project_no: str, job_id: int, pdf_bytes: bytes) -> str:
+    out_dir = PDF_CONFIG['RENDER_OUTPUT_DIR']
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{project_no}-{job_id}.pdf")
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(pdf_bytes)
+    os.replace(tmp_path, path)
+    return path
+
+
+def run_job(job: dict, pool: Optional[render_pool.RenderPool] = None) -> str:
+    """
+    Render one claimed job and return the path of the written PDF.
+    With a pool the render runs there under PDF_CONFIG['RENDER_TIMEOUT'] (TimeoutError on expiry);
+    without one it runs in this process with no time limit.
+    """
+    import pdf_generator
+
+    generator_name = job['generator'] or 'pdf_generator'
+    if generator_name not in GENERATORS:
+        raise ValueError(f"Unknown PDF generator '{generator_name}'")
+    generate_pdf = importlib.import_module(generator_name).generate_pdf
+    template_name, project_data = pdf_generator.load_project_for_render(job['project_no'], job['template_name'])
+    if pool is None:
+        pdf_bytes = generate_pdf(template_name, project_data)
+    else:
+        pdf_bytes = pool.submit(generate_pdf, template_name, project_data).result()
+    return _write_result(job['project_no'], job['id'], pdf_bytes)
+
+
+def work(worker_id: str, poll_interval: float = 1.0, once: bool = False) -> int:
+    """Process jobs until stopped (or until the queue is empty with once=True). Returns jobs handled."""
+    # The pool kills a render at the render timeout, so a live worker always finishes within the lease
+    lease = PDF_CONFIG['RENDER_TIMEOUT'] * 2
+    max_attempts = PDF_CONFIG['RENDER_MAX_ATTEMPTS']
+    pool = render_pool.RenderPool(1, multiprocessing.get_context(PDF_CONFIG['RENDER_START_METHOD']))
+    try:
+        return _work(worker_id, pool, lease, max_attempts, poll_interval, once)
+    finally:
+        pool.shutdown(wait=False)
+
+
+def _work(worker_id: str, pool: render_pool.RenderPool, lease: float, max_attempts: int,
+          poll_interval: float, once: bool) -> int:
+    handled = 0
+    next_stale_check = 0.0
+
+    while not _stop:
+        now = time.monotonic()
+        if now >= next_stale_check:
+            requeued = database.requeue_stale_render_jobs(lease, max_attempts)
+            if requeued:
+                print(f"[render_worker] Requeued {requeued} stale job(s).")
+            next_stale_check = now + lease
+
+        job = database.claim_render_job(worker_id)
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        started = time.perf_counter()
+        try:
+            path = run_job(job, pool)
+            database.complete_render_job(job['id'], path)
+            print(f"[render_worker] Job {job['id']} ({job['project_no']}) done in "
+                  f"{time.perf_counter() - started:.2f}s -> {path}")
+        except Exception as e:
+            print(f"[render_worker] Job {job['id']} ({job['project_no']}) failed: {e}")
+            print(traceback.format_exc())
+            database.fail_render_job(job['id'], e, max_attempts)
+        handled += 1
+
+    return handled
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Render queued WSM PDFs from wsm_projects.db")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="seconds to sleep when the queue is empty (default: 1.0)")
+    parser.add_argument("--once", action="store_true",
+                        help="exit when the queue is empty instead of polling")
+    args = parser.parse_args(argv)
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    database.init_db()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    print(f"[render_worker] Worker {worker_id} started.")
+    try:
+        handled = work(worker_id, poll_interval=args.poll_interval, once=args.once)
+    finally:
+        database.close_connections()
+    print(f"[render_worker] Worker {worker_id} exiting after {handled} job(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,20 +1,140 @@
 # templates/template_manager.py
-from jinja2 import Template
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, meta
 from datetime import datetime, date
+import hashlib
 import os
+import threading
+import time
 
-def get_available_templates():
-    """Get list of available templates from the templates folder"""
-    templates = {}
-    templates_dir = os.path.dirname(os.path.abspath(__file__))
+from config import TEMPLATE_CONFIG
+import pdf_metrics
+
+TEMPLATES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_environment = None
+_environment_lock = threading.Lock()
+
+def get_environment():
+    """Return the shared Jinja2 environment.
+
+    Compiled templates are kept in memory and in an on-disk bytecode cache;
+    auto_reload recompiles a template when its file's mtime changes.
+    """
+    global _environment
+    if _environment is None:
+        with _environment_lock:
+            if _environment is None:
+                bytecode_cache = None
+                try:
+                    os.makedirs(TEMPLATE_CONFIG['BYTECODE_CACHE_DIR'], exist_ok=True)
+                    bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CONFIG['BYTECODE_CACHE_DIR'])
+                except OSError:
+                    pass  # Fall back to the in-memory cache only
+                _environment = Environment(
+                    loader=FileSystemLoader(TEMPLATES_DIR),
+                    bytecode_cache=bytecode_cache,
+                    auto_reload=True,
+                    cache_size=TEMPLATE_CONFIG['CACHE_SIZE'],
+                )
+    return _environment
+
+class TemplateEntry:
+    """One template in the registry: file location, content hash and compiled template"""
+
+    def __init__(self, key, display_name, path, mtime_ns, content_hash):
+        self.key = key
+        self.display_name = display_name
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.content_hash = content_hash
+        self._template = None
+        self._fields = None
+
+    @property
+    def template(self):
+        """Compiled Jinja2 template, loaded on first use"""
+        if self._template is None:
+            self._template = get_environment().get_template(os.path.basename(self.path))
+        return self._template
+
+    @property
+    def fields(self):
+        """Names of the variables the template reads from its context (from the Jinja2 AST)"""
+        if self._fields is None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                ast = get_environment().parse(f.read())
+            self._fields = frozenset(meta.find_undeclared_variables(ast))
+        return self._fields
+
+class TemplateRegistry:
+    """In-process index of the templates directory.
+
+    Built once and re-checked with a stat pass at most every
+    TEMPLATE_CONFIG['REGISTRY_CHECK_INTERVAL'] seconds, so lookups in between
+    are plain dict hits with no filesystem access. Entries whose file mtime
+    is unchanged are kept, together with their compiled template.
+    """
+
+    def __init__(self, templates_dir, check_interval):
+        self.templates_dir = templates_dir
+        self.check_interval = check_interval
+        self._entries = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
 
-    # Look for all HTML files in the templates directory
-    for file in os.listdir(templates_dir):
-        if file.endswith('.html') and not file.startswith('_'):
+    def _scan(self):
+        entries = {}
+        for file in sorted(os.listdir(self.templates_dir)):
+            if not file.endswith('.html') or file.startswith('_'):
+                continue
+            path = os.path.join(self.templates_dir, file)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
             template_key = file.replace('.html', '').upper()
+            existing = self._entries.get(template_key)
+            if existing is not None and existing.path == path and existing.mtime_ns == mtime_ns:
+                entries[template_key] = existing
+                continue
+            with open(path, 'rb') as f:
+                content_hash = hashlib.sha256(f.read()).hexdigest()
             template_name = file.replace('.html', '').replace('_', ' ').title()
-            templates[template_key] = template_name
-    return templates
+            entries[template_key] = TemplateEntry(template_key, template_name, path, mtime_ns, content_hash)
+        self._entries = entries
+
+    def refresh(self, force=False):
+        """Re-stat the templates directory if the check interval has elapsed (or force=True)"""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if force or self._checked_at is None or now - self._checked_at >= self.check_interval:
+                self._scan()
+                self._checked_at = now
+
+    def entries(self):
+        """Return the current {key: TemplateEntry} mapping"""
+        self.refresh()
+        return self._entries
+
+    def get(self, template_name):
+        """Look up a template by key or filename (with or without .html); None if unknown"""
+        entries = self.entries()
+        entry = entries.get(template_name)
+        if entry is None:
+            entry = entries.get(template_name.replace('.html', '').upper())
+        return entry
+
+_registry = TemplateRegistry(TEMPLATES_DIR, TEMPLATE_CONFIG['REGISTRY_CHECK_INTERVAL'])
+
+def get_template_registry():
+    """Return the process-wide template registry"""
+    return _registry
+
+def get_available_templates():
+    """Get list of available templates from the templates folder"""
+    return {key: entry.display_name for key, entry in _registry.entries().items()}
 
 def _format_value(v):
     """Return a string representation for template rendering"""
@@ -26,59 +146,48 @@ def _format_value(v):
         return v.isoformat()
     return str(v)
 
+def _get_entry(template_name):
+    entry = _registry.get(template_name)
+    if entry is None:
+        raise ValueError(f"Template '{template_name}' does not exist. Available templates: {', '.join(_registry.entries().keys())}")
+    return entry
+
+def get_template_path(template_name):
+    """Resolve a template name (key or filename) to the path of its HTML file"""
+    return _get_entry(template_name).path
+
+def get_template_hash(template_name):
+    """Return a SHA-256 digest of the template file contents"""
+    return _get_entry(template_name).content_hash
+
+def get_template_fields(template_name):
+    """Return the set of top-level variables a template references, e.g. to project a SELECT"""
+    return _get_entry(template_name).fields
+
 def get_template_content(template_name, project_data):
     """Get template content by name and populate with project data"""
     # Ensure project_data is a dict copy so we don't mutate caller's object
-    pdata = {k: _format_value(v) for k, v in (project_data or {}).items()}
+    with pdf_metrics.span("format_values", template=template_name):
+        pdata = {k: _format_value(v) for k, v in (project_data or {}).items()}
 
     # Add generated date and alias 'date'
     pdata.setdefault('generated_date', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     pdata.setdefault('date', pdata['generated_date'])
 
-    # Validate template exists
-    available_templates = get_available_templates()
-    if template_name not in available_templates:
-        # allow direct filename (without extension)
-        # if template_name contains .html, strip it
-        tn = template_name.replace('.html','').upper()
-        if tn in available_templates:
-            template_name = tn
-        else:
-            raise ValueError(f"Template '{template_name}' does not exist. Available templates: {', '.join(available_templates.keys())}")
-
-    templates_dir = os.path.dirname(os.path.abspath(__file__))
-    # If a file with the given name exists in the folder, use it
-    possible_file = os.path.join(templates_dir, f"{template_name}.html")
-    if os.path.exists(possible_file):
-        template_file = possible_file
-    else:
-        # try to find any file matching case-insensitively
-        found = None
-        for file in os.listdir(templates_dir):
-            if file.lower().startswith(template_name.lower()):
-                found = os.path.join(templates_dir, file)
-                break
-        if found:
-            template_file = found
-        else:
-            raise FileNotFoundError(f"Template file '{template_name}.html' not found in templates directory")
-
-    with open(template_file, 'r', encoding='utf-8') as f:
-        html_template = f.read()
-
-    # Render using Jinja2
+    entry = _get_entry(template_name)
+
+    # Render the registry's compiled template (compiled once, reloaded on change)
     try:
-        template = Template(html_template)
-        return template.render(**pdata)
+        with pdf_metrics.span("template_render", template=template_name):
+            return entry.template.render(**pdata)
     except Exception as e:
         raise ValueError(f"Error rendering template '{template_name}': {str(e)}")
 
 def validate_template_exists(template_name):
     """Validate if a template exists"""
-    available_templates = get_available_templates()
-    return template_name in available_templates
+    return template_name in _registry.entries()
 
 def get_template_display_name(template_key):
     """Get the display name for a template key"""
-    available_templates = get_available_templates()
-    return available_templates.get(template_key, template_key)
+    entry = _registry.entries().get(template_key)
+    return entry.display_name if entry is not None else template_key
@@ -0,0 +1,61 @@
+"""
+Shared fixtures for the test suite.
+
+The database and every artifact directory (PDF cache, metrics dumps, debug
+captures, rendered jobs, Jinja bytecode) are pointed at a scratch directory
+before any project
+module is imported, so running the tests never touches the working tree.
+
+Run from the repository root (pytest and pypdf are test-only dependencies):
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_SCRATCH = tempfile.mkdtemp(prefix="wsm-tests-")
+os.environ.setdefault("WSM_DB_PATH", os.path.join(_SCRATCH, "wsm_projects.db"))
+os.environ.setdefault("WSM_PDF_CACHE_DIR", os.path.join(_SCRATCH, "pdf_cache"))
+os.environ.setdefault("WSM_JINJA_CACHE_DIR", os.path.join(_SCRATCH, "jinja_cache"))
+os.environ.setdefault("WSM_PDF_METRICS_DIR", os.path.join(_SCRATCH, "pdf_metrics"))
+os.environ.setdefault("WSM_PDF_DEBUG_DIR", os.path.join(_SCRATCH, "pdf_debug"))
+os.environ.setdefault("WSM_RENDER_OUTPUT_DIR", os.path.join(_SCRATCH, "rendered_pdfs"))
+# Render in-process: no worker processes to spawn per test
+os.environ.setdefault("WSM_RENDER_WORKERS", "0")
+
+import pytest  # noqa: E402
+
+import database  # noqa: E402
+from config import DB_CONFIG  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A freshly migrated database of its own; yields the database module."""
+    # Pooled connections point at the previous test's file
+    database.close_connections()
+    monkeypatch.setitem(DB_CONFIG, 'DATABASE_NAME', str(tmp_path / "wsm_projects.db"))
+    monkeypatch.setattr(database, '_db_initialized', False)
+    monkeypatch.setattr(database, '_project_columns', None)
+    database.init_db()
+    yield database
+    database.close_connections()
+
+
+def add_project(project_no, status='Submitted', **fields):
+    """Insert a minimal project row and return its id."""
+    columns = ['project_no', 'status', 'created_by'] + list(fields)
+    values = [project_no, status, 'admin'] + list(fields.values())
+    conn = database.get_db_connection()
+    try:
+        cur = conn.execute(f"INSERT INTO projects ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                           values)
+        conn.commit()
+        return cur.lastrowid
+    finally:
+        conn.close()
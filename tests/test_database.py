@@ -0,0 +1,247 @@
+"""Connections, schema migrations, status counters, full-text search and the render job queue (database.py)."""
+
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import DB_CONFIG
+from conftest import add_project
+
+
+def _schema(db):
+    conn = db.get_read_connection()
+    try:
+        return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"))
+    finally:
+        conn.close()
+
+
+# ---- connections -----------------------------------------------------
+
+def test_closed_connection_is_reused(db):
+    conn = db.get_db_connection()
+    conn.close()
+    assert db.get_db_connection() is conn
+    reader = db.get_read_connection()
+    assert reader is not conn
+
+
+def test_close_discards_uncommitted_work(db):
+    conn = db.get_db_connection()
+    conn.row_factory = sqlite3.Row
+    conn.execute("INSERT INTO users (username, password) VALUES ('temp', 'x')")
+    conn.close()
+
+    conn = db.get_db_connection()
+    try:
+        assert conn.row_factory is None
+        assert conn.execute("SELECT COUNT(*) FROM users WHERE username = 'temp'").fetchone() == (0,)
+    finally:
+        conn.close()
+
+
+def test_idle_connections_are_bounded(db, monkeypatch):
+    monkeypatch.setitem(DB_CONFIG, 'POOL_SIZE', 2)
+    conns = [db.get_db_connection() for _ in range(4)]
+    for conn in conns:
+        conn.close()
+    assert len(db._pool(readonly=False)._idle) == 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        conns[-1].execute('SELECT 1')  # over the limit: really closed
+
+
+def test_connection_can_be_reused_by_another_thread(db):
+    # Streamlit runs every rerun on a new thread
+    conn = db.get_read_connection()
+    conn.close()
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(db.get_read_connection()))
+    thread.start()
+    thread.join()
+    assert seen == [conn]
+    assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] >= 1
+    conn.close()
+
+
+def test_read_only_connection_quotes_the_path(db, tmp_path, monkeypatch):
+    db.close_connections()
+    monkeypatch.setitem(DB_CONFIG, 'DATABASE_NAME', str(tmp_path / "odd?name#50%.db"))
+    monkeypatch.setattr(db, '_db_initialized', False)
+    db.init_db()
+    conn = db.get_read_connection()
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] >= 1
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO users (username, password) VALUES ('x', 'y')")
+    finally:
+        conn.close()
+    assert (tmp_path / "odd?name#50%.db").exists()
+
+
+# ---- migrations ------------------------------------------------------
+
+def test_migrations_reach_latest_version(db):
+    conn = db.get_read_connection()
+    try:
+        assert db.get_schema_version(conn.cursor()) == max(version for version, _, _ in db.MIGRATIONS)
+    finally:
+        conn.close()
+
+
+def test_migrations_are_idempotent(db):
+    add_project('P-1', client='Acme')
+    schema = _schema(db)
+
+    assert db.run_migrations() == []
+    assert _schema(db) == schema
+    conn = db.get_read_connection()
+    try:
+        versions = [row[0] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+    finally:
+        conn.close()
+    assert versions == sorted(set(versions))
+    assert db.get_project_by_number('P-1') is not None
+
+
+# ---- status counters -------------------------------------------------
+
+def test_status_counts_follow_inserts_and_updates(db):
+    add_project('P-1')
+    add_project('P-2')
+    db.update_project_status('P-2', 'Approved')
+    assert db.get_status_summary() == {'Submitted': 1, 'Approved': 1}
+
+
+# ---- full-text search ------------------------------------------------
+
+@pytest.fixture
+def searchable(db):
+    add_project('P-1', client='O\'Brien & Sons (UK) "Ltd"', site='North-East yard')
+    add_project('P-2', client='Acme', site='Harbour 50% complete')
+    return db
+
+
+@pytest.mark.parametrize("query", [
+    "O'Brien",
+    'Sons (UK)',
+    '"Ltd"',
+    '(UK',
+    '^Sons',
+    'North-East',
+    'brie',
+])
+def test_search_handles_special_characters(searchable, query):
+    projects, _ = searchable.search_projects(query)
+    assert list(projects['project_no']) == ['P-1']
+    assert searchable.get_project_numbers(search=query) == ['P-1']
+
+
+@pytest.mark.parametrize("query", ['NEAR(', '-', '*', '"', 'AND OR NOT', 'client:Sons', '50%', ''])
+def test_search_never_passes_syntax_through(searchable, query):
+    # FTS5 operators and column filters are matched as text, never raise
+    projects, next_offset = searchable.search_projects(query)
+    assert next_offset is None
+    assert set(projects['project_no']) <= {'P-1', 'P-2'}
+
+
+def test_search_sees_updates(searchable):
+    conn = searchable.get_db_connection()
+    try:
+        conn.execute("UPDATE projects SET client = 'Zephyr' WHERE project_no = 'P-2'")
+        conn.commit()
+    finally:
+        conn.close()
+    assert searchable.get_project_numbers(search='zeph') == ['P-2']
+    assert searchable.get_project_numbers(search='acme') == []
+
+
+def test_search_pages(db):
+    for i in range(5):
+        add_project(f'P-{i}', client='Acme')
+    first, next_offset = db.search_projects('acme', page_size=3)
+    second, last = db.search_projects('acme', page_size=3, offset=next_offset)
+    assert (len(first), next_offset, len(second), last) == (3, 3, 2, None)
+    assert set(first['project_no']).isdisjoint(second['project_no'])
+
+
+# ---- render job queue ------------------------------------------------
+
+def _age_job(db, job_id, seconds):
+    conn = db.get_db_connection()
+    try:
+        started = (datetime.now() - timedelta(seconds=seconds)).isoformat()
+        conn.execute('UPDATE render_jobs SET started_at = ? WHERE id = ?', (started, job_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_enqueue_reuses_a_pending_job(db):
+    job_id = db.enqueue_render_job('P-1')
+    assert db.enqueue_render_job('P-1') == job_id
+    assert db.enqueue_render_job('P-2') != job_id
+
+
+def test_pending_jobs_are_shared_per_generator(db):
+    job_id = db.enqueue_render_job('P-1')
+    assert db.enqueue_render_job('P-1', generator='pdf_generator_xhtml2pdf') != job_id
+    assert db.enqueue_render_job('P-1') == job_id
+
+
+def test_concurrent_enqueues_share_one_job(db):
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.append(db.enqueue_render_job('P-1'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 1
+
+
+def test_claim_complete(db):
+    job_id = db.enqueue_render_job('P-1', 'STD_WSM')
+    job = db.claim_render_job('w1')
+    assert (job['id'], job['status'], job['attempts'], job['worker_id']) == (job_id, 'running', 1, 'w1')
+    assert db.claim_render_job('w2') is None
+
+    db.complete_render_job(job_id, '/tmp/P-1.pdf')
+    job = db.get_render_job(job_id)
+    assert (job['status'], job['result_path']) == ('done', '/tmp/P-1.pdf')
+    # A finished job no longer blocks a new one
+    assert db.enqueue_render_job('P-1') != job_id
+
+
+def test_failed_attempts_requeue_until_exhausted(db):
+    job_id = db.enqueue_render_job('P-1')
+    for attempt in range(1, 4):
+        assert db.claim_render_job('w1')['attempts'] == attempt
+        db.fail_render_job(job_id, RuntimeError('boom'), max_attempts=3)
+    job = db.get_render_job(job_id)
+    assert (job['status'], job['error']) == ('failed', 'boom')
+    assert db.claim_render_job('w1') is None
+
+
+def test_expired_lease_is_requeued(db):
+    job_id = db.enqueue_render_job('P-1')
+    db.claim_render_job('w1')
+    assert db.requeue_stale_render_jobs(60, max_attempts=3) == 0
+
+    _age_job(db, job_id, 120)
+    assert db.requeue_stale_render_jobs(60, max_attempts=3) == 1
+    job = db.get_render_job(job_id)
+    assert (job['status'], job['worker_id']) == ('queued', None)
+    assert db.claim_render_job('w2')['id'] == job_id
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(db):
+    job_id = db.enqueue_render_job('P-1')
+    for _ in range(3):
+        db.claim_render_job('w1')
+        _age_job(db, job_id, 120)
+        db.requeue_stale_render_jobs(60, max_attempts=3)
+    job = db.get_render_job(job_id)
+    assert job['status'] == 'failed'
+    assert job['finished_at'] is not None
+    assert db.claim_render_job('w1') is None
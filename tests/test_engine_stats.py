@@ -0,0 +1,92 @@
+"""Circuit breaker, fidelity-tiered ordering and per-engine caching (engine_stats.py, pdf_generator.py)."""
+
+import pytest
+
+import engine_stats
+import pdf_engines
+import pdf_generator
+from config import PDF_CONFIG
+
+_HTML = "<html><body><p>engine stats {}</p></body></html>"
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # debug HTML
+    monkeypatch.setitem(PDF_CONFIG, 'ENGINE_ADAPTIVE_ORDER', True)
+    monkeypatch.setitem(PDF_CONFIG, 'ENGINE_MIN_SAMPLES', 2)
+    engine_stats.reset()
+    yield
+    engine_stats.reset()
+
+
+def _measure(engine, seconds, template="t", samples=2):
+    for _ in range(samples):
+        engine_stats.record(template, engine, seconds, True)
+
+
+def _register(monkeypatch, name, convert, fidelity):
+    engine = pdf_engines.Engine(name, lambda: convert, lambda: True, fidelity=fidelity)
+    monkeypatch.setitem(pdf_engines._engines, name, engine)
+
+
+# ---- ordering --------------------------------------------------------
+
+def test_latency_only_reorders_within_a_fidelity_tier():
+    _measure("weasyprint", 2.0)
+    _measure("wkhtmltopdf", 0.5)
+    _measure("xhtml2pdf", 0.1)
+    # xhtml2pdf is fastest but renders the templates less faithfully
+    assert engine_stats.order_engines("t", ["weasyprint", "xhtml2pdf", "wkhtmltopdf"]) == \
+        ["wkhtmltopdf", "weasyprint", "xhtml2pdf"]
+
+
+def test_unmeasured_engines_keep_their_place_ahead_of_measured_ones():
+    _measure("weasyprint", 0.1)
+    assert engine_stats.order_engines("t", ["weasyprint", "wkhtmltopdf"]) == ["wkhtmltopdf", "weasyprint"]
+    # Statistics are per template
+    assert engine_stats.order_engines("other", ["weasyprint", "wkhtmltopdf"]) == ["weasyprint", "wkhtmltopdf"]
+
+
+def test_configured_order_is_kept_when_adaptive_order_is_off(monkeypatch):
+    monkeypatch.setitem(PDF_CONFIG, 'ENGINE_ADAPTIVE_ORDER', False)
+    _measure("weasyprint", 2.0)
+    _measure("xhtml2pdf", 0.1)
+    assert engine_stats.order_engines("t", ["xhtml2pdf", "weasyprint"]) == ["xhtml2pdf", "weasyprint"]
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_after_cooldown(monkeypatch):
+    monkeypatch.setitem(PDF_CONFIG, 'BREAKER_FAILURES', 2)
+    for _ in range(2):
+        engine_stats.record("t", "weasyprint", 0.1, False)
+    assert engine_stats.order_engines("t", ["weasyprint", "xhtml2pdf"]) == ["xhtml2pdf"]
+
+    monkeypatch.setitem(PDF_CONFIG, 'BREAKER_COOLDOWN', 0.0)
+    assert engine_stats.order_engines("t", ["weasyprint", "xhtml2pdf"]) == ["weasyprint", "xhtml2pdf"]
+    engine_stats.record("t", "weasyprint", 0.1, True)
+    assert [s["breaker"] for s in engine_stats.snapshot() if s["engine"] == "weasyprint"] == ["closed"]
+
+
+# ---- caching ---------------------------------------------------------
+
+def test_fallback_output_is_cached_under_its_engine_but_not_served(monkeypatch):
+    calls = {"high": 0}
+
+    def high(source_html):
+        calls["high"] += 1
+        if calls["high"] == 1:
+            raise RuntimeError("down")
+        return b"%PDF high"
+
+    _register(monkeypatch, "test-high", high, fidelity=2)
+    _register(monkeypatch, "test-low", lambda source_html: b"%PDF low", fidelity=1)
+    monkeypatch.setitem(PDF_CONFIG, 'ENGINE_ORDER', ["test-high", "test-low", "reportlab-plain"])
+    assert pdf_generator.cache_engine_names() == ["test-high"]
+
+    html = _HTML.format("fallback")
+    assert pdf_generator.generate_pdf_with_engine(html_string=html) == (b"%PDF low", "test-low")
+    assert pdf_generator.generate_pdf_with_engine(html_string=html, engine="test-low") == (b"%PDF low", "test-low")
+    # The preferred engine has recovered: its output replaces the fallback's
+    assert pdf_generator.generate_pdf_with_engine(html_string=html) == (b"%PDF high", "test-high")
+    assert pdf_generator.cached_pdf(html_string=html) == (b"%PDF high", "test-high")
+    assert calls["high"] == 2
@@ -0,0 +1,72 @@
+"""Synthetic data, the stored baseline and regression checks of the benchmark (pdf_benchmark.py)."""
+
+import json
+import os
+
+import pdf_benchmark
+import pdf_native
+import template_manager
+from conftest import ROOT
+
+
+def _cell(template, engine, variant, p50=100.0, ok=True, error=None):
+    cell = {"template": template, "engine": engine, "variant": variant, "ok": ok}
+    if ok:
+        cell["wall_p50_ms"] = p50
+    else:
+        cell["error"] = error
+    return cell
+
+
+def _report(*cells, templates=None, engines=None, variants=None):
+    return {"meta": {"templates": templates, "engines": engines, "variants": variants}, "results": list(cells)}
+
+
+def test_sample_project_fills_every_template_field_deterministically():
+    for template_name in template_manager.get_available_templates():
+        fields = template_manager.get_template_fields(template_name)
+        project = pdf_benchmark.sample_project(template_name, "long")
+        assert set(project) == set(fields)
+        assert project == pdf_benchmark.sample_project(template_name, "long")
+
+
+def test_baseline_covers_every_template_engine_and_variant():
+    with open(os.path.join(ROOT, "benchmarks", "baseline.json"), encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    cells = {(r["template"], r["engine"], r["variant"]) for r in baseline["results"] if r["ok"]}
+    engines = {engine for _, engine, _ in cells}
+    assert engines
+    # The native engine only covers the templates it has a layout for
+    assert cells == {(template, engine, variant)
+                     for template in template_manager.get_available_templates()
+                     for engine in engines
+                     if engine != pdf_native.ENGINE_NAME or pdf_native.supports(template)
+                     for variant in pdf_benchmark.VARIANTS}
+
+
+def test_slower_and_newly_failing_cells_regress():
+    baseline = _report(_cell("T", "e", "short"), _cell("T", "e", "long"), _cell("T", "e", "pathological"))
+    current = _report(_cell("T", "e", "short", p50=110.0),
+                      _cell("T", "e", "long", p50=200.0),
+                      _cell("T", "e", "pathological", ok=False, error="boom"))
+    assert pdf_benchmark.compare(current, baseline, 0.2, 20.0) == [
+        "T/e/long: p50 100.0 ms -> 200.0 ms (+100%)",
+        "T/e/pathological: now fails (boom)",
+    ]
+
+
+def test_missing_and_failed_baseline_cells_are_reported():
+    baseline = _report(_cell("T", "e", "short"), _cell("T", "e", "long", ok=False, error="boom"),
+                       _cell("U", "e", "short"))
+    current = _report(_cell("T", "e", "long"), templates=["T", "U"], engines=["e"], variants=["short", "long"])
+    assert pdf_benchmark.compare(current, baseline, 0.2, 20.0) == [
+        "T/e/short: missing from this run",
+        "T/e/long: failed in the baseline (boom); nothing to compare with",
+        "U/e/short: missing from this run",
+    ]
+
+
+def test_cells_outside_the_run_are_not_missing():
+    baseline = _report(_cell("T", "e", "short"), _cell("U", "e", "short"), _cell("T", "other", "short"))
+    current = _report(_cell("T", "e", "short"), templates=["T"], engines=["e"], variants=["short"])
+    assert pdf_benchmark.compare(current, baseline, 0.2, 20.0) == []
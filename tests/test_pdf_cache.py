@@ -0,0 +1,85 @@
+"""Cache keys and size-based eviction (pdf_cache.py)."""
+
+import os
+
+import pdf_cache
+from pdf_cache import PdfCache, make_key
+
+
+def _disk_files(cache_dir):
+    return sorted(name for _, _, files in os.walk(cache_dir) for name in files if name.endswith(".pdf"))
+
+
+# ---- keys ------------------------------------------------------------
+
+def test_key_ignores_value_types_and_key_order():
+    assert make_key({"a": 1, "b": None}, "t", "xhtml2pdf") == make_key({"b": "", "a": "1"}, "t", "xhtml2pdf")
+
+
+def test_key_changes_with_data_template_and_engine():
+    base = make_key({"a": "1"}, "t", "xhtml2pdf")
+    assert make_key({"a": "2"}, "t", "xhtml2pdf") != base
+    assert make_key({"a": "1"}, "t2", "xhtml2pdf") != base
+    assert make_key({"a": "1"}, "t", "weasyprint") != base
+
+
+def test_key_for_hashes_raw_html_and_templates():
+    assert pdf_cache.key_for("e", html_string="<p>a</p>") == pdf_cache.key_for("e", html_string="<p>a</p>")
+    assert pdf_cache.key_for("e", html_string="<p>a</p>") != pdf_cache.key_for("e", html_string="<p>b</p>")
+    data = {"project_no": "P-1"}
+    assert pdf_cache.key_for("e", "STD_WSM", data) == pdf_cache.key_for("e", "STD_WSM", dict(data))
+    assert pdf_cache.key_for("e", "STD_WSM", data) != pdf_cache.key_for("e", "SIMPLE_WSM", data)
+
+
+# ---- eviction --------------------------------------------------------
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = PdfCache(str(tmp_path), memory_max_bytes=30, disk_max_bytes=10 ** 6)
+    cache.put("a" * 64, b"x" * 10)
+    cache.put("b" * 64, b"x" * 10)
+    cache.put("c" * 64, b"x" * 10)
+    cache._memory_get("a" * 64)  # a is now the most recently used
+    cache.put("d" * 64, b"x" * 10)
+    assert list(cache._memory) == ["c" * 64, "a" * 64, "d" * 64]
+    assert cache._memory_bytes == 30
+
+
+def test_memory_tier_skips_oversized_entries(tmp_path):
+    cache = PdfCache(str(tmp_path), memory_max_bytes=5, disk_max_bytes=10 ** 6)
+    cache.put("a" * 64, b"x" * 10)
+    assert not cache._memory
+    assert cache.get("a" * 64) == b"x" * 10  # still served from disk
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    PdfCache(str(tmp_path), 10 ** 6, 10 ** 6).put("a" * 64, b"pdf")
+    assert PdfCache(str(tmp_path), 10 ** 6, 10 ** 6).get("a" * 64) == b"pdf"
+
+
+def test_disk_tier_evicts_oldest_down_to_low_water(tmp_path):
+    cache = PdfCache(str(tmp_path), memory_max_bytes=0, disk_max_bytes=100)
+    for i, key in enumerate("abcdefghij"):
+        cache.put(key * 64, b"x" * 10)
+        path = cache._disk_path(key * 64)
+        os.utime(path, (1000 + i, 1000 + i))
+    assert len(_disk_files(str(tmp_path))) == 10
+
+    cache.put("k" * 64, b"x" * 10)
+    remaining = _disk_files(str(tmp_path))
+    # Over budget: oldest files go until the total is at most 90% of it
+    assert sum(os.path.getsize(cache._disk_path(name[:-4])) for name in remaining) <= 90
+    assert "a" * 64 + ".pdf" not in remaining
+    assert "k" * 64 + ".pdf" in remaining
+    assert cache._disk_bytes == 10 * len(remaining)
+
+
+def test_disk_total_tracks_overwrites_without_walking(tmp_path, monkeypatch):
+    cache = PdfCache(str(tmp_path), memory_max_bytes=0, disk_max_bytes=1000)
+    cache.put("a" * 64, b"x" * 10)
+    walks = []
+    original = cache._evict_disk
+    monkeypatch.setattr(cache, "_evict_disk", lambda: (walks.append(1), original()))
+    cache.put("a" * 64, b"x" * 30)
+    cache.put("b" * 64, b"x" * 10)
+    assert cache._disk_bytes == 40
+    assert walks == []
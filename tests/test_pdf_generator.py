@@ -0,0 +1,28 @@
+"""Batch export to a streamed ZIP (pdf_generator.py)."""
+
+import io
+import zipfile
+
+import pdf_generator
+from conftest import add_project
+
+
+def _render(template_name, project_data):
+    return b"%PDF " + template_name.encode()
+
+
+def test_zip_holds_one_pdf_per_project_and_lists_failures(db):
+    add_project('P-1', wsm_type='STD_WSM')
+    add_project('P-2', wsm_type='SIMPLE_WSM')
+    progress = []
+    buf = io.BytesIO()
+    written, failures = pdf_generator.write_pdfs_zip(['P-1', 'P-2', 'P-404'], buf, render=_render,
+                                                     progress=lambda done, total, no: progress.append((done, total)))
+
+    assert written == 2
+    assert list(failures) == ['P-404']
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    with zipfile.ZipFile(buf) as zf:
+        assert sorted(zf.namelist()) == ['P-1.pdf', 'P-2.pdf', 'errors.txt']
+        assert zf.read('P-2.pdf') == b"%PDF SIMPLE_WSM"
+        assert zf.read('errors.txt').decode().startswith('P-404: ')
@@ -0,0 +1,82 @@
+"""The native ReportLab layout, its cache keys and its fidelity to the HTML template (pdf_native.py)."""
+
+import io
+
+import pytest
+
+import pdf_engines
+import pdf_generator
+import pdf_native
+import template_manager
+from config import PDF_CONFIG
+
+pypdf = pytest.importorskip("pypdf")
+
+_TEMPLATE = "STD_WSM"
+
+
+def _text(pdf_bytes):
+    return " ".join(page.extract_text() for page in pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+
+@pytest.fixture(scope="module")
+def tagged_project():
+    # One unique token per field, so each field can be found in the extracted text
+    fields = sorted(template_manager.get_template_fields(_TEMPLATE))
+    return {field: "ZQ%03dX" % i for i, field in enumerate(fields)}
+
+
+def _fields_shown(project, text):
+    return {field for field, token in project.items() if token in text}
+
+
+@pytest.mark.skipif(not pdf_native.is_available(), reason="ReportLab is not installed")
+def test_native_layout_is_available_for_std_wsm():
+    assert pdf_native.supports(_TEMPLATE)
+
+
+@pytest.mark.skipif(not pdf_native.is_available(), reason="ReportLab is not installed")
+def test_native_and_html_show_the_same_fields(tagged_project):
+    html_engine = pdf_engines.get_engine("xhtml2pdf")
+    if not html_engine.is_available():
+        pytest.skip("xhtml2pdf is not installed")
+
+    native = _fields_shown(tagged_project, _text(pdf_native.render(_TEMPLATE, tagged_project)))
+    html = _fields_shown(tagged_project, _text(
+        html_engine.convert(template_manager.get_template_content(_TEMPLATE, tagged_project))))
+    assert native == html
+    assert native == set(tagged_project)
+
+
+@pytest.mark.skipif(not pdf_native.is_available(), reason="ReportLab is not installed")
+def test_native_render_escapes_markup():
+    project = {"project_no": "P-1", "client": "<b>A & B</b> <font size=40>x"}
+    text = _text(pdf_native.render(_TEMPLATE, project))
+    assert "<b>A & B</b>" in text
+
+
+def test_layout_digest_follows_the_configured_logo(monkeypatch, tmp_path):
+    monkeypatch.setitem(PDF_CONFIG, 'COMPANY_LOGO', "")
+    plain = pdf_native.layout_digest(_TEMPLATE)
+    monkeypatch.setitem(PDF_CONFIG, 'COMPANY_LOGO', "data:image/png;base64,AAAA")
+    inline = pdf_native.layout_digest(_TEMPLATE)
+    assert inline != plain
+
+    logo = tmp_path / "logo.png"
+    logo.write_bytes(b"one")
+    monkeypatch.setitem(PDF_CONFIG, 'COMPANY_LOGO', str(logo))
+    before = pdf_native.layout_digest(_TEMPLATE)
+    assert before not in (plain, inline)
+    # Replacing the file under the same path changes the digest too
+    logo.write_bytes(b"other")
+    assert pdf_native.layout_digest(_TEMPLATE) != before
+
+
+@pytest.mark.skipif(not pdf_native.is_available(), reason="ReportLab is not installed")
+def test_native_renders_are_cached_under_the_native_engine(monkeypatch):
+    monkeypatch.setitem(PDF_CONFIG, 'NATIVE_TEMPLATES', [_TEMPLATE])
+    project = {"project_no": "P-NATIVE", "client": "cache test"}
+    assert pdf_generator.cache_engine_names(_TEMPLATE) == [pdf_native.ENGINE_NAME]
+    pdf_bytes, engine = pdf_generator.generate_pdf_with_engine(_TEMPLATE, project)
+    assert engine == pdf_native.ENGINE_NAME
+    assert pdf_generator.cached_pdf(_TEMPLATE, project) == (pdf_bytes, engine)
@@ -0,0 +1,66 @@
+"""Per-job timeouts and worker replacement in the render pool (render_pool.py)."""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import render_pool
+from render_pool import RenderPool
+
+
+@pytest.fixture
+def pool(request):
+    """A RenderPool of request.param (default 1) spawned workers."""
+    pool = RenderPool(getattr(request, "param", 1), multiprocessing.get_context("spawn"))
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def test_jobs_run_in_a_worker_process(pool):
+    assert pool.submit(os.getpid).result(60) != os.getpid()
+
+
+def test_queue_time_does_not_count_against_the_timeout(pool):
+    pool.submit(os.getpid).result(60)  # worker is warm
+    started = time.monotonic()
+    futures = [pool.submit(time.sleep, 0.4, timeout=1) for _ in range(4)]
+    for future in futures:
+        assert future.result(60) is None
+    assert time.monotonic() - started > 1
+
+
+def test_overrunning_job_times_out_and_only_its_worker_is_replaced(pool):
+    first_pid = pool.submit(os.getpid).result(60)
+    stuck = pool.submit(time.sleep, 60, timeout=0.5)
+    queued = pool.submit(os.getpid)
+    with pytest.raises(TimeoutError):
+        stuck.result(60)
+    # The job queued behind it runs in the replacement worker
+    assert queued.result(60) not in (first_pid, None)
+
+
+@pytest.mark.parametrize("pool", [2], indirect=True)
+def test_timeout_leaves_jobs_in_other_workers_running(pool):
+    slow = pool.submit(time.sleep, 2, timeout=60)
+    stuck = pool.submit(time.sleep, 60, timeout=0.5)
+    with pytest.raises(TimeoutError):
+        stuck.result(60)
+    assert slow.result(60) is None
+
+
+def test_dead_worker_fails_its_job_and_is_replaced(pool):
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result(60)
+    assert pool.submit(os.getpid).result(60)
+
+
+def test_result_timeout_cancels_a_queued_job_without_killing(pool):
+    running = pool.submit(time.sleep, 1)
+    queued = pool.submit(os.getpid)
+    with pytest.raises(TimeoutError):
+        render_pool.result(queued, timeout=0.1)
+    assert queued.cancelled()
+    assert running.result(60) is None
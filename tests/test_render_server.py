@@ -0,0 +1,175 @@
+"""Admission control, ETags, HEAD and request validation of the HTTP render service (render_server.py)."""
+
+import http.client
+import json
+import threading
+
+import pytest
+
+import pdf_generator
+import render_server
+from conftest import add_project
+from render_server import RenderLimiter
+
+_HTML = "<html><body><p>WSM test page</p></body></html>"
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A live server on a free port with a one-slot, no-queue limiter; yields (host, port)."""
+    monkeypatch.setattr(render_server, "_limiter", RenderLimiter(1, 0))
+    httpd = render_server.make_server("127.0.0.1", 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _request(address, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection(*address, timeout=60)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def _post(address, payload, headers=None):
+    return _request(address, "POST", "/render", json.dumps(payload),
+                    dict({"Content-Type": "application/json"}, **(headers or {})))
+
+
+def _no_render(*args):
+    raise AssertionError("rendered")
+
+
+# ---- limiter ---------------------------------------------------------
+
+def test_limiter_refuses_beyond_capacity_and_queue():
+    limiter = RenderLimiter(1, 1)
+    assert limiter.try_admit() and limiter.try_admit()
+    assert not limiter.try_admit()
+    assert limiter.load() == (0, 2)
+
+
+def test_limiter_gives_admission_back_when_the_render_fails():
+    limiter = RenderLimiter(1, 0)
+    assert limiter.try_admit()
+    with pytest.raises(RuntimeError):
+        limiter.run(lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert limiter.load() == (0, 0)
+    assert limiter.try_admit()
+
+
+# ---- HTTP ------------------------------------------------------------
+
+def test_render_returns_pdf_with_etag(server):
+    status, headers, body = _post(server, {"html": _HTML})
+    assert status == 200
+    assert body.startswith(b"%PDF")
+    assert headers["ETag"].startswith('W/"')
+
+    status, headers_304, body = _post(server, {"html": _HTML}, {"If-None-Match": headers["ETag"]})
+    assert (status, body) == (304, b"")
+    assert headers_304["ETag"] == headers["ETag"]
+
+    # Weak comparison: the strong form of the same tag matches too
+    status, _, _ = _post(server, {"html": _HTML}, {"If-None-Match": headers["ETag"][2:]})
+    assert status == 304
+
+
+def test_etag_changes_with_content(server):
+    _, first, _ = _post(server, {"html": _HTML})
+    _, second, _ = _post(server, {"html": _HTML.replace("test", "other")})
+    assert first["ETag"] != second["ETag"]
+
+
+def test_full_queue_answers_429(server, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_render(*args):
+        started.set()
+        release.wait(30)
+        return b"%PDF-1.4 test", pdf_generator.ENGINE_NAME
+
+    monkeypatch.setattr(render_server, "_render", slow_render)
+    first = threading.Thread(target=_post, args=(server, {"html": _HTML}))
+    first.start()
+    try:
+        assert started.wait(30)
+        status, headers, body = _post(server, {"html": _HTML.replace("test", "other")})
+        assert status == 429
+        assert headers["Retry-After"] == "5"
+        assert "queue is full" in json.loads(body)["error"]
+    finally:
+        release.set()
+        first.join(30)
+    # The slot is free again
+    assert _post(server, {"html": _HTML.replace("test", "third")})[0] == 200
+
+
+def test_failed_render_releases_its_admission(server, monkeypatch):
+    def broken_render(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(render_server, "_render", broken_render)
+    for _ in range(3):
+        assert _post(server, {"html": _HTML})[0] == 500
+    assert render_server._limiter.load() == (0, 0)
+
+
+def test_unknown_template_is_rejected_before_admission(server):
+    status, _, body = _post(server, {"template": "NOPE", "data": {}})
+    assert status == 404
+    assert render_server._limiter.load() == (0, 0)
+
+
+def test_download_name_is_header_safe(server, monkeypatch):
+    monkeypatch.setattr(render_server, "_render", lambda *args: (b"%PDF-1.4 test", pdf_generator.ENGINE_NAME))
+    status, headers, _ = _post(server, {"html": _HTML, "data": {"project_no": 'P-1"\r\nX-Injected: 1'}})
+    assert status == 200
+    assert "X-Injected" not in headers
+    assert headers["Content-Disposition"] == 'inline; filename="WSM_P-1___X-Injected__1.pdf"'
+
+
+def test_etag_follows_the_engine_that_rendered(server, monkeypatch):
+    _, predicted, _ = _post(server, {"html": _HTML})
+    monkeypatch.setattr(render_server, "_render",
+                        lambda *args: (b"%PDF-1.4 plain", "reportlab-plain"))
+    _, fallback, _ = _post(server, {"html": _HTML.replace("test", "fallback")})
+    assert fallback["ETag"] == render_server._etag("reportlab-plain", None, {},
+                                                   _HTML.replace("test", "fallback"))
+    assert fallback["ETag"] != predicted["ETag"]
+
+
+def test_invalid_requests_answer_400(server):
+    status, _, body = _request(server, "POST", "/render", b"", {"Content-Length": "-1"})
+    assert status == 400
+    assert "Content-Length" in json.loads(body)["error"]
+
+    status, _, body = _post(server, {"template": ["STD_WSM"], "data": {}})
+    assert status == 400
+    assert "'template' must be a string" in json.loads(body)["error"]
+    assert render_server._limiter.load() == (0, 0)
+
+
+def test_head_does_not_render(server, db, monkeypatch):
+    add_project("P-HEAD", wsm_type="STD_WSM")
+    render = render_server._render
+    monkeypatch.setattr(render_server, "_render", _no_render)
+    status, headers, body = _request(server, "HEAD", "/projects/P-HEAD/pdf")
+    assert (status, body) == (200, b"")
+    assert "Content-Length" not in headers
+    expected = headers["ETag"]
+
+    # Once rendered and cached, HEAD reports the cached PDF's engine and length
+    monkeypatch.setattr(render_server, "_render", render)
+    status, headers, pdf = _request(server, "GET", "/projects/P-HEAD/pdf")
+    assert status == 200 and headers["ETag"] == expected
+    monkeypatch.setattr(render_server, "_render", _no_render)
+    status, headers, _ = _request(server, "HEAD", "/projects/P-HEAD/pdf")
+    assert status == 200
+    assert headers["ETag"] == expected
+    assert headers["Content-Length"] == str(len(pdf))
@@ -0,0 +1,38 @@
+"""Queued jobs render with the generator they name (render_worker.py)."""
+
+import pytest
+
+import pdf_generator
+import pdf_generator_xhtml2pdf
+import render_worker
+from conftest import add_project
+
+
+@pytest.fixture
+def generators(db, monkeypatch):
+    add_project('P-1', wsm_type='STD_WSM')
+    monkeypatch.setattr(pdf_generator, "generate_pdf", lambda template_name, project_data: b"%PDF chain")
+    monkeypatch.setattr(pdf_generator_xhtml2pdf, "generate_pdf", lambda template_name, project_data: b"%PDF xhtml2pdf")
+    return db
+
+
+def _run(db, **enqueue):
+    job_id = db.enqueue_render_job('P-1', **enqueue)
+    job = db.claim_render_job('w1')
+    assert job['id'] == job_id
+    with open(render_worker.run_job(job), 'rb') as fh:
+        return fh.read()
+
+
+def test_job_renders_with_pdf_generator_by_default(generators):
+    assert _run(generators) == b"%PDF chain"
+
+
+def test_job_renders_with_the_generator_it_names(generators):
+    assert _run(generators, generator='pdf_generator_xhtml2pdf') == b"%PDF xhtml2pdf"
+
+
+def test_unknown_generator_is_refused(generators):
+    with pytest.raises(ValueError, match="Unknown PDF generator"):
+        _run(generators, generator='os')
+
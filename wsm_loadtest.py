@@ -0,0 +1,306 @@
+"""
+wsm_loadtest.py
+
+Concurrent-session load test for the Streamlit app.
+
+Drives app.py (or new_app.py / change_app.py) headlessly through Streamlit's
+AppTest, one simulated engineer per worker process, so sessions really run in
+parallel against one SQLite database, the way a busy morning does. Every
+session logs in once, then repeats a scripted visit to the status page:
+
+    login          submit the login form
+    open_status    switch to the Project Status page
+    search         full-text search for a client / site / make from the data
+    filter         filter the listing by a random status (search cleared)
+    update_status  change one listed project's status and press Update
+    download_pdf   press Prepare PDF on a listed project and wait for the download button
+
+Each action is timed from the widget interaction until the script rerun it
+triggers has finished. An action fails if the app raised, showed st.error, or
+the element the action waits for did not appear.
+
+The test never touches the real data: --db (default: the configured database)
+is copied into a scratch directory, migrated with database.init_db, topped up
+with --rows synthetic projects from wsm_seed.py, and the sessions run against
+the copy with an empty PDF cache. Every other artifact directory (metrics
+dumps, debug captures, rendered jobs, Jinja bytecode) is redirected into the
+scratch directory too.
+
+    python -m wsm_loadtest --sessions 8 --iterations 5
+    python -m wsm_loadtest --sessions 8 --rows 100000        # production-sized listing and search
+    python -m wsm_loadtest --sessions 16 --app new_app.py --think-ms 500 --json results.json
+
+The report lists, per action, the count, error rate and p50/p95/max latency;
+the exit status is 1 if any action failed.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ACTIONS = ("login", "open_status", "search", "filter", "update_status", "download_pdf")
+STATUSES = ["Submitted", "Approved", "Waiting for MRO Confirmation", "Rejected", "Completed"]
+
+
+# ---- one simulated session (runs in a worker process) -------------------
+
+def _check(at, action: str) -> None:
+    """Raise if the last run of the app failed in a way a user would see."""
+    if len(at.exception):
+        raise RuntimeError(f"{action}: app raised {at.exception[0].value}")
+    if len(at.error):
+        raise RuntimeError(f"{action}: st.error: {at.error[0].value}")
+
+
+def _listed_projects(at) -> list:
+    """Project numbers on the current status page (from the per-project status selectboxes)."""
+    return [box.key[len("status_"):] for box in at.selectbox if box.key and box.key.startswith("status_")]
+
+
+def _widget(widgets, label: str):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise RuntimeError(f"widget {label!r} not found")
+
+
+def _run_session(session: int, app_path: str, iterations: int, seed: int, start_at: float,
+                 username: str, password: str, search_terms: list, think_ms: int, timeout: float) -> list:
+    """Run one scripted session. Returns [(action, seconds, error or None), ...]."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(f"{seed}:{session}")
+    samples = []
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    at.run()  # first script run (imports, DB setup) is not measured
+    time.sleep(max(start_at - time.time(), 0))
+
+    def timed(action: str, step) -> None:
+        started = time.perf_counter()
+        try:
+            step()
+            _check(at, action)
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        samples.append((action, time.perf_counter() - started, error))
+        if think_ms:
+            time.sleep(rng.uniform(0, think_ms) / 1000.0)
+
+    def login():
+        at.text_input[0].input(username)
+        at.text_input[1].input(password)
+        at.button[0].click().run()
+        if not at.session_state["authenticated"]:
+            raise RuntimeError("login rejected")
+
+    def open_status():
+        at.sidebar.radio[0].set_value("📊 Project Status").run()
+        _widget(at.selectbox, "Filter by status")
+
+    def search():
+        _widget(at.selectbox, "Filter by status").set_value("All")
+        _widget(at.text_input, "🔍 Search projects...").input(rng.choice(search_terms)).run()
+
+    def filter_status():
+        _widget(at.text_input, "🔍 Search projects...").input("")
+        _widget(at.selectbox, "Filter by status").set_value(rng.choice(["All"] + STATUSES)).run()
+
+    def update_status():
+        _widget(at.text_input, "🔍 Search projects...").input("")
+        _widget(at.selectbox, "Filter by status").set_value("All").run()
+        projects = _listed_projects(at)
+        if not projects:
+            raise RuntimeError("no projects listed")
+        project_no = rng.choice(projects)
+        box = at.selectbox(key=f"status_{project_no}")
+        box.set_value(rng.choice([s for s in STATUSES if s != box.value]))
+        at.button(key=f"update_{project_no}").click().run()
+
+    def download_pdf():
+        projects = _listed_projects(at)
+        if not projects:
+            raise RuntimeError("no projects listed")
+        project_no = rng.choice(projects)
+        prepare_keys = {button.key for button in at.button}
+        if f"prepare_{project_no}" in prepare_keys:
+            at.button(key=f"prepare_{project_no}").click().run()
+        if not any(button.key == f"download_{project_no}" for button in at.get("download_button")):
+            raise RuntimeError(f"no download button for {project_no}")
+
+    timed("login", login)
+    for _ in range(iterations):
+        timed("open_status", open_status)
+        timed("search", search)
+        timed("filter", filter_status)
+        timed("update_status", update_status)
+        timed("download_pdf", download_pdf)
+    return samples
+
+
+def _session_entry(*args) -> list:
+    try:
+        return _run_session(*args)
+    except Exception:
+        # Setup failures (the app did not even load) are reported as one failed login
+        return [("login", 0.0, traceback.format_exc(limit=3).strip().splitlines()[-1])]
+    finally:
+        # The app's render pool must go before this worker exits: multiprocessing joins
+        # a worker's child processes before atexit handlers (render_pool's shutdown) run
+        render_pool = sys.modules.get("render_pool")
+        if render_pool is not None:
+            render_pool.shutdown()
+
+
+# ---- driver ---------------------------------------------------------------
+
+def _percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _search_terms(db_path: str, limit: int = 50) -> list:
+    """Words users would search for, taken from the seeded data."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT client, site, burner_make FROM projects ORDER BY RANDOM() LIMIT ?", (limit,)
+        ).fetchall()
+    finally:
+        conn.close()
+    terms = {word.strip(",.()") for row in rows for value in row if value for word in str(value).split()}
+    return sorted(term for term in terms if len(term) >= 3) or ["boiler"]
+
+
+def _prepare_workdir(db_path: str) -> str:
+    """Copy the database into a scratch directory and point this process (and its workers) at it."""
+    workdir = tempfile.mkdtemp(prefix="wsm_loadtest_")
+    seeded = os.path.join(workdir, "wsm_projects.db")
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(seeded)
+    try:
+        source.backup(target)  # consistent copy, even with a live WAL
+    finally:
+        source.close()
+        target.close()
+    os.environ["WSM_DB_PATH"] = seeded
+    os.environ["WSM_PDF_CACHE_DIR"] = os.path.join(workdir, "pdf_cache")
+    os.environ["WSM_PDF_METRICS_DIR"] = os.path.join(workdir, "pdf_metrics")
+    os.environ["WSM_PDF_DEBUG_DIR"] = os.path.join(workdir, "pdf_debug")
+    os.environ["WSM_RENDER_OUTPUT_DIR"] = os.path.join(workdir, "rendered_pdfs")
+    os.environ["WSM_JINJA_CACHE_DIR"] = os.path.join(workdir, "jinja_cache")
+    return workdir
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    """Per-action count, error rate and latency percentiles (ms)."""
+    report = {"elapsed_seconds": round(elapsed, 2), "actions": {}}
+    for action in ACTIONS:
+        times = [seconds for name, seconds, error in samples if name == action and error is None]
+        errors = [error for name, _, error in samples if name == action and error is not None]
+        count = len(times) + len(errors)
+        if not count:
+            continue
+        report["actions"][action] = {
+            "count": count,
+            "errors": len(errors),
+            "error_rate": round(len(errors) / count, 4),
+            "p50_ms": round(_percentile(times, 50) * 1000, 1),
+            "p95_ms": round(_percentile(times, 95) * 1000, 1),
+            "max_ms": round(max(times, default=0.0) * 1000, 1),
+            "sample_errors": sorted(set(errors))[:5],
+        }
+    return report
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m wsm_loadtest",
+                                     description="Simulate concurrent Streamlit sessions against a copy of the database")
+    parser.add_argument("--app", default="app.py", choices=("app.py", "new_app.py", "change_app.py"),
+                        help="Streamlit script to drive (default: %(default)s)")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions (default: %(default)s)")
+    parser.add_argument("--iterations", type=int, default=3,
+                        help="status page visits per session after logging in (default: %(default)s)")
+    parser.add_argument("--db", default=os.environ.get("WSM_DB_PATH", os.path.join(BASE_DIR, "wsm_projects.db")),
+                        help="database to copy and test against (default: %(default)s)")
+    parser.add_argument("--rows", type=int, default=0,
+                        help="synthetic projects to add to the copy before the test (default: %(default)s)")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--think-ms", type=int, default=0,
+                        help="random pause of up to this many ms after each action (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=120.0,
+                        help="seconds one script run may take before it counts as failed (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the sessions' random choices")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory with the database copy")
+    args = parser.parse_args(argv)
+    if args.sessions < 1 or args.iterations < 0 or args.rows < 0:
+        parser.error("--sessions must be at least 1, --iterations and --rows at least 0")
+    if not os.path.exists(args.db):
+        parser.error(f"database {args.db} not found")
+
+    workdir = _prepare_workdir(args.db)
+    try:
+        import database
+
+        database.init_db()  # bring the copy up to the current schema
+        if args.rows > 0:
+            import wsm_seed
+
+            print(f"[wsm_loadtest] Adding {args.rows} synthetic project(s) to the database copy")
+            wsm_seed.seed_projects(args.rows, seed=args.seed)
+        database.close_connections()
+        search_terms = _search_terms(os.environ["WSM_DB_PATH"])
+        app_path = os.path.join(BASE_DIR, args.app)
+        print(f"[wsm_loadtest] {args.sessions} session(s) x {args.iterations} iteration(s) on {args.app}, "
+              f"database copy in {workdir}")
+
+        # Sessions start together once every worker has loaded the app
+        start_at = time.time() + 10 + args.sessions
+        samples = []
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args.sessions, mp_context=ctx) as pool:
+            futures = [pool.submit(_session_entry, session, app_path, args.iterations, args.seed, start_at,
+                                   args.username, args.password, search_terms, args.think_ms, args.timeout)
+                       for session in range(args.sessions)]
+            for future in as_completed(futures):
+                samples.extend(future.result())
+        elapsed = time.time() - start_at
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = summarize(samples, elapsed)
+    report.update(app=args.app, sessions=args.sessions, iterations=args.iterations)
+    print(f"[wsm_loadtest] {len(samples)} action(s) in {elapsed:.1f}s")
+    print(f"    {'action':<14} {'count':>6} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for action, stats in report["actions"].items():
+        print(f"    {action:<14} {stats['count']:>6} {stats['errors']:>7} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+        for error in stats["sample_errors"]:
+            print(f"        ! {error}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    return 1 if any(stats["errors"] for stats in report["actions"].values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
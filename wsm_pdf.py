@@ -0,0 +1,188 @@
+"""
+wsm_pdf.py
+
+Command-line bulk renderer for WSM PDFs.
+
+Reads projects from wsm_projects.db and renders them across a pool of worker
+processes with pdf_generator.generate_pdf, writing <project_no>.pdf files to
+an output directory. Intended for re-generating the archive after a template
+change without clicking through the UI.
+
+    python -m wsm_pdf render WSM-20251010-A9E87548 WSM-20251011-0B1C2D3E
+    python -m wsm_pdf render --status Approved --status Completed --out archive/
+    python -m wsm_pdf render --all --workers 8 --engine xhtml2pdf
+
+At the end it prints throughput (PDFs/s), p50/p95 render latency and the
+projects that failed; the exit status is 1 if any project failed.
+
+The bench command runs the template x engine benchmark from pdf_benchmark.py
+and compares it with a stored baseline:
+
+    python -m wsm_pdf bench --save-baseline
+    python -m wsm_pdf bench --templates STD_WSM WHRB_WSM --repeat 5
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+import database
+import render_pool
+from config import PDF_CONFIG
+
+
+def _render_to_file(project_no: str, engine: Optional[str], out_dir: str, use_cache: bool) -> tuple:
+    """Render one project and write it to out_dir. Returns (project_no, seconds, size)."""
+    import pdf_generator
+
+    started = time.perf_counter()
+    template_name, project_data = pdf_generator.load_project_for_render(project_no)
+    pdf_bytes = pdf_generator.generate_pdf(template_name=template_name, project_data=project_data,
+                                           use_cache=use_cache, engine=engine)
+    path = os.path.join(out_dir, f"{project_no}.pdf")
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(pdf_bytes)
+    os.replace(tmp_path, path)
+    return project_no, time.perf_counter() - started, len(pdf_bytes)
+
+
+def _percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _select_projects(args) -> list:
+    if args.all:
+        return database.get_project_numbers()
+    project_nos = list(args.project_nos)
+    for status in args.status:
+        project_nos.extend(database.get_project_numbers(status=status))
+    # Keep the first occurrence of each project
+    return list(dict.fromkeys(project_nos))
+
+
+def render(args) -> int:
+    database.init_db()
+    project_nos = _select_projects(args)
+    if not project_nos:
+        print("[wsm_pdf] No projects selected.")
+        return 0
+    os.makedirs(args.out, exist_ok=True)
+
+    use_cache = not args.no_cache
+    latencies = []
+    failures = {}
+    total_bytes = 0
+    print(f"[wsm_pdf] Rendering {len(project_nos)} project(s) with {args.workers or 'no'} worker process(es) "
+          f"into {os.path.abspath(args.out)}")
+
+    def _record(project_no, seconds, size):
+        nonlocal total_bytes
+        latencies.append(seconds)
+        total_bytes += size
+        if args.verbose:
+            print(f"[wsm_pdf] {project_no}: {seconds:.2f}s, {size} bytes")
+
+    def _record_failure(project_no, error):
+        failures[project_no] = str(error)
+        print(f"[wsm_pdf] {project_no} failed: {error}")
+
+    started = time.perf_counter()
+    if args.workers <= 0:
+        for project_no in project_nos:
+            try:
+                _record(*_render_to_file(project_no, args.engine, args.out, use_cache))
+            except Exception as e:
+                _record_failure(project_no, e)
+    else:
+        ctx = multiprocessing.get_context(PDF_CONFIG['RENDER_START_METHOD'])
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx,
+                                 initializer=render_pool._init_worker) as pool:
+            futures = {pool.submit(_render_to_file, project_no, args.engine, args.out, use_cache): project_no
+                       for project_no in project_nos}
+            for future in as_completed(futures):
+                try:
+                    _record(*future.result())
+                except Exception as e:
+                    _record_failure(futures[future], e)
+    elapsed = time.perf_counter() - started
+
+    rendered = len(latencies)
+    print(f"[wsm_pdf] Rendered {rendered}/{len(project_nos)} PDF(s) in {elapsed:.2f}s "
+          f"({rendered / elapsed if elapsed else 0.0:.2f} PDFs/s, {total_bytes / 1024 / 1024:.1f} MiB)")
+    print(f"[wsm_pdf] Latency p50 {_percentile(latencies, 50):.2f}s, p95 {_percentile(latencies, 95):.2f}s, "
+          f"max {max(latencies, default=0.0):.2f}s")
+    if failures:
+        print(f"[wsm_pdf] {len(failures)} failure(s):")
+        for project_no, error in failures.items():
+            print(f"    {project_no}: {error}")
+        return 1
+    return 0
+
+
+def main(argv: Optional[list] = None) -> int:
+    import pdf_generator
+
+    parser = argparse.ArgumentParser(prog="python -m wsm_pdf", description="WSM PDF command-line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render_parser = commands.add_parser("render", help="render projects from wsm_projects.db to PDF files")
+    render_parser.add_argument("project_nos", nargs="*", metavar="PROJECT_NO", help="project numbers to render")
+    render_parser.add_argument("--status", action="append", default=[],
+                               help="render all projects with this status (repeatable)")
+    render_parser.add_argument("--all", action="store_true", help="render every project")
+    render_parser.add_argument("--workers", type=int, default=PDF_CONFIG['RENDER_WORKERS'] or os.cpu_count() or 1,
+                               help="worker processes; 0 renders in this process (default: %(default)s)")
+    render_parser.add_argument("--out", default="wsm_pdfs", help="output directory (default: %(default)s)")
+    render_parser.add_argument("--engine", choices=pdf_generator.ENGINES,
+                               help="force one converter instead of the automatic fallback chain")
+    render_parser.add_argument("--no-cache", action="store_true", help="bypass the rendered PDF cache")
+    render_parser.add_argument("-v", "--verbose", action="store_true", help="print every rendered project")
+
+    bench_parser = commands.add_parser("bench", help="benchmark every template x engine against a baseline")
+    bench_parser.add_argument("--templates", nargs="+", metavar="TEMPLATE",
+                              help="template keys to benchmark (default: all)")
+    bench_parser.add_argument("--engines", nargs="+", choices=pdf_generator.ENGINES,
+                              help="engines to benchmark (default: every installed engine)")
+    bench_parser.add_argument("--variants", nargs="+", choices=("short", "long", "pathological"),
+                              help="free-text variants (default: all)")
+    bench_parser.add_argument("--repeat", type=int, default=3, help="measured renders per cell (default: %(default)s)")
+    bench_parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic project data")
+    bench_parser.add_argument("--out", default="bench_results.json", help="results file (default: %(default)s)")
+    bench_parser.add_argument("--baseline", default=os.path.join("benchmarks", "baseline.json"),
+                              help="baseline to compare with (default: %(default)s)")
+    bench_parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    bench_parser.add_argument("--tolerance", type=float, default=0.2,
+                              help="allowed relative p50 slowdown per cell (default: %(default)s)")
+    bench_parser.add_argument("--min-delta-ms", type=float, default=20.0,
+                              help="ignore slowdowns smaller than this many ms (default: %(default)s)")
+
+    args = parser.parse_args(argv)
+    if args.command == "bench":
+        import pdf_benchmark
+
+        if args.repeat < 1:
+            bench_parser.error("--repeat must be at least 1")
+        return pdf_benchmark.main(args)
+    if args.command == "render":
+        if not (args.project_nos or args.status or args.all):
+            render_parser.error("give project numbers, --status or --all")
+        try:
+            return render(args)
+        finally:
+            database.close_connections()
+    return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,421 @@
+"""
+wsm_seed.py
+
+Synthetic data generator for the projects table.
+
+Fills a database (created or migrated with database.init_db, so it always
+matches the current schema) with realistic WSM projects, for listing, search,
+PDF cache and load tests at production-like sizes:
+
+    python -m wsm_seed --rows 100000                       # into the configured database
+    python -m wsm_seed --rows 250000 --db /tmp/big.db --seed 7 --end 2025-10-31
+
+Rows are generated column by column from the schema:
+    - created_at spread over --days days before --end, weighted towards recent
+      weeks; status depends on age (recent projects are mostly Submitted or
+      waiting, old ones Completed); updated_at, PO, delivery and signature
+      dates follow from created_at
+    - fuel, boiler type, template and every other form dropdown drawn from the
+      form's options with realistic weights
+    - clients, sites and engineers from combinatorial name pools, so search
+      terms have realistic selectivity
+    - the free-text requirement fields mostly empty, otherwise one-liners,
+      paragraphs or (rarely) several KB of text
+
+The same --seed and --end always produce the same rows. Inserts use
+executemany in transactions of --batch rows, and each transaction adds its
+rows to the full-text index with one INSERT ... SELECT instead of one trigger
+call per row (--keep-fts-triggers keeps the per-row triggers); rows already
+in the database are not re-indexed. Full-text indexing (every text column,
+with prefix indexes) dominates: on one CPU the inserts alone run at about
+180k rows per minute, and about 55-60k rows per minute with the index. The
+summary line reports both.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+STATUSES = ("Submitted", "Approved", "Waiting for MRO Confirmation", "Rejected", "Completed")
+# Status weights by project age: still in review vs. settled
+_RECENT_STATUS_WEIGHTS = (55, 15, 20, 5, 5)
+_SETTLED_STATUS_WEIGHTS = (5, 25, 5, 12, 53)
+_RECENT_DAYS = 45
+
+# column -> (options, weights); options as offered by the WSM form
+_CHOICES = {
+    'wsm_type': (("STD_WSM", "STANDARD_WSM", "CUSTOM_WSM", "ELECTRICAL_WSM", "NON_STANDARD_WSM", "SIMPLE_WSM",
+                  "WHRB_WSM"), (55, 10, 8, 7, 8, 7, 5)),
+    'boiler_fuel': (("Natural Gas", "Diesel", "Fuel Oil", "LPG", "Biogas", "Coal"), (40, 20, 15, 10, 5, 10)),
+    'boiler_type': (("Modular", "Non-Modular", "Combination M", "Floating Furnace", "Marshall BE",
+                     "Modular Marshall BE"), (30, 25, 12, 13, 12, 8)),
+    'primary_fuel': (("Natural Gas", "Diesel", "Fuel Oil", "LPG"), (50, 25, 15, 10)),
+    'secondary_fuel': (("None", "Natural Gas", "Diesel", "Fuel Oil", "LPG"), (60, 5, 25, 7, 3)),
+    'price_basis': (("Ex works", "FOR", "CIF", "FOB"), (45, 40, 8, 7)),
+    'special_delivery': (("No", "Yes"), (85, 15)),
+    'direct_orders': (("No", "Yes"), (80, 20)),
+    'insulation_cladding': (("Yes", "No"), (90, 10)),
+    'cladding_material': (("SS", "Aluminum", "GI"), (20, 60, 20)),
+    'orientation': (("Std.", "Mirror"), (85, 15)),
+    'boiler_design': (("IBR", "BS", "EN"), (80, 8, 12)),
+    'emissions': (("Std.", "Non-Std."), (85, 15)),
+    'wlc_type': (("Single", "Two element control", "Three element control"), (50, 30, 20)),
+    'water_level_control_type': (("Std. WLC type", "VFD based", "Control valve"), (60, 25, 15)),
+    'burner_modulation': (("On-Off", "High Low", "3 Stage", "Stepless"), (15, 35, 15, 35)),
+    'fm_burner_regulation': (("ECR-M", "ECR-P", "ECR-A", "MCR"), (40, 25, 20, 15)),
+    'burner_bloc_type': (("Monobloc", "Dual Bloc"), (75, 25)),
+    'burner_fan': (("Burner Mfg.", "Local"), (80, 20)),
+    'lp_gas_train': (("Yes", "No"), (45, 55)),
+    'o2_trimming': (("No", "Yes"), (75, 25)),
+    'vfd_details': (("No", "Yes"), (60, 40)),
+    'vfd_suitable_motors': (("No", "Yes"), (55, 45)),
+    'silencer': (("No", "Yes"), (70, 30)),
+    'noise_level': (("Std.", "Non-Std."), (90, 10)),
+    'control_panel_type': (("Boiler mounted", "Floor Standing"), (65, 35)),
+    'panel_configuration': (("STD", "Compartmentalized"), (80, 20)),
+    'plc': (("No", "Yes"), (55, 45)),
+    'ip_rating': (("IP54", "IP55", "IP65", "IP66"), (35, 40, 20, 5)),
+    'cabling_supply': (("FM Factory", "Drop shipment", "Not in scope"), (50, 20, 30)),
+    'cable_trays': (("FM Factory", "Drop shipment", "Not in scope"), (45, 20, 35)),
+    'dosing_pumps': (("1No", "2No"), (70, 30)),
+    'chemical_dosing_control_type': (("Manual", "Auto"), (45, 55)),
+    'ring_main_pump_qty': (("1W", "1W+1S"), (40, 60)),
+    'utility_prs_prv': (("No", "Yes"), (65, 35)),
+    'gas_type': (("NG", "PNG", "Biogas"), (55, 38, 7)),
+    'heat_recovery_type': (("Natural Circulation WPH", "Forced Circulation WPH", "Pressurized Economizer"),
+                           (40, 25, 35)),
+    'heat_recovery_integration': (("Integral", "Non-Integral", "Integrated (mounted on Boiler)"), (40, 35, 25)),
+    'heat_recovery_design_fuel': (("FQ", "NG", "hSD", "LPG"), (20, 50, 20, 10)),
+    'heat_recovery_material_type': (("MS Finned", "CI Gilled"), (70, 30)),
+    'soot_blowers': (("Motorized Steam type", "Sonic", "Not Required"), (20, 15, 65)),
+    'deaerator_type': (("Pressurized Deaerator", "Pressurized Tank"), (60, 40)),
+    'chimney_drawing_type': (("Schematic", "Fabrication"), (70, 30)),
+    'ibr_approval': (("PFO", "Steam Test", "only Folder"), (40, 35, 25)),
+}
+_YES_NO_DEFAULT_NO = ('wph_makeup_pump', 'ehs_policy', 'drawing_approval', 'control_panel_drawing_approval',
+                      'ga_drawing', 'p_id_drawing', 'bhl_drawing', 'piping_drawing', 'qualification_documents',
+                      'chimney_drawing', 'feed_water_tank_drawing', 'day_oil_tank_drawing',
+                      'fuel_consumption_guarantee', 'efficiency_ncv_guarantee', 'customer_loi',
+                      'customer_purchase_order', 'customer_layout')
+_YES_NO_DEFAULT_YES = ('heat_recovery_insulation', 'motorized_dampers', 'water_side_control_valve',
+                       'manual_dampers', 'deaerator_insulation')
+_AVAILABLE = ('construction_water', 'construction_power', 'drinking_water')
+_INCLUDED = ('site_services', 'unloading_leading', 'erection_commissioning', 'supervision')
+
+_CLIENT_PREFIXES = ("Arvind", "Hindalco", "Nestle", "Tata", "Reliance", "Britannia", "Amul", "Asian", "Bharat",
+                    "Godrej", "ITC", "Mahindra", "Parle", "Raymond", "Sun", "Welspun", "Dabur", "Marico",
+                    "Cipla", "Lupin", "Haldiram", "Vardhman", "Trident", "Bajaj", "Jubilant", "Emami",
+                    "Kansai", "Pidilite", "Ultratech", "Balkrishna")
+_CLIENT_SECTORS = ("Textiles", "Chemicals", "Foods", "Pharma", "Paper", "Dairy", "Beverages", "Tyres",
+                   "Distilleries", "Polymers", "Agro", "Industries")
+_CLIENT_SUFFIXES = ("Ltd", "Pvt Ltd", "Limited", "India Pvt Ltd", "LLP")
+_SITES = (("Ahmedabad", "Gujarat"), ("Vapi", "Gujarat"), ("Surat", "Gujarat"), ("Pune", "Maharashtra"),
+          ("Nashik", "Maharashtra"), ("Aurangabad", "Maharashtra"), ("Hosur", "Tamil Nadu"),
+          ("Coimbatore", "Tamil Nadu"), ("Chennai", "Tamil Nadu"), ("Baddi", "Himachal Pradesh"),
+          ("Ludhiana", "Punjab"), ("Panipat", "Haryana"), ("Manesar", "Haryana"), ("Haridwar", "Uttarakhand"),
+          ("Bhiwadi", "Rajasthan"), ("Indore", "Madhya Pradesh"), ("Vizag", "Andhra Pradesh"),
+          ("Hyderabad", "Telangana"), ("Mysuru", "Karnataka"), ("Bengaluru", "Karnataka"),
+          ("Kolkata", "West Bengal"), ("Guwahati", "Assam"), ("Dhaka", "Bangladesh"), ("Colombo", "Sri Lanka"))
+_FIRST_NAMES = ("Rahul", "Anita", "Suresh", "Priya", "Vikram", "Meera", "Arjun", "Kavita", "Manoj", "Deepa",
+                "Sanjay", "Lakshmi", "Imran", "Neha", "Karthik", "Pooja", "Rohit", "Farah", "Ganesh", "Sneha")
+_LAST_NAMES = ("Sharma", "Patel", "Iyer", "Khan", "Desai", "Reddy", "Nair", "Gupta", "Joshi", "Kulkarni",
+               "Menon", "Singh", "Rao", "Mehta", "Pillai", "Das", "Bose", "Chopra", "Verma", "Shetty")
+_CREATORS = ("admin", "lvk", "sales_west", "sales_south", "sales_north", "sales_east", "projects")
+_MAKES = ("Siemens", "Weishaupt", "Baltur", "Riello", "Oilon", "Ecoflam", "Elco", "Dunphy")
+_PLC_MAKES = ("Siemens", "Allen Bradley", "Schneider", "Mitsubishi", "Delta")
+_SENTENCES = (
+    "All pressure parts shall be designed and tested in accordance with IBR 1950 and the latest amendments.",
+    "The burner management system shall include flame failure, low water level and high pressure trips.",
+    "Refractory and insulation shall be suitable for continuous operation at the maximum flue gas temperature.",
+    "Client to provide soft water at the battery limits with hardness below 5 ppm as CaCO3.",
+    "Painting shall be one coat of red oxide primer and two coats of heat resistant aluminium paint.",
+    "Vendor shall submit GA drawing, P&ID and cable schedule for approval within two weeks of the PO.",
+    "All instruments shall be tagged and calibrated, with calibration certificates supplied at dispatch.",
+    "Performance guarantee test to be conducted at site at 100% MCR for eight continuous hours.",
+    "Feed water pumps shall be vertical multistage with mechanical seals, one working and one standby.",
+    "Chimney height to be finalised as per local pollution control board norms.",
+    "Gas train shall be supplied with slam shut valve, pressure regulator and double block valves.",
+    "Site is in a coastal area; all outdoor items require marine-grade painting.",
+    "Control panel to have Modbus TCP interface to the client's DCS.",
+    "Dispatch in two lots; the second lot only after clearance of the civil foundation.",
+    "Operator training for three shifts to be included in the commissioning scope.",
+)
+_FREE_TEXT = ('non_standard_requirement', 'safety_requirements', 'special_documentation', 'other_documents',
+              'special_makes', 'supply_payment_terms', 'service_payment_terms')
+
+
+def _weighted(options: tuple, weights: tuple):
+    # Weights are small integers: one list entry per unit of weight, so a draw is one
+    # rng.random() (several times faster than rng.choices, which matters at 100k rows x 160 columns)
+    pool = [option for option, weight in zip(options, weights) for _ in range(weight)]
+    size = len(pool)
+    return lambda rng, row: pool[int(rng.random() * size)]
+
+
+def _pick(options: tuple):
+    return _weighted(options, (1,) * len(options))
+
+
+def _person(rng, row) -> str:
+    return f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}"
+
+
+def _maybe(probability: float, make):
+    return lambda rng, row: make(rng, row) if rng.random() < probability else ""
+
+
+def _free_text(rng, row) -> str:
+    """Requirement text: mostly empty, then one-liners, paragraphs and the odd essay."""
+    roll = rng.random()
+    if roll < 0.55:
+        return ""
+    if roll < 0.85:
+        return " ".join(rng.sample(_SENTENCES, rng.randint(1, 2)))
+    if roll < 0.97:
+        return " ".join(rng.choice(_SENTENCES) for _ in range(rng.randint(5, 15)))
+    return "\n\n".join(" ".join(rng.choice(_SENTENCES) for _ in range(12)) for _ in range(rng.randint(3, 6)))
+
+
+def _number(low: float, high: float, fmt: str):
+    return lambda rng, row: fmt.format(rng.uniform(low, high))
+
+
+def _column_generators(columns: list) -> list:
+    """One value generator per column; columns not handled here are left NULL."""
+    generators = {
+        'revision': _weighted(("0", "1", "2", "3"), (60, 25, 10, 5)),
+        'client': lambda rng, row: (f"{rng.choice(_CLIENT_PREFIXES)} {rng.choice(_CLIENT_SECTORS)} "
+                                    f"{rng.choice(_CLIENT_SUFFIXES)}"),
+        'site': lambda rng, row: "{}, {}".format(*rng.choice(_SITES)),
+        'consultant': _maybe(0.4, lambda rng, row: f"{rng.choice(_LAST_NAMES)} Consultants"),
+        'branch_engineer': _person,
+        'division_engineer': _person,
+        'safety_officer': _maybe(0.6, _person),
+        'site_supervisor': _maybe(0.6, _person),
+        'altitude': _number(0, 1200, "{:.0f} m"),
+        'temp_min_max': lambda rng, row: f"{rng.randint(0, 20)} / {rng.randint(30, 48)} °C",
+        'power_voltage': _weighted(("415V", "380V", "440V", "400V"), (80, 8, 7, 5)),
+        'control_voltage': _weighted(("230V", "110V", "24V DC"), (70, 20, 10)),
+        'frequency': _weighted(("50Hz", "60Hz"), (92, 8)),
+        'customer_po': _maybe(0.7, lambda rng, row: f"PO/{rng.randint(2019, 2026)}/{rng.randint(100, 99999):05d}"),
+        'ld_delivery_time': _maybe(0.5, _pick(("0.5% per week, max 5%", "1% per week, max 10%", "As per PO"))),
+        'ld_performance': _maybe(0.4, _pick(("0.5% per 1% shortfall, max 5%", "As per PO", "Not applicable"))),
+        'fm_role': _maybe(0.3, _pick(("Supply only", "Supply and supervision", "Turnkey"))),
+        'inspection': _maybe(0.5, _pick(("TPI by client", "Stage-wise by IBR", "Final inspection at works"))),
+        'commission': _maybe(0.15, _number(1, 5, "{:.1f}% to agent")),
+        'boiler_capacity': lambda rng, row: f"{rng.choice((600, 1000, 2000, 3000, 4000, 6000, 8000, 10000, 15000))} kg/hr",
+        'design_pressure': _weighted(("10.54 kg/cm²", "17.5 kg/cm²", "21 kg/cm²", "12.5 kg/cm²"), (55, 25, 10, 10)),
+        'boiler_quantity': _weighted(("1", "2", "3"), (75, 20, 5)),
+        'boiler_configuration': _weighted(("1 Working", "1 Working & 1 Stand by", "2 Working"), (65, 25, 10)),
+        'burner_type': _pick(("Pressure Jet", "Rotary Cup", "Gas Burner", "Dual Fuel")),
+        'burner_make': _pick(_MAKES),
+        'burner_model': lambda rng, row: f"{rng.choice(('RS', 'GP', 'WM', 'TBG', 'KP'))}-{rng.randint(10, 900)}",
+        'burner_quantity': _weighted(("1", "2"), (90, 10)),
+        'plc_make': _maybe(0.45, _pick(_PLC_MAKES)),
+        'hp_gas_train_make': _maybe(0.5, _pick(("Dungs", "Madas", "Kromschroder", "Honeywell"))),
+        'ng_inlet_pressure': _maybe(0.5, _number(100, 4000, "{:.0f} mbar")),
+        'combustion_blower_flow': _number(500, 20000, "{:.0f} m³/hr"),
+        'combustion_blower_head': _number(50, 600, "{:.0f} mmWC"),
+        'insulation_density': _weighted(("128 kg/m³", "96 kg/m³", "144 kg/m³"), (70, 15, 15)),
+        'insulation_thickness': _weighted(("50 mm", "75 mm", "100 mm"), (30, 55, 15)),
+        'specific_design_approvals': _maybe(0.1, _pick(("DOSH", "CE / PED", "ASME S stamp", "BV"))),
+        'chemical_dosing_qty': _weighted(("1", "2"), (80, 20)),
+        'chemical_dosing_tank_capacity': _weighted(("100 L", "200 L", "500 L"), (50, 35, 15)),
+        'heat_recovery_quantity': _weighted(("1", "2"), (85, 15)),
+        'design_inlet_feed_water_temp': _number(60, 105, "{:.0f}°C"),
+        'design_outlet_feed_water_temp': _number(105, 160, "{:.0f}°C"),
+        'flue_gas_inlet_temp': _number(220, 450, "{:.0f}°C"),
+        'flue_gas_outlet_temp': _number(130, 200, "{:.0f}°C"),
+        'deaerator_quantity': _weighted(("1", "2"), (85, 15)),
+        'deaeration_capacity': lambda rng, row: f"{rng.choice((1000, 2000, 5000, 10000, 20000))} kg/hr",
+        'storage_capacity': lambda rng, row: f"{rng.choice((2000, 5000, 10000, 20000))} L",
+        'feed_water_tank_capacity': lambda rng, row: f"{rng.choice((5000, 10000, 15000, 20000))} L",
+        'day_oil_tank_capacity': _maybe(0.5, lambda rng, row: f"{rng.choice((500, 990, 2000))} L"),
+        'pumps': _maybe(0.6, _pick(("Grundfos CR", "KSB Movitec", "CRI MVH", "Lubi LCR"))),
+        'motors': _maybe(0.6, _pick(("ABB IE3", "Siemens IE3", "Crompton IE2", "WEG IE3"))),
+        'valves': _maybe(0.6, _pick(("Forbes Marshall", "Spirax Sarco", "Leader", "Audco"))),
+        'flanges': _maybe(0.6, _pick(("ANSI B16.5 #150", "ANSI B16.5 #300", "DIN PN16", "DIN PN40"))),
+        'signature': lambda rng, row: "".join(rng.sample("ABCDEFGHKLMNPRSTV", 3)),
+    }
+    for column, (options, weights) in _CHOICES.items():
+        generators[column] = _weighted(options, weights)
+    generators['template_type'] = lambda rng, row: row.get('wsm_type') or 'STD_WSM'
+    for column in _YES_NO_DEFAULT_NO:
+        generators[column] = _weighted(("No", "Yes"), (70, 30))
+    for column in _YES_NO_DEFAULT_YES:
+        generators[column] = _weighted(("Yes", "No"), (75, 25))
+    for column in _AVAILABLE:
+        generators[column] = _weighted(("Available", "Not Available"), (70, 30))
+    for column in _INCLUDED:
+        generators[column] = _weighted(("Included", "Not Included"), (65, 35))
+    for column in columns:
+        if column.endswith('_other_requirements') or column in _FREE_TEXT:
+            generators[column] = _free_text
+        elif column.startswith('battery_limits_'):
+            generators[column] = _maybe(0.5, _pick(("At boiler outlet flange", "At feed pump suction",
+                                                    "1 m from boiler", "Up to client header")))
+    return [(column, generators.get(column)) for column in columns]
+
+
+def _project_dates(rng: random.Random, end: datetime, days: int) -> tuple:
+    """(created_at, age in days): weighted towards recent weeks, during working hours."""
+    age = int(days * rng.random() ** 1.6)
+    created = (end - timedelta(days=age)).replace(hour=rng.randint(8, 19), minute=rng.randint(0, 59),
+                                                  second=rng.randint(0, 59), microsecond=0)
+    return created, age
+
+
+def generate_rows(columns: list, count: int, seed: int = 0, end: Optional[datetime] = None, days: int = 1095,
+                  existing: Optional[set] = None):
+    """Yield count project rows as tuples in columns order."""
+    rng = random.Random(seed)
+    end = end or datetime.now()
+    generators = _column_generators([c for c in columns if c not in
+                                     ('project_no', 'status', 'created_by', 'created_at', 'updated_at',
+                                      'signature_date', 'po_date', 'delivery_date')])
+    used = set(existing or ())
+    for _ in range(count):
+        created, age = _project_dates(rng, end, days)
+        weights = _RECENT_STATUS_WEIGHTS if age < _RECENT_DAYS else _SETTLED_STATUS_WEIGHTS
+        status = rng.choices(STATUSES, weights)[0]
+        updated = created if status == "Submitted" else created + timedelta(
+            days=rng.randint(0, max(min(age, 60), 0)), hours=rng.randint(0, 8))
+        project_no = f"WSM-{created:%Y%m%d}-{rng.getrandbits(32):08X}"
+        while project_no in used:
+            project_no = f"WSM-{created:%Y%m%d}-{rng.getrandbits(32):08X}"
+        used.add(project_no)
+
+        row = {
+            'project_no': project_no,
+            'status': status,
+            'created_by': rng.choice(_CREATORS),
+            'created_at': created.strftime("%Y-%m-%d %H:%M:%S"),
+            'updated_at': updated.strftime("%Y-%m-%d %H:%M:%S"),
+            'signature_date': created.date().isoformat(),
+            'po_date': (created - timedelta(days=rng.randint(0, 30))).date().isoformat(),
+            'delivery_date': (created + timedelta(days=rng.randint(60, 240))).date().isoformat(),
+        }
+        for column, generate in generators:
+            row[column] = generate(rng, row) if generate is not None else None
+        yield tuple(row.get(column) for column in columns)
+
+
+def seed_projects(count: int, seed: int = 0, end: Optional[datetime] = None, days: int = 1095,
+                  batch: int = 10000, defer_fts: bool = True, progress=None, timings: Optional[dict] = None) -> int:
+    """
+    Insert count synthetic projects into the configured database (migrated first).
+    Returns the number of rows inserted. progress(done, total) is called after each batch;
+    timings, if given, receives the seconds spent on 'insert' and 'fts' (full-text indexing).
+    """
+    import database
+
+    database.init_db()
+    columns = [column for column in database.get_project_columns() if column != 'id']
+    conn = database.get_db_connection()
+    conn.isolation_level = None
+    c = conn.cursor()
+    fts_trigger = None
+    timings = timings if timings is not None else {}
+    timings.update(insert=0.0, fts=0.0)
+    try:
+        existing = {row[0] for row in c.execute('SELECT project_no FROM projects')}
+        if defer_fts:
+            # Index each batch with one INSERT ... SELECT instead of one FTS insert per row
+            c.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'projects_fts_ai'")
+            found = c.fetchone()
+            fts_trigger = found[0] if found else None
+        if fts_trigger:
+            fts_columns = ', '.join(row[1] for row in c.execute('PRAGMA table_info(projects_fts)'))
+            fts_sql = (f"INSERT INTO projects_fts (rowid, {fts_columns}) "
+                       f"SELECT id, {fts_columns} FROM projects WHERE id > ?")
+
+        sql = f"INSERT INTO projects ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        rows = generate_rows(columns, count, seed, end, days, existing)
+
+        def take(n):
+            return list(itertools.islice(rows, n))
+
+        # Double buffering: the next batch is generated while SQLite (which releases
+        # the GIL) inserts the current one
+        inserted = 0
+        with ThreadPoolExecutor(max_workers=1) as producer:
+            pending = producer.submit(take, min(batch, count))
+            while inserted < count:
+                chunk = pending.result()
+                remaining = count - inserted - len(chunk)
+                if remaining > 0:
+                    pending = producer.submit(take, min(batch, remaining))
+                started = time.perf_counter()
+                c.execute('BEGIN IMMEDIATE')
+                if fts_trigger:
+                    # Dropped and re-created in the same transaction, so committed rows are always indexed
+                    c.execute('DROP TRIGGER projects_fts_ai')
+                    last_id = c.execute('SELECT COALESCE(MAX(id), 0) FROM projects').fetchone()[0]
+                c.executemany(sql, chunk)
+                indexing = time.perf_counter()
+                if fts_trigger:
+                    c.execute(fts_sql, (last_id,))
+                    c.execute(fts_trigger)
+                c.execute('COMMIT')
+                timings['insert'] += indexing - started
+                timings['fts'] += time.perf_counter() - indexing
+                inserted += len(chunk)
+                if progress:
+                    progress(inserted, count)
+        return inserted
+    except Exception:
+        if conn.in_transaction:
+            c.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m wsm_seed", description="Insert synthetic WSM projects")
+    parser.add_argument("--rows", type=int, default=100000, help="projects to insert (default: %(default)s)")
+    parser.add_argument("--db", help="database file (default: the configured database, WSM_DB_PATH)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+    parser.add_argument("--end", type=lambda value: datetime.strptime(value, "%Y-%m-%d"),
+                        help="latest creation date, YYYY-MM-DD (default: today; pin it for reproducible data)")
+    parser.add_argument("--days", type=int, default=1095, help="spread creation dates over this many days")
+    parser.add_argument("--batch", type=int, default=10000, help="rows per transaction (default: %(default)s)")
+    parser.add_argument("--keep-fts-triggers", action="store_true",
+                        help="index every row by trigger instead of one full-text insert per batch")
+    args = parser.parse_args(argv)
+    if args.rows < 0 or args.batch < 1 or args.days < 0:
+        parser.error("--rows and --days must not be negative, --batch must be positive")
+    if args.db:
+        # Before database/config are imported, which read it once
+        os.environ["WSM_DB_PATH"] = args.db
+    import database
+
+    started = time.perf_counter()
+
+    def report_progress(done, total):
+        elapsed = time.perf_counter() - started
+        print(f"[wsm_seed] {done}/{total} rows ({done / elapsed * 60:,.0f} rows/min)")
+
+    timings = {}
+    try:
+        inserted = seed_projects(args.rows, args.seed, args.end, args.days, args.batch,
+                                 defer_fts=not args.keep_fts_triggers, progress=report_progress, timings=timings)
+    finally:
+        database.close_connections()
+    elapsed = time.perf_counter() - started
+    print(f"[wsm_seed] Inserted {inserted} project(s) in {elapsed:.1f}s "
+          f"({inserted / elapsed * 60 if elapsed else 0:,.0f} rows/min with the full-text index)")
+    if not args.keep_fts_triggers and timings.get('fts'):
+        without_fts = elapsed - timings['fts']
+        print(f"[wsm_seed] Full-text indexing took {timings['fts']:.1f}s; without it "
+              f"{inserted / without_fts * 60 if without_fts > 0 else 0:,.0f} rows/min")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())